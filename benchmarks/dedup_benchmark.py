@@ -0,0 +1,373 @@
+"""Duplicate detection benchmark.
+
+Generates synthetic contact books with known duplicates and reports, for
+each duplicate finder, wall time, candidate pairs per second, peak memory,
+and recall/precision against a brute-force baseline and the injected
+duplicates. Run from the project root:
+
+    python -m benchmarks.dedup_benchmark --sizes 1000 10000 --output results.json
+
+Pass ``--compare`` with an earlier results file to fail on regressions.
+
+The fuzzy run also reports the candidate pairs of the MinHash name index.
+The synthetic names are drawn from 100 first names and a few dozen last
+name syllables, so most names have close neighbours and those pairs grow
+roughly with the square of the book size (about 17 thousand at 3,000
+contacts, 720 thousand at 20,000 with the default banding). Books
+with more varied names produce fewer, so treat the fuzzy timings here as
+a worst case.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+# Add the project root to Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.append(project_root)
+
+import numpy as np
+from sqlalchemy import insert
+from src.core.contact_manager import Contact, ContactManager
+from src.core.dedup_worker import MERGE_THRESHOLD, SCORE_BATCH_SIZE
+from src.core.matcher import ContactMatcher
+from src.core.normalize import match_fields
+from src.db.database import init_db
+from src.models.contact_model import ContactModel
+from benchmarks.synthetic import SyntheticBook, generate_contacts, ordered_pair
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+
+# Contacts in the brute-force baseline sample; all pairs among them are scored
+BASELINE_LIMIT = 5000
+
+# ContactMatcher.find_matches compares every pair in Python, so only run it on small books
+MATCHER_LIMIT = 1000
+
+# Rows per INSERT statement when loading a book into the database
+LOAD_BATCH_SIZE = 5000
+
+# Relative slowdown, or absolute recall drop, reported as a regression by --compare
+DEFAULT_TOLERANCE = 0.2
+
+
+def max_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process so far (not per run)."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return rss / 1024 / 1024 if sys.platform == 'darwin' else rss / 1024
+
+
+async def load_book(session_factory, book: SyntheticBook):
+    """Insert a synthetic book, bypassing the ORM to keep setup time down."""
+    now = datetime.utcnow()
+    table = ContactModel.__table__
+    contacts = iter(book.contacts)
+    async with session_factory() as session:
+        while True:
+            batch = list(islice(contacts, LOAD_BATCH_SIZE))
+            if not batch:
+                break
+            await session.execute(insert(table), [
+                {
+                    'id': c.id,
+                    'first_name': c.first_name,
+                    'last_name': c.last_name,
+                    'email': c.email,
+                    'phone': c.phone,
+                    'source': c.source,
+                    'source_id': c.source_id,
+                    'contact_metadata': c.metadata,
+                    'created_at': now,
+                    'updated_at': now,
+                    **match_fields(c.first_name, c.last_name, c.email, c.phone)._asdict()
+                }
+                for c in batch
+            ])
+        await session.commit()
+
+
+class Measurement:
+    """Wall time and peak memory of one benchmarked call."""
+
+    def __init__(self, trace_memory: bool):
+        self.trace_memory = trace_memory
+        self.wall_seconds = 0.0
+        self.peak_memory_mb = None
+
+    def __enter__(self):
+        if self.trace_memory:
+            tracemalloc.start()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.wall_seconds = time.perf_counter() - self._start
+        if self.trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.peak_memory_mb = peak / 1024 / 1024
+        return False
+
+
+def baseline_sample(book: SyntheticBook, limit: int, seed: int) -> List[Contact]:
+    """Whole people (a contact and all its duplicates) until ``limit`` contacts."""
+    if len(book.contacts) <= limit:
+        return list(book.contacts)
+
+    by_entity: Dict[int, List[Contact]] = {}
+    for contact in book.contacts:
+        by_entity.setdefault(book.entities[contact.id], []).append(contact)
+    entities = list(by_entity)
+    random.Random(seed).shuffle(entities)
+
+    sample = []
+    for entity in entities:
+        if len(sample) + len(by_entity[entity]) > limit:
+            break
+        sample.extend(by_entity[entity])
+    return sample
+
+
+def brute_force_pairs(contacts: List[Contact]) -> Tuple[Set[Tuple[str, str]], int]:
+    """Score every pair with the duplicate rules, as find_duplicates(exhaustive=True) would."""
+    matcher = ContactMatcher()
+    matcher.index_contacts(contacts)
+    ids = np.array([contact.id for contact in contacts], dtype=object)
+
+    found = set()
+    pair_count = 0
+    left_positions, right_positions = [], []
+
+    def flush():
+        left = ids[np.concatenate(left_positions)]
+        right = ids[np.concatenate(right_positions)]
+        confidences = matcher.score_pairs(left.tolist(), right.tolist())
+        for position in np.flatnonzero(confidences > MERGE_THRESHOLD):
+            found.add(ordered_pair(left[position], right[position]))
+        left_positions.clear()
+        right_positions.clear()
+
+    pending = 0
+    for i in range(len(contacts) - 1):
+        right = np.arange(i + 1, len(contacts))
+        left_positions.append(np.full(len(right), i))
+        right_positions.append(right)
+        pending += len(right)
+        pair_count += len(right)
+        if pending >= SCORE_BATCH_SIZE:
+            flush()
+            pending = 0
+    if pending:
+        flush()
+    return found, pair_count
+
+
+def accuracy(found: Set[Tuple[str, str]], expected: Set[Tuple[str, str]]) -> Dict[str, Optional[float]]:
+    true_positives = len(found & expected)
+    return {
+        'expected': len(expected),
+        'found': len(found),
+        'recall': true_positives / len(expected) if expected else None,
+        'precision': true_positives / len(found) if found else None,
+    }
+
+
+async def run_find_duplicates(session_factory, workers: Optional[int], **kwargs) -> Tuple[Set, int, Optional[Dict]]:
+    """Duplicate pairs found, candidate pairs scored and the name index statistics of a fuzzy run."""
+    totals = []
+    async with session_factory() as session:
+        manager = ContactManager(session, max_workers=workers)
+        duplicates = await manager.find_duplicates(
+            rescan=True,
+            progress=lambda done, total: totals.append(total),
+            **kwargs
+        )
+    pairs = {ordered_pair(c1.id, c2.id) for c1, c2, _, _ in duplicates}
+    name_index = asdict(manager.name_index_stats) if manager.name_index_stats else None
+    return pairs, totals[0] if totals else 0, name_index
+
+
+def run_find_matches(contacts: List[Contact]) -> Tuple[Set, int]:
+    matches = ContactMatcher().find_matches(contacts)
+    pairs = {ordered_pair(c1.id, c2.id) for c1, c2, _ in matches}
+    return pairs, len(contacts) * (len(contacts) - 1) // 2
+
+
+def result_entry(size: int, method: str, measurement: Measurement, candidate_pairs: int,
+                 found: Set, baseline: Optional[Set], sample_ids: Optional[Set], truth: Set) -> Dict:
+    entry = {
+        'size': size,
+        'method': method,
+        'wall_seconds': round(measurement.wall_seconds, 4),
+        'candidate_pairs': candidate_pairs,
+        'pairs_per_second': round(candidate_pairs / measurement.wall_seconds) if measurement.wall_seconds else None,
+        'peak_memory_mb': round(measurement.peak_memory_mb, 1) if measurement.peak_memory_mb is not None else None,
+        'max_rss_mb': round(max_rss_mb(), 1) if resource is not None else None,
+        'matches': len(found),
+        'truth': accuracy(found, truth),
+    }
+    if baseline is not None:
+        in_sample = {pair for pair in found if pair[0] in sample_ids and pair[1] in sample_ids}
+        entry['baseline'] = {'contacts': len(sample_ids), **accuracy(in_sample, baseline)}
+    return entry
+
+
+async def benchmark_size(size: int, args) -> List[Dict]:
+    print(f"Generating {size} contacts")
+    book = generate_contacts(size, duplicate_rate=args.duplicate_rate, seed=args.seed)
+    truth = book.true_pairs()
+    results = []
+
+    sample = baseline_sample(book, args.baseline_limit, args.seed)
+    sample_ids = {contact.id for contact in sample}
+    with Measurement(args.trace_memory) as measurement:
+        baseline, pair_count = brute_force_pairs(sample)
+    results.append(result_entry(
+        size, 'brute_force_sample', measurement, pair_count,
+        baseline, baseline, sample_ids, book.true_pairs(sample_ids)
+    ))
+
+    with tempfile.TemporaryDirectory() as directory:
+        session_factory = await init_db(f"sqlite+aiosqlite:///{os.path.join(directory, 'bench.db')}")
+        await load_book(session_factory, book)
+
+        for method, kwargs in (('find_duplicates', {}), ('find_duplicates_fuzzy', {'fuzzy_names': True})):
+            print(f"Running {method} on {size} contacts")
+            with Measurement(args.trace_memory) as measurement:
+                found, candidate_pairs, name_index = await run_find_duplicates(
+                    session_factory, args.workers, **kwargs
+                )
+            entry = result_entry(size, method, measurement, candidate_pairs, found, baseline, sample_ids, truth)
+            if name_index:
+                entry['name_index'] = name_index
+            results.append(entry)
+
+        await session_factory.kw['bind'].dispose()
+
+    if size <= args.matcher_limit:
+        print(f"Running ContactMatcher.find_matches on {size} contacts")
+        with Measurement(args.trace_memory) as measurement:
+            found, candidate_pairs = run_find_matches(book.contacts)
+        results.append(result_entry(
+            size, 'matcher_find_matches', measurement, candidate_pairs, found, None, None, truth
+        ))
+
+    for entry in results:
+        print(summary_line(entry))
+    return results
+
+
+def summary_line(entry: Dict) -> str:
+    line = (
+        f"{entry['size']:>8} {entry['method']:24} {entry['wall_seconds']:>9.2f}s "
+        f"{entry['pairs_per_second'] or 0:>12} pairs/s"
+    )
+    if entry['peak_memory_mb'] is not None:
+        line += f" {entry['peak_memory_mb']:>8.1f} MB"
+    if 'baseline' in entry and entry['baseline']['recall'] is not None:
+        line += f"  baseline recall {entry['baseline']['recall']:.3f}"
+    if entry['truth']['recall'] is not None:
+        line += f"  truth recall {entry['truth']['recall']:.3f}"
+    if entry['truth']['precision'] is not None:
+        line += f" precision {entry['truth']['precision']:.3f}"
+    if 'name_index' in entry:
+        line += f"  name index {entry['name_index']['candidate_pairs']} pairs"
+    return line
+
+
+def compare_results(previous: Dict, current: Dict, tolerance: float) -> List[str]:
+    """Describe runs that got slower or less accurate than in ``previous``."""
+    earlier = {(entry['size'], entry['method']): entry for entry in previous['results']}
+    regressions = []
+    for entry in current['results']:
+        before = earlier.get((entry['size'], entry['method']))
+        if before is None:
+            continue
+        name = f"{entry['method']} at {entry['size']}"
+        if entry['wall_seconds'] > before['wall_seconds'] * (1 + tolerance):
+            regressions.append(f"{name}: {before['wall_seconds']:.2f}s -> {entry['wall_seconds']:.2f}s")
+        for measure in ('baseline', 'truth'):
+            old = before.get(measure, {}).get('recall')
+            new = entry.get(measure, {}).get('recall')
+            if old is not None and new is not None and new < old - tolerance / 10:
+                regressions.append(f"{name}: {measure} recall {old:.3f} -> {new:.3f}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark duplicate detection speed and accuracy")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="Contact book sizes to generate")
+    parser.add_argument('--duplicate-rate', type=float, default=0.2,
+                        help="Share of generated contacts that duplicate an earlier one")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Worker processes for find_duplicates (default: CPU count)")
+    parser.add_argument('--baseline-limit', type=int, default=BASELINE_LIMIT,
+                        help="Contacts in the brute-force baseline sample")
+    parser.add_argument('--matcher-limit', type=int, default=MATCHER_LIMIT,
+                        help="Largest book ContactMatcher.find_matches is run on")
+    parser.add_argument('--no-trace-memory', dest='trace_memory', action='store_false',
+                        help="Skip tracemalloc, which slows runs down, and only report max RSS")
+    parser.add_argument('--output', default='dedup_benchmark.json', help="Where to write the JSON results")
+    parser.add_argument('--compare', help="Earlier results file to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed relative slowdown before --compare reports a regression")
+    return parser.parse_args(argv)
+
+
+async def main(argv=None) -> int:
+    args = parse_args(argv)
+    results = []
+    for size in args.sizes:
+        results.extend(await benchmark_size(size, args))
+
+    report = {
+        'generated_at': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'settings': {
+            'duplicate_rate': args.duplicate_rate,
+            'seed': args.seed,
+            'workers': args.workers,
+            'baseline_limit': args.baseline_limit,
+            'trace_memory': args.trace_memory,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        regressions = compare_results(previous, report, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
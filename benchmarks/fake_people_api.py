@@ -0,0 +1,312 @@
+"""A local stand-in for the Google People API connections endpoint.
+
+Serves ``people/me/connections`` with paging, ``personFields``,
+``fields`` partial responses and sync tokens like the real API, including deleted-person tombstones in incremental
+results and its EXPIRED_SYNC_TOKEN errors, so Gmail syncs can be
+benchmarked at any size without a Google account:
+
+    with FakePeopleAPI(generate_people(50000)) as api:
+        source.service = api.build_service()
+"""
+import base64
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.synthetic import generate_contacts
+
+# Largest page the real API returns
+MAX_PAGE_SIZE = 1000
+
+CONNECTIONS_PATH = '/v1/people/me/connections'
+
+COMPANIES = ['Acme', 'Globex', 'Initech', 'Umbrella', 'Hooli', 'Stark Industries', 'Wayne Enterprises']
+TITLES = ['Engineer', 'Manager', 'Director', 'Consultant', 'Designer', 'Analyst']
+
+
+def generate_people(count: int, seed: int = 0) -> List[Dict]:
+    """People API person resources for a synthetic contact book.
+
+    Fields carry the same per-value metadata and formatted variants as
+    real responses, so payload sizes are realistic.
+    """
+    rng = random.Random(seed)
+    people = []
+    for number, contact in enumerate(generate_contacts(count, seed=seed).contacts):
+        source_id = f'{rng.getrandbits(64):x}'
+
+        def field_metadata(primary=True):
+            return {'primary': primary, 'source': {'type': 'CONTACT', 'id': source_id}}
+
+        person = {
+            'resourceName': f'people/c{number}',
+            'metadata': {
+                'sources': [{'type': 'CONTACT', 'id': source_id, 'etag': f'#{source_id}',
+                             'updateTime': '2024-05-01T12:00:00.000Z'}],
+                'objectType': 'PERSON',
+            },
+            'names': [{
+                'metadata': field_metadata(),
+                'displayName': f'{contact.first_name} {contact.last_name}',
+                'familyName': contact.last_name,
+                'givenName': contact.first_name,
+                'displayNameLastFirst': f'{contact.last_name}, {contact.first_name}',
+                'unstructuredName': f'{contact.first_name} {contact.last_name}',
+            }],
+        }
+        if contact.email:
+            person['emailAddresses'] = [{'metadata': field_metadata(), 'value': contact.email,
+                                         'type': 'home', 'formattedType': 'Home'}]
+        if contact.phone:
+            digits = ''.join(c for c in contact.phone if c.isdigit())[-10:]
+            person['phoneNumbers'] = [{'metadata': field_metadata(), 'value': contact.phone,
+                                       'canonicalForm': f'+1{digits}', 'type': 'mobile', 'formattedType': 'Mobile'}]
+        if rng.random() < 0.5:
+            person['organizations'] = [{'metadata': field_metadata(), 'type': 'work', 'formattedType': 'Work',
+                                        'name': rng.choice(COMPANIES), 'title': rng.choice(TITLES)}]
+        if rng.random() < 0.2:
+            street = f'{rng.randint(1, 999)} Main St'
+            person['addresses'] = [{'metadata': field_metadata(), 'formattedValue': f'{street}\nSpringfield, IL',
+                                    'type': 'home', 'formattedType': 'Home', 'streetAddress': street,
+                                    'city': 'Springfield', 'region': 'IL', 'country': 'US', 'countryCode': 'US'}]
+        if rng.random() < 0.1:
+            person['biographies'] = [{'metadata': field_metadata(), 'value': 'Met at a conference',
+                                      'contentType': 'TEXT_PLAIN'}]
+        if rng.random() < 0.1:
+            person['birthdays'] = [{'metadata': field_metadata(),
+                                    'date': {'month': rng.randint(1, 12), 'day': rng.randint(1, 28)}}]
+        people.append(person)
+    return people
+
+
+def parse_fields(mask: str) -> Dict:
+    """Parse a partial response mask such as ``a,b(c,d/e)`` into a tree of dicts.
+
+    An empty dict selects everything below that point.
+    """
+    root: Dict = {}
+    stack = [root]
+    name = ''
+
+    def add(path: str) -> Dict:
+        node = stack[-1]
+        for part in path.strip().split('/'):
+            node = node.setdefault(part, {})
+        return node
+
+    for char in mask:
+        if char == ',':
+            if name.strip():
+                add(name)
+            name = ''
+        elif char == '(':
+            stack.append(add(name))
+            name = ''
+        elif char == ')':
+            if name.strip():
+                add(name)
+            stack.pop()
+            name = ''
+        else:
+            name += char
+    if name.strip():
+        add(name)
+    return root
+
+
+def project(value, tree: Dict):
+    """Keep only the parts of a response selected by a parse_fields() tree."""
+    if not tree:
+        return value
+    if isinstance(value, list):
+        return [project(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {key: project(value[key], subtree) for key, subtree in tree.items() if key in value}
+    return value
+
+
+def _encode_token(value: Dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+
+def _decode_token(token: str) -> Dict:
+    return json.loads(base64.urlsafe_b64decode(token.encode()))
+
+
+class FakePeopleAPI:
+    """People API server on localhost, running on a background thread.
+
+    Every change made through update(), add() or delete() bumps a version
+    number; a sync token is the version it was issued at, so an incremental
+    listing returns everyone changed after it. Tokens issued before
+    expire_sync_tokens() was last called are rejected like the real API
+    rejects week-old ones: 400 FAILED_PRECONDITION, reason
+    EXPIRED_SYNC_TOKEN.
+    ``latency`` seconds are added to every response, like a real network.
+    """
+
+    def __init__(self, people: Iterable[Dict] = (), latency: float = 0.0):
+        self.latency = latency
+        self.version = 0
+        self.people: Dict[str, Dict] = {}
+        # Version of each person's last change, deleted people included
+        self.changed_at: Dict[str, int] = {}
+        self.deleted = set()
+        self.min_sync_version = 0
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        for person in people:
+            self._store(person)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                api._handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def build_service(self):
+        """A googleapiclient People service that talks to this server."""
+        import httplib2
+        from googleapiclient.discovery import build
+        return build(
+            'people', 'v1', http=httplib2.Http(), static_discovery=True,
+            client_options={'api_endpoint': self.url}
+        )
+
+    def _store(self, person: Dict):
+        self.version += 1
+        resource_name = person['resourceName']
+        person['etag'] = f'%{self.version}'
+        self.people[resource_name] = person
+        self.changed_at[resource_name] = self.version
+        self.deleted.discard(resource_name)
+
+    def update(self, resource_name: str, **fields):
+        """Replace top-level fields of a person, e.g. names=[...]."""
+        with self._lock:
+            self._store(dict(self.people[resource_name], **fields))
+
+    def add(self, person: Dict):
+        with self._lock:
+            self._store(dict(person))
+
+    def delete(self, resource_name: str):
+        with self._lock:
+            self.version += 1
+            del self.people[resource_name]
+            self.changed_at[resource_name] = self.version
+            self.deleted.add(resource_name)
+
+    def expire_sync_tokens(self):
+        """Make every sync token issued so far invalid, like a week passing."""
+        with self._lock:
+            self.min_sync_version = self.version + 1
+
+    def _handle(self, handler: BaseHTTPRequestHandler):
+        url = urlparse(handler.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        if url.path != CONNECTIONS_PATH:
+            self._send(handler, 404, {'error': {'code': 404, 'message': 'Not found', 'status': 'NOT_FOUND'}})
+            return
+        if 'personFields' not in params:
+            self._send(handler, 400, {'error': {
+                'code': 400, 'message': 'personFields mask is required.', 'status': 'INVALID_ARGUMENT'
+            }})
+            return
+        with self._lock:
+            status, body = self._list(params)
+        if self.latency:
+            time.sleep(self.latency)
+        self._send(handler, status, body)
+
+    def _list(self, params: Dict[str, str]):
+        page_size = min(int(params.get('pageSize', 100)), MAX_PAGE_SIZE)
+        fields = set(params['personFields'].split(',')) | {'resourceName', 'etag', 'metadata'}
+
+        if 'pageToken' in params:
+            page = _decode_token(params['pageToken'])
+        else:
+            # Pages are cut from the people as they were on the first request
+            page = {'offset': 0, 'since': None, 'version': self.version}
+            if 'syncToken' in params:
+                page['since'] = int(params['syncToken'])
+        since = page['since']
+        if since is not None and since < self.min_sync_version:
+            return 400, {'error': {
+                'code': 400,
+                'message': 'Sync token is expired. Clear local cache and retry call without the sync token.',
+                'status': 'FAILED_PRECONDITION',
+                'details': [{
+                    '@type': 'type.googleapis.com/google.rpc.ErrorInfo',
+                    'reason': 'EXPIRED_SYNC_TOKEN',
+                    'domain': 'people.googleapis.com',
+                }],
+            }}
+
+        names = sorted(
+            name for name, version in self.changed_at.items()
+            if version <= page['version'] and (since is None or version > since)
+            and (since is not None or name not in self.deleted)
+        )
+        connections = []
+        for name in names[page['offset']:page['offset'] + page_size]:
+            if name in self.deleted:
+                connections.append({'resourceName': name, 'etag': f'%{self.changed_at[name]}',
+                                    'metadata': {'deleted': True, 'objectType': 'PERSON'}})
+            else:
+                person = self.people[name]
+                connections.append({key: value for key, value in person.items() if key in fields})
+
+        body = {'connections': connections, 'totalItems': len(names), 'totalPeople': len(self.people)}
+        next_offset = page['offset'] + page_size
+        if next_offset < len(names):
+            body['nextPageToken'] = _encode_token(dict(page, offset=next_offset))
+        elif params.get('requestSyncToken') == 'true':
+            body['nextSyncToken'] = str(page['version'])
+        if 'fields' in params:
+            body = project(body, parse_fields(params['fields']))
+        return 200, body
+
+    def _send(self, handler: BaseHTTPRequestHandler, status: int, body: Dict):
+        data = json.dumps(body).encode()
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += len(data)
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json; charset=UTF-8')
+        handler.send_header('Content-Length', str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
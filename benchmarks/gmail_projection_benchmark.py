@@ -0,0 +1,102 @@
+"""Gmail projection profile benchmark.
+
+Syncs the same synthetic account from a local fake People API once per
+projection profile, each into a fresh SQLite database, and reports the
+bytes downloaded, stored metadata and database file size against the
+full profile. Run from the project root:
+
+    python -m benchmarks.gmail_projection_benchmark --contacts 50000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+# Add the project root to Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.append(project_root)
+# The sources import the manager as core.contact_manager
+sys.path.append(str(Path(project_root) / 'src'))
+
+from sqlalchemy import func, select
+from src.core.contact_manager import ContactManager
+from src.db.database import init_db
+from src.db.writer import DatabaseWriter
+from src.models.contact_model import ContactModel
+from src.sources.gmail_source import PROJECTION_PROFILES, GmailContactSource
+from benchmarks.fake_people_api import FakePeopleAPI, generate_people
+
+DEFAULT_CONTACTS = 50000
+
+
+def _file_size(path: str) -> int:
+    return sum(os.path.getsize(p) for p in (path, path + '-wal') if os.path.exists(p))
+
+
+async def measure(api: FakePeopleAPI, profile: str, directory: str) -> Dict:
+    path = os.path.join(directory, f'{profile}.db')
+    session_factory = await init_db(f"sqlite+aiosqlite:///{path}")
+    writer = DatabaseWriter(session_factory)
+    writer.start()
+    sent = api.bytes_sent
+    try:
+        async with session_factory() as session:
+            manager = ContactManager(session, writer=writer)
+            source = GmailContactSource(projection=profile)
+            # Per-contact logging would dominate the timings
+            source.logger.setLevel(logging.WARNING)
+            source.service = api.build_service()
+            await manager.add_source(source)
+            report = await manager.sync_all_sources()
+            if report.failed_sources:
+                raise RuntimeError(report.summary())
+            metadata_bytes = (await session.execute(
+                select(func.sum(func.length(ContactModel.contact_metadata)))
+            )).scalar()
+    finally:
+        await writer.close()
+        await session_factory.kw['bind'].dispose()
+    return {
+        'profile': profile,
+        'seconds': report.seconds,
+        'downloaded': api.bytes_sent - sent,
+        'metadata': metadata_bytes or 0,
+        'database': _file_size(path),
+    }
+
+
+def print_results(results: List[Dict]):
+    full = next(result for result in results if result['profile'] == 'full')
+
+    def cell(result, key):
+        return f"{result[key] / 1e6:>8.1f} MB ({result[key] / full[key]:>4.0%})"
+
+    print(f"{'profile':<10} {'time':>7}  {'downloaded':>17}  {'stored metadata':>17}  {'database file':>17}")
+    for result in results:
+        print(
+            f"{result['profile']:<10} {result['seconds']:>6.1f}s  {cell(result, 'downloaded')}  "
+            f"{cell(result, 'metadata')}  {cell(result, 'database')}"
+        )
+
+
+async def benchmark(contacts: int):
+    print(f"Generating {contacts} people...")
+    with FakePeopleAPI(generate_people(contacts)) as api, tempfile.TemporaryDirectory() as directory:
+        results = [await measure(api, profile, directory) for profile in PROJECTION_PROFILES]
+    print_results(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--contacts', type=int, default=DEFAULT_CONTACTS,
+                        help=f"People in the fake account (default: {DEFAULT_CONTACTS})")
+    args = parser.parse_args()
+    asyncio.run(benchmark(args.contacts))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Gmail sync benchmark against a local fake People API.
+
+Runs a full sync of a synthetic account, a no-op incremental sync, an
+incremental sync after edits, additions and deletions, and a sync with an
+expired token, checking the database against the fake account after each.
+Run from the project root:
+
+    python -m benchmarks.gmail_sync_benchmark --contacts 50000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict
+
+# Add the project root to Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.append(project_root)
+# The sources import the manager as core.contact_manager
+sys.path.append(str(Path(project_root) / 'src'))
+
+from src.core.contact_manager import ContactManager, SyncReport
+from src.db.database import init_db
+from src.db.writer import DatabaseWriter
+from src.sources.gmail_source import GmailContactSource
+from benchmarks.fake_people_api import FakePeopleAPI, generate_people
+
+DEFAULT_CONTACTS = 50000
+
+# Seconds added to each fake API response; real People API pages of 1000
+# people take about this long
+DEFAULT_LATENCY = 0.3
+
+# Share of the account edited, added and deleted before the incremental sync
+CHANGE_RATE = 0.01
+
+
+def mutate(api: FakePeopleAPI, changes: int) -> Dict[str, int]:
+    """Edit, add and delete ``changes`` people each."""
+    names = sorted(api.people)
+    for name in names[:changes]:
+        person = api.people[name]
+        given = person['names'][0]['givenName']
+        api.update(name, names=[dict(person['names'][0], givenName=given + 'x')])
+    for number, person in enumerate(generate_people(changes, seed=1)):
+        api.add(dict(person, resourceName=f'people/new{number}'))
+    for name in names[-changes:]:
+        api.delete(name)
+    return {'updated': changes, 'added': changes, 'deleted': changes}
+
+
+async def run_sync(manager: ContactManager, api: FakePeopleAPI, label: str) -> SyncReport:
+    requests, sent = api.requests, api.bytes_sent
+    report = await manager.sync_all_sources()
+    result = report.sources[0]
+    if not result.ok:
+        raise RuntimeError(f"{label} sync failed: {result.error}")
+    stored = await manager.contacts.count()
+    mode = 'incremental' if result.incremental else 'full'
+    print(
+        f"{label:<22} {mode:<11} {report.seconds:>7.2f}s (waiting {result.fetch_seconds:>5.2f}s, "
+        f"saving {result.save_seconds:>5.2f}s)  {result.fetched:>7} fetched "
+        f"{result.save.inserted:>7} new {result.save.updated:>6} updated {result.deleted:>5} deleted  "
+        f"{api.requests - requests:>4} requests {(api.bytes_sent - sent) / 1e6:>7.1f} MB"
+    )
+    if stored != len(api.people):
+        raise AssertionError(f"{label}: {stored} contacts stored, account has {len(api.people)}")
+    return report
+
+
+async def benchmark(contacts: int, database_url: str, latency: float = DEFAULT_LATENCY):
+    print(f"Generating {contacts} people...")
+    with FakePeopleAPI(generate_people(contacts), latency=latency) as api:
+        session_factory = await init_db(database_url)
+        writer = DatabaseWriter(session_factory)
+        writer.start()
+        try:
+            async with session_factory() as session:
+                manager = ContactManager(session, writer=writer)
+                source = GmailContactSource()
+                # Per-contact logging would dominate the timings
+                source.logger.setLevel(logging.WARNING)
+                source.service = api.build_service()
+                await manager.add_source(source)
+
+                await run_sync(manager, api, 'Full sync')
+                report = await run_sync(manager, api, 'No changes')
+                assert report.sources[0].incremental and report.sources[0].fetched == 0
+
+                changes = max(1, int(contacts * CHANGE_RATE))
+                expected = mutate(api, changes)
+                report = await run_sync(manager, api, f'{changes} of each change')
+                result = report.sources[0]
+                assert result.deleted == expected['deleted'], result
+                assert result.save.inserted == expected['added'], result
+                assert result.save.updated == expected['updated'], result
+
+                # People deleted while the token was expired are found by the full resync
+                api.expire_sync_tokens()
+                expected = mutate(api, changes)
+                report = await run_sync(manager, api, 'Expired token')
+                result = report.sources[0]
+                assert not result.incremental
+                assert result.deleted == expected['deleted'], result
+        finally:
+            await writer.close()
+            await session_factory.kw['bind'].dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--contacts', type=int, default=DEFAULT_CONTACTS,
+                        help=f"People in the fake account (default: {DEFAULT_CONTACTS})")
+    parser.add_argument('--latency', type=float, default=DEFAULT_LATENCY,
+                        help=f"Seconds added to each API response (default: {DEFAULT_LATENCY})")
+    parser.add_argument('--database-url', help="Database to sync into (default: a temporary SQLite file)")
+    args = parser.parse_args()
+
+    if args.database_url:
+        asyncio.run(benchmark(args.contacts, args.database_url, args.latency))
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        database_url = f"sqlite+aiosqlite:///{os.path.join(directory, 'contacts.db')}"
+        asyncio.run(benchmark(args.contacts, database_url, args.latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import random
+from dataclasses import dataclass, field
+from typing import Dict, List, Set, Tuple
+from src.core.contact_manager import Contact
+
+FIRST_NAMES = [
+    'James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David', 'Elizabeth',
+    'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Charles', 'Karen',
+    'Christopher', 'Lisa', 'Daniel', 'Nancy', 'Matthew', 'Betty', 'Anthony', 'Margaret', 'Mark', 'Sandra',
+    'Donald', 'Ashley', 'Steven', 'Kimberly', 'Paul', 'Emily', 'Andrew', 'Donna', 'Joshua', 'Michelle',
+    'Kenneth', 'Carol', 'Kevin', 'Amanda', 'Brian', 'Dorothy', 'George', 'Melissa', 'Timothy', 'Deborah',
+    'Ronald', 'Stephanie', 'Edward', 'Rebecca', 'Jason', 'Sharon', 'Jeffrey', 'Laura', 'Ryan', 'Cynthia',
+    'Jacob', 'Kathleen', 'Gary', 'Amy', 'Nicholas', 'Angela', 'Eric', 'Shirley', 'Jonathan', 'Anna',
+    'Stephen', 'Brenda', 'Larry', 'Pamela', 'Justin', 'Emma', 'Scott', 'Nicole', 'Brandon', 'Helen',
+    'Benjamin', 'Samantha', 'Samuel', 'Katherine', 'Gregory', 'Christine', 'Alexander', 'Debra', 'Frank', 'Rachel',
+    'Patrick', 'Carolyn', 'Raymond', 'Janet', 'Jack', 'Catherine', 'Dennis', 'Maria', 'Jerry', 'Heather',
+]
+
+# Last names are built from syllables so large books don't collapse into a
+# handful of enormous name blocks
+LAST_NAME_SYLLABLES = [
+    'an', 'ber', 'cal', 'der', 'el', 'fal', 'gor', 'han', 'ing', 'jor', 'kel', 'lan', 'mor', 'nel',
+    'os', 'par', 'quin', 'ros', 'son', 'tor', 'ul', 'van', 'wel', 'yar', 'zen', 'bright', 'stone',
+    'field', 'wood', 'ford', 'ley', 'ton', 'man', 'berg', 'ski', 'ez', 'ini', 'ov', 'ard', 'ell',
+]
+
+EMAIL_DOMAINS = ['gmail.com', 'yahoo.com', 'outlook.com', 'example.org', 'company.com', 'mail.net']
+
+SOURCES = ['gmail', 'csv_yahoo', 'csv_outlook', 'carddav']
+
+# Ways a duplicate differs from the contact it copies
+VARIATIONS = ('typo', 'phone_format', 'email_case', 'swapped_names')
+
+PHONE_FORMATS = [
+    '({area}) {exchange}-{line}',
+    '{area}-{exchange}-{line}',
+    '{area}.{exchange}.{line}',
+    '+1 {area} {exchange} {line}',
+    '{area}{exchange}{line}',
+]
+
+
+@dataclass
+class SyntheticBook:
+    """Generated contacts plus the duplicate pairs injected into them."""
+    contacts: List[Contact]
+    # Contact id -> id of the person it belongs to
+    entities: Dict[str, int]
+    variations: Dict[str, List[str]] = field(default_factory=dict)
+
+    def true_pairs(self, contact_ids: Set[str] = None) -> Set[Tuple[str, str]]:
+        """Injected duplicate pairs, optionally only those within ``contact_ids``."""
+        by_entity: Dict[int, List[str]] = {}
+        for contact_id, entity in self.entities.items():
+            if contact_ids is None or contact_id in contact_ids:
+                by_entity.setdefault(entity, []).append(contact_id)
+        pairs = set()
+        for members in by_entity.values():
+            for i, id1 in enumerate(members):
+                for id2 in members[i + 1:]:
+                    pairs.add(ordered_pair(id1, id2))
+        return pairs
+
+
+def ordered_pair(id1: str, id2: str) -> Tuple[str, str]:
+    return (id1, id2) if id1 < id2 else (id2, id1)
+
+
+def _last_name(rng: random.Random) -> str:
+    syllables = rng.randint(2, 3)
+    return ''.join(rng.choice(LAST_NAME_SYLLABLES) for _ in range(syllables)).title()
+
+
+def _typo(rng: random.Random, word: str) -> str:
+    """Apply one substitution, deletion, insertion or transposition."""
+    if len(word) < 3:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    operation = rng.choice(('substitute', 'delete', 'insert', 'transpose'))
+    letter = rng.choice('abcdefghijklmnopqrstuvwxyz')
+    if operation == 'substitute':
+        return word[:i] + letter + word[i + 1:]
+    if operation == 'delete':
+        return word[:i] + word[i + 1:]
+    if operation == 'insert':
+        return word[:i] + letter + word[i:]
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def _phone(rng: random.Random) -> Tuple[str, str, str]:
+    return f"{rng.randint(201, 989)}", f"{rng.randint(200, 999)}", f"{rng.randint(0, 9999):04d}"
+
+
+def _vary(rng: random.Random, original: Contact, contact_id: str,
+          phone_parts: Tuple[str, str, str]) -> Tuple[Contact, List[str]]:
+    """A copy of ``original`` with at least one variation applied."""
+    chosen = [v for v in VARIATIONS if rng.random() < 0.4] or [rng.choice(VARIATIONS)]
+    first_name, last_name, email, phone = original.first_name, original.last_name, original.email, original.phone
+
+    if 'typo' in chosen:
+        if rng.random() < 0.5:
+            first_name = _typo(rng, first_name)
+        else:
+            last_name = _typo(rng, last_name)
+    if 'phone_format' in chosen and phone:
+        area, exchange, line = phone_parts
+        phone = rng.choice(PHONE_FORMATS).format(area=area, exchange=exchange, line=line)
+    if 'email_case' in chosen and email:
+        local, domain = email.split('@', 1)
+        email = f"{local.title()}@{domain.upper()}" if rng.random() < 0.5 else email.upper()
+    if 'swapped_names' in chosen:
+        first_name, last_name = last_name, first_name
+
+    return Contact(
+        id=contact_id,
+        first_name=first_name,
+        last_name=last_name,
+        email=email,
+        phone=phone,
+        source=rng.choice(SOURCES),
+        source_id=contact_id,
+        metadata={}
+    ), chosen
+
+
+def generate_contacts(count: int, duplicate_rate: float = 0.2, seed: int = 0) -> SyntheticBook:
+    """Generate ``count`` contacts, about ``duplicate_rate`` of them duplicates.
+
+    Every duplicate copies an earlier contact with one or more of
+    ``VARIATIONS`` applied: a typo in the first or last name, a reformatted
+    phone number, a case-changed email or swapped first and last names.
+    """
+    rng = random.Random(seed)
+    contacts = []
+    entities = {}
+    variations = {}
+    originals = []
+
+    while len(contacts) < count:
+        contact_id = f"synthetic_{len(contacts)}"
+
+        if originals and rng.random() < duplicate_rate:
+            entity = rng.randrange(len(originals))
+            original, phone_parts = originals[entity]
+            contact, chosen = _vary(rng, original, contact_id, phone_parts)
+            variations[contact_id] = chosen
+        else:
+            entity = len(originals)
+            first_name = rng.choice(FIRST_NAMES)
+            last_name = _last_name(rng)
+            phone_parts = _phone(rng)
+            email = None
+            if rng.random() < 0.85:
+                suffix = rng.randint(1, 999) if rng.random() < 0.5 else ''
+                email = f"{first_name}.{last_name}{suffix}@{rng.choice(EMAIL_DOMAINS)}".lower()
+            phone = PHONE_FORMATS[0].format(area=phone_parts[0], exchange=phone_parts[1], line=phone_parts[2])
+            contact = Contact(
+                id=contact_id,
+                first_name=first_name,
+                last_name=last_name,
+                email=email,
+                phone=phone if rng.random() < 0.7 else None,
+                source=rng.choice(SOURCES),
+                source_id=contact_id,
+                metadata={}
+            )
+            originals.append((contact, phone_parts))
+
+        contacts.append(contact)
+        entities[contact_id] = entity
+
+    return SyntheticBook(contacts=contacts, entities=entities, variations=variations)
@@ -1,10 +1,16 @@
 from .contact_manager import Contact, ContactSource, ContactManager
 from .matcher import ContactMatcher, MatchScore
+from .clustering import DuplicateGroup
+from .scoring import ScoringPipeline, Rule, RuleStats
 
 __all__ = [
     'Contact',
     'ContactSource',
     'ContactManager',
     'ContactMatcher',
-    'MatchScore'
+    'MatchScore',
+    'DuplicateGroup',
+    'ScoringPipeline',
+    'Rule',
+    'RuleStats'
 ] 
\ No newline at end of file
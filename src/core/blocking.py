@@ -0,0 +1,98 @@
+from bisect import bisect_right
+from collections import defaultdict
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence, Set, Tuple
+from src.core.normalize import fields_for
+
+
+def blocking_keys(contact) -> List[str]:
+    """Return the blocking keys a contact is filed under.
+
+    Two contacts are only compared when they share at least one key, so every
+    rule in ``ContactManager._calculate_similarity`` that can produce a match
+    needs a key that puts both contacts in the same block.
+    """
+    fields = fields_for(contact)
+    keys = []
+
+    if fields.email_lower:
+        keys.append(f"email:{fields.email_lower}")
+    if fields.email_local:
+        keys.append(f"local:{fields.email_local}")
+    if fields.phone_last7:
+        keys.append(f"phone:{fields.phone_last7}")
+
+    if fields.name_normalized:
+        first_name, last_name = fields.name_normalized.split(' ', 1)
+        if first_name and last_name:
+            # Last name plus first initial tolerates nicknames and typos in
+            # the rest of the first name ("Jon" vs "John")
+            keys.append(f"name:{last_name}:{first_name[0]}")
+
+    return keys
+
+
+def first_shared_key(keys1: Sequence[str], keys2: Sequence[str]) -> Optional[str]:
+    """The first of ``keys1`` that also appears in ``keys2``."""
+    for key in keys1:
+        if key in keys2:
+            return key
+    return None
+
+
+def block_pairs(key: str, members: Sequence[str], keys: Mapping[str, Sequence[str]],
+                changed: Optional[Set[str]] = None,
+                leading: Optional[int] = None) -> Iterator[Tuple[str, str]]:
+    """Yield the pairs of a block that should be scored in it.
+
+    A pair sharing several keys is only emitted from the block of the first
+    key they have in common, so every pair is scored exactly once without a
+    set of seen pairs. When ``changed`` is given, pairs where neither contact
+    changed are skipped. With ``leading``, only the pairs of the first
+    ``leading`` members with the members after them are yielded.
+    """
+    if changed is not None:
+        changed_positions = [j for j, member in enumerate(members) if member in changed]
+    for i, id1 in enumerate(members[:leading]):
+        if changed is None or id1 in changed:
+            others = members[i+1:]
+        else:
+            later = changed_positions[bisect_right(changed_positions, i):]
+            others = [members[j] for j in later]
+        keys1 = keys[id1]
+        for id2 in others:
+            if first_shared_key(keys1, keys[id2]) == key:
+                yield id1, id2
+
+
+class BlockingIndex:
+    """Groups contacts by blocking key and yields the pairs worth scoring."""
+
+    def __init__(self):
+        self.blocks: Dict[str, List[str]] = defaultdict(list)
+        self.keys: Dict[str, List[str]] = {}
+
+    def add(self, contact):
+        """File a contact under each of its blocking keys."""
+        keys = blocking_keys(contact)
+        self.keys[contact.id] = keys
+        for key in keys:
+            self.blocks[key].append(contact.id)
+
+    def candidate_blocks(self, changed: Optional[Set[str]] = None) -> List[Tuple[str, List[str]]]:
+        """Blocks with at least one pair to score.
+
+        With ``changed``, only blocks containing a changed contact are kept.
+        """
+        blocks = []
+        for key, members in self.blocks.items():
+            if len(members) < 2:
+                continue
+            if changed is not None and not any(member in changed for member in members):
+                continue
+            blocks.append((key, members))
+        return blocks
+
+    def candidate_pairs(self, changed: Optional[Set[str]] = None) -> Iterator[Tuple[str, str]]:
+        """Yield every pair of contact ids that share a block, exactly once."""
+        for key, members in self.candidate_blocks(changed):
+            yield from block_pairs(key, members, self.keys, changed)
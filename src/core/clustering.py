@@ -0,0 +1,134 @@
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, Iterable, List, Set, Tuple
+
+
+class UnionFind:
+    """Disjoint sets with path compression and union by size."""
+
+    def __init__(self):
+        self.parent: Dict[Hashable, Hashable] = {}
+        self.size: Dict[Hashable, int] = {}
+
+    def find(self, item: Hashable) -> Hashable:
+        if item not in self.parent:
+            self.parent[item] = item
+            self.size[item] = 1
+            return item
+
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        # Point everything on the path straight at the root
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, item1: Hashable, item2: Hashable) -> Hashable:
+        root1 = self.find(item1)
+        root2 = self.find(item2)
+        if root1 == root2:
+            return root1
+        if self.size[root1] < self.size[root2]:
+            root1, root2 = root2, root1
+        self.parent[root2] = root1
+        self.size[root1] += self.size[root2]
+        return root1
+
+
+@dataclass(eq=False)
+class DuplicateGroup:
+    """Contacts connected by duplicate matches, with the matches that link them."""
+    contacts: List = field(default_factory=list)
+    matches: List[Tuple] = field(default_factory=list)
+    _contact_ids: Set = field(default_factory=set, repr=False)
+
+    def add_match(self, match: Tuple):
+        self.matches.append(match)
+        for contact in match[:2]:
+            if contact.id not in self._contact_ids:
+                self._contact_ids.add(contact.id)
+                self.contacts.append(contact)
+
+    def absorb(self, other: 'DuplicateGroup'):
+        """Take over the matches of a group that turned out to be connected."""
+        for match in other.matches:
+            self.add_match(match)
+
+    @property
+    def min_confidence(self) -> float:
+        return min(match[2] for match in self.matches)
+
+    @property
+    def max_confidence(self) -> float:
+        return max(match[2] for match in self.matches)
+
+    @property
+    def mean_confidence(self) -> float:
+        return sum(match[2] for match in self.matches) / len(self.matches)
+
+    @property
+    def reasons(self) -> List[str]:
+        """Distinct match reasons, in the order they first appear."""
+        return list(dict.fromkeys(reason for match in self.matches for reason in match[3]))
+
+
+class DuplicateClusterer:
+    """Builds duplicate groups incrementally as matches arrive."""
+
+    def __init__(self):
+        self._clusters = UnionFind()
+        self._groups: Dict[Hashable, DuplicateGroup] = {}
+
+    @property
+    def groups(self) -> List[DuplicateGroup]:
+        return list(self._groups.values())
+
+    def add(self, matches: Iterable[Tuple]) -> Tuple[List[DuplicateGroup], List[DuplicateGroup]]:
+        """Add ``(contact1, contact2, confidence, reasons)`` matches.
+
+        Returns the groups that were created or grew, and the groups that
+        were absorbed into another group and no longer exist.
+        """
+        changed: Dict[int, DuplicateGroup] = {}
+        absorbed: Dict[int, DuplicateGroup] = {}
+        created: Set[int] = set()
+
+        for match in matches:
+            root1 = self._clusters.find(match[0].id)
+            root2 = self._clusters.find(match[1].id)
+            group = self._groups.pop(root1, None)
+            other = self._groups.pop(root2, None) if root2 != root1 else None
+
+            if group is None:
+                group, other = other, None
+            if group is None:
+                group = DuplicateGroup()
+                created.add(id(group))
+            if other is not None:
+                group.absorb(other)
+                changed.pop(id(other), None)
+                # Groups created during this call were never handed out
+                if id(other) not in created:
+                    absorbed[id(other)] = other
+
+            group.add_match(match)
+            self._groups[self._clusters.union(root1, root2)] = group
+            changed[id(group)] = group
+
+        return list(changed.values()), list(absorbed.values())
+
+    def remove(self, group: DuplicateGroup):
+        """Forget a group, e.g. once its contacts were merged."""
+        self._groups.pop(self._clusters.find(group.contacts[0].id), None)
+
+
+def group_duplicates(matches: List[Tuple]) -> List[DuplicateGroup]:
+    """Merge ``(contact1, contact2, confidence, reasons)`` matches into groups.
+
+    Contacts are grouped by connected component, so ten copies of one person
+    become a single group instead of 45 pairs. Groups are ordered by their
+    strongest match.
+    """
+    clusterer = DuplicateClusterer()
+    clusterer.add(sorted(matches, key=lambda m: m[2], reverse=True))
+    return sorted(clusterer.groups, key=lambda g: (g.max_confidence, len(g.contacts)), reverse=True)
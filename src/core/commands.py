@@ -2,6 +2,12 @@ from dataclasses import dataclass
 from typing import Dict, Any, Optional
 from datetime import datetime
 
+# Contact columns MergeCommand restores on undo
+MERGE_UNDO_COLUMNS = (
+    'id', 'first_name', 'last_name', 'email', 'phone', 'source', 'source_id', 'contact_metadata',
+    'company', 'title', 'notes'
+)
+
 @dataclass
 class Command:
     """Base class for all commands"""
@@ -26,33 +32,13 @@ class MergeCommand(Command):
     original_target: Optional[Dict] = None
     
     async def execute(self):
-        # Store original state for undo
-        async with self.manager.db.begin():
-            from src.models.contact_model import ContactModel
-            source = await self.manager.db.get(ContactModel, self.source_id)
-            target = await self.manager.db.get(ContactModel, self.target_id)
-            
-            self.original_source = {
-                'id': source.id,
-                'first_name': source.first_name,
-                'last_name': source.last_name,
-                'email': source.email,
-                'phone': source.phone,
-                'source': source.source,
-                'source_id': source.source_id,
-                'contact_metadata': source.contact_metadata
-            }
-            
-            self.original_target = {
-                'id': target.id,
-                'first_name': target.first_name,
-                'last_name': target.last_name,
-                'email': target.email,
-                'phone': target.phone,
-                'source': target.source,
-                'source_id': target.source_id,
-                'contact_metadata': target.contact_metadata
-            }
+        # Store original state for undo, metadata included
+        rows = await self.manager.contacts.get_many(
+            [self.source_id, self.target_id], columns=MERGE_UNDO_COLUMNS
+        )
+        originals = {row.id: row._asdict() for row in rows}
+        self.original_source = originals[self.source_id]
+        self.original_target = originals[self.target_id]
         
         # Perform merge
         await self.manager.merge_contacts(self.source_id, self.target_id, self.merged_data)
@@ -61,15 +47,21 @@ class MergeCommand(Command):
         """Restore contacts to their original state"""
         from src.models.contact_model import ContactModel
         
-        async with self.manager.db.begin():
+        async def restore(session):
             # Restore target contact
-            target = await self.manager.db.get(ContactModel, self.target_id)
+            target = await session.get(ContactModel, self.target_id)
             for key, value in self.original_target.items():
                 setattr(target, key, value)
+            target.update_match_fields()
+            target.updated_at = datetime.utcnow()
             
             # Recreate source contact
             source = ContactModel(**self.original_source)
-            self.manager.db.add(source)
+            source.update_match_fields()
+            source.updated_at = datetime.utcnow()
+            session.add(source)
+        
+        await self.manager.write(restore)
     
     @property
     def description(self) -> str:
@@ -84,10 +76,11 @@ class EditCommand(Command):
     original_data: Optional[Dict] = None
     
     async def execute(self):
-        # Store original state
-        async with self.manager.db.begin():
-            from src.models.contact_model import ContactModel
-            contact = await self.manager.db.get(ContactModel, self.contact_id)
+        from src.models.contact_model import ContactModel
+        
+        async def edit(session):
+            # Store original state
+            contact = await session.get(ContactModel, self.contact_id)
             self.original_data = {
                 'first_name': contact.first_name,
                 'last_name': contact.last_name,
@@ -98,15 +91,22 @@ class EditCommand(Command):
             # Update contact
             for key, value in self.new_data.items():
                 setattr(contact, key, value)
+            contact.update_match_fields()
             contact.updated_at = datetime.utcnow()
+        
+        await self.manager.write(edit)
     
     async def undo(self):
-        async with self.manager.db.begin():
-            from src.models.contact_model import ContactModel
-            contact = await self.manager.db.get(ContactModel, self.contact_id)
+        from src.models.contact_model import ContactModel
+        
+        async def restore(session):
+            contact = await session.get(ContactModel, self.contact_id)
             for key, value in self.original_data.items():
                 setattr(contact, key, value)
+            contact.update_match_fields()
             contact.updated_at = datetime.utcnow()
+        
+        await self.manager.write(restore)
     
     @property
     def description(self) -> str:
@@ -1,9 +1,69 @@
-from typing import List, Dict, Optional, Tuple
-from dataclasses import dataclass
+from typing import List, Dict, Optional, Sequence, Set, Tuple, Callable, AsyncIterator
+from dataclasses import dataclass, field
 from abc import ABC, abstractmethod
-from sqlalchemy import select
+from contextlib import asynccontextmanager
+from sqlalchemy import select, delete, insert, or_, text
 from datetime import datetime
-from thefuzz import fuzz
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from time import monotonic
+import asyncio
+import functools
+import logging
+import os
+from src.core.blocking import BlockingIndex, first_shared_key
+from src.core.clustering import DuplicateGroup, group_duplicates
+from src.core.lsh import LSHStats, MinHashLSH
+from src.core.normalize import MatchFields, content_hash, fields_for, match_fields
+from src.core.scoring import DUPLICATE_RULES, ScoringPipeline
+from src.db.repository import SQL_IN_CHUNK_SIZE, ContactRepository
+from src.db.upsert import copy_upsert, upsert_statement
+from src.db.writer import WritePriority
+from src.db.search import (
+    METADATA_PATHS, SEARCH_DOCUMENT, SEARCH_LIMIT, SEARCH_TABLE, build_search_query, build_tsquery,
+    metadata_search_fields
+)
+from src.core.dedup_worker import (
+    MERGE_THRESHOLD, build_pair_shards, build_shards, block_pair_count, score_shard, to_match_row
+)
+
+logger = logging.getLogger(__name__)
+
+# Below this many candidate pairs, scoring in-process beats starting workers
+PARALLEL_MIN_PAIRS = 200000
+
+# Shards per worker, so a slow shard doesn't leave the other workers idle
+SHARDS_PER_WORKER = 4
+
+# Candidate pairs per shard when scoring in-process
+INLINE_SHARD_PAIRS = 50000
+
+LAST_DUPLICATE_SCAN_KEY = 'duplicates.last_scan'
+
+# App state key of an incremental source's sync token, by source name
+SYNC_TOKEN_KEY = 'sync_token.{}'
+
+# Columns loaded for duplicate detection
+DUPLICATE_SCAN_COLUMNS = (
+    'id', 'first_name', 'last_name', 'email', 'phone', 'source', 'source_id',
+    'created_at', 'updated_at'
+) + MatchFields._fields
+
+# Sources fetched at the same time during a sync
+DEFAULT_SYNC_CONCURRENCY = 4
+
+# Seconds a source may take to fetch and save its contacts before the sync
+# gives up on it
+DEFAULT_SOURCE_TIMEOUT = 300.0
+
+# Threads shared by all sources for their blocking client calls
+SOURCE_IO_THREADS = 8
+
+# Contact fields written by save_contacts and covered by the content hash
+CONTACT_FIELDS = ('first_name', 'last_name', 'email', 'phone', 'contact_metadata')
+
+# Columns a save overwrites on existing contacts; source, source_id and
+# created_at keep their stored values
+UPSERT_COLUMNS = CONTACT_FIELDS + MatchFields._fields + tuple(METADATA_PATHS) + ('content_hash', 'updated_at')
 
 @dataclass
 class Contact:
@@ -15,12 +75,176 @@ class Contact:
     source: str
     source_id: str
     metadata: Dict
+    # Normalized match fields, when loaded from the database
+    match: Optional[MatchFields] = field(default=None, repr=False, compare=False)
+    # Cached by get_content_hash(); sources may fill it in themselves
+    content_hash: Optional[str] = field(default=None, repr=False, compare=False)
+    
+    def get_content_hash(self) -> str:
+        """Hash of the fields and metadata, compared to skip no-op writes."""
+        if self.content_hash is None:
+            self.content_hash = content_hash(
+                self.first_name, self.last_name, self.email, self.phone, self.metadata
+            )
+        return self.content_hash
+
+@dataclass
+class SaveResult:
+    """Outcome of ContactManager.save_contacts."""
+    inserted: int = 0
+    updated: int = 0
+    # Already stored with the same content hash, so not written
+    skipped: int = 0
+    # Error message of each contact that couldn't be saved, by id
+    errors: Dict[str, str] = field(default_factory=dict)
+    
+    @property
+    def saved(self) -> int:
+        return self.inserted + self.updated + self.skipped
+    
+    @property
+    def failed(self) -> List[str]:
+        return list(self.errors)
+    
+    def add(self, inserted: int, updated: int, skipped: int):
+        self.inserted += inserted
+        self.updated += updated
+        self.skipped += skipped
+
+@dataclass
+class SourceSyncResult:
+    """How syncing one source went."""
+    source: str
+    fetched: int = 0
+    save: SaveResult = field(default_factory=SaveResult)
+    # Contacts removed because the source reported them deleted
+    deleted: int = 0
+    # Only changes since the last sync were fetched
+    incremental: bool = False
+    fetch_seconds: float = 0.0
+    save_seconds: float = 0.0
+    error: Optional[str] = None
+    timed_out: bool = False
+    
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+    
+    @property
+    def seconds(self) -> float:
+        return self.fetch_seconds + self.save_seconds
+
+@dataclass
+class SyncProgress:
+    """Where one source's sync is at, passed to the sync_all_sources progress callback."""
+    source: str
+    pages: int = 0
+    fetched: int = 0
+    saved: int = 0
+    done: bool = False
+    
+    def describe(self) -> str:
+        if self.done:
+            return f"{self.source}: {self.saved} contacts saved"
+        return f"{self.source}: {self.pages} pages fetched, {self.saved}/{self.fetched} contacts saved"
+
+@dataclass
+class SyncReport:
+    """Outcome of ContactManager.sync_all_sources, one entry per source."""
+    sources: List[SourceSyncResult] = field(default_factory=list)
+    seconds: float = 0.0
+    
+    @property
+    def fetched(self) -> int:
+        return sum(result.fetched for result in self.sources)
+    
+    @property
+    def saved(self) -> int:
+        return sum(result.save.saved for result in self.sources)
+    
+    @property
+    def failed_sources(self) -> List[SourceSyncResult]:
+        return [result for result in self.sources if not result.ok]
+    
+    @property
+    def failed_contacts(self) -> int:
+        """Fetched contacts that couldn't be saved, over all sources."""
+        return sum(len(result.save.errors) for result in self.sources)
+    
+    def summary(self) -> str:
+        """One line per source plus a total, for logs and message boxes."""
+        lines = []
+        for result in self.sources:
+            if result.ok:
+                status = (
+                    f"{result.fetched} {'changed' if result.incremental else 'fetched'}, "
+                    f"{result.save.inserted} new, {result.save.updated} updated, "
+                    f"{result.save.skipped} unchanged, {result.deleted} deleted"
+                )
+                if result.save.errors:
+                    contact_id, error = next(iter(result.save.errors.items()))
+                    status += f", {len(result.save.errors)} failed (e.g. {contact_id}: {error})"
+            else:
+                status = f"failed: {result.error}"
+            lines.append(f"{result.source}: {status} ({result.seconds:.1f}s)")
+        lines.append(
+            f"Synced {self.saved} contacts from "
+            f"{len(self.sources) - len(self.failed_sources)}/{len(self.sources)} sources "
+            f"in {self.seconds:.1f}s"
+        )
+        return '\n'.join(lines)
 
 class ContactSource(ABC):
+    # Created on first use and shared by every source
+    _io_executor: Optional[ThreadPoolExecutor] = None
+    
+    # Sources that can fetch only what changed since their last sync set
+    # this. The manager stores their token between syncs: it sets
+    # sync_token before fetch_contacts(), which returns the new and changed
+    # contacts, lists the removed ones in deleted_contact_ids and leaves the
+    # token for the next sync in next_sync_token. A sync_token of None, or
+    # one the source rejects, means a full fetch.
+    incremental = False
+    sync_token: Optional[str] = None
+    next_sync_token: Optional[str] = None
+    deleted_contact_ids: Sequence[str] = ()
+    
+    @classmethod
+    def io_executor(cls) -> ThreadPoolExecutor:
+        if ContactSource._io_executor is None:
+            ContactSource._io_executor = ThreadPoolExecutor(
+                max_workers=SOURCE_IO_THREADS, thread_name_prefix='contact-source'
+            )
+        return ContactSource._io_executor
+    
+    async def run_blocking(self, func: Callable, *args, **kwargs):
+        """Run a blocking client call on the shared source threads and await its result.
+        
+        Network clients like googleapiclient, requests, imaplib and caldav
+        block; calling them directly from fetch_contacts() would freeze the
+        event loop, and with it the window and every other source. ``func``
+        runs off the GUI thread, so it must not create or show widgets.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.io_executor(), functools.partial(func, *args, **kwargs))
+    
     @abstractmethod
     async def fetch_contacts(self) -> List[Contact]:
         pass
     
+    async def iter_contact_batches(self, progress: Optional[Callable[[int, int], None]] = None
+                                   ) -> AsyncIterator[List[Contact]]:
+        """Yield the fetched contacts in batches, calling ``progress(pages, contacts)`` as they arrive.
+        
+        Sources that fetch page by page override this, so each page can be
+        saved while the next one downloads. By default the whole result of
+        fetch_contacts() is one batch.
+        """
+        contacts = await self.fetch_contacts()
+        if progress:
+            progress(1, len(contacts))
+        yield contacts
+    
     @abstractmethod
     async def push_contacts(self, contacts: List[Contact]) -> bool:
         pass
@@ -32,196 +256,646 @@ class MergeSuggestion:
     reasons: List[str]
 
 class ContactManager:
-    def __init__(self, db_session):
+    def __init__(self, db_session=None, max_workers: Optional[int] = None, writer=None,
+                 session_factory=None):
         self.db = db_session
+        # With a session factory every operation opens a session of its own
+        # instead of using self.db, so concurrent tasks, e.g. in the GUI,
+        # can share the manager
+        self.session_factory = session_factory
+        if db_session is None and session_factory is None:
+            raise ValueError("ContactManager needs a session or a session factory")
+        # A DatabaseWriter that all writes go through; without one they run
+        # in a transaction of their own
+        self.writer = writer
+        # Keeps writes without a writer from sharing self.db's transaction
+        self._write_lock = asyncio.Lock()
         self.sources: Dict[str, ContactSource] = {}
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.scorer = ScoringPipeline(DUPLICATE_RULES)
+        self.name_index_stats: Optional[LSHStats] = None
+    
+    @property
+    def contacts(self) -> ContactRepository:
+        """Read access to the contacts table, through a new session when there is a session factory."""
+        if self.session_factory is not None:
+            # Each query runs in a transaction of its own, which returns the
+            # connection, so the session needs no closing
+            return ContactRepository(self.session_factory())
+        return ContactRepository(self.db)
+    
+    @asynccontextmanager
+    async def _session(self):
+        """A new session from the session factory, or else self.db."""
+        if self.session_factory is None:
+            yield self.db
+        else:
+            async with self.session_factory() as session:
+                yield session
+    
+    async def write(self, operation, priority: WritePriority = WritePriority.INTERACTIVE):
+        """Run ``operation(session)`` in a write transaction and return its result."""
+        if self.writer is not None:
+            return await self.writer.submit(operation, priority)
+        async with self._write_lock:
+            async with self._session() as session:
+                async with session.begin():
+                    return await operation(session)
+    
+    async def add_source(self, source: ContactSource, name: Optional[str] = None):
+        """Register a contact source under ``name``, by default its class name.
+        
+        The name keys the source's sync token and the contacts its syncs
+        own, so give each account of the same kind its own.
+        """
+        self.sources[name or source.__class__.__name__] = source
+    
+    async def sync_all_sources(self, concurrency: int = DEFAULT_SYNC_CONCURRENCY,
+                               timeout: Optional[float] = DEFAULT_SOURCE_TIMEOUT,
+                               progress: Optional[Callable[[SyncProgress], None]] = None) -> SyncReport:
+        """Fetch contacts from all sources, up to ``concurrency`` at a time, and save them.
+        
+        Each batch a source yields is saved as soon as it arrives, while the
+        source goes on fetching. A source that raises, or isn't done
+        ``timeout`` seconds after it started, only fails itself; the report
+        lists every source in registration order with its counts, durations
+        and error. ``progress`` is called with a SyncProgress whenever a
+        source fetches or saves more contacts.
+        
+        Saved contacts are marked as owned by the source's name. Incremental
+        sources get the sync token stored by their last sync, and the
+        contacts they report deleted are removed; after a full fetch, so
+        are the contacts they own that it left out. Their new token is
+        stored only once every contact saved, so failed changes are fetched
+        again next time.
+        """
+        started = monotonic()
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        # Read up front, as the tasks below can't share self.db for reads
+        sync_tokens = {
+            name: await self._get_state(SYNC_TOKEN_KEY.format(name))
+            for name, source in self.sources.items() if source.incremental
+        }
+        
+        def report_progress(state: SyncProgress):
+            if progress:
+                progress(state)
+        
+        async def sync_source(name: str, source: ContactSource) -> SourceSyncResult:
+            result = SourceSyncResult(name)
+            state = SyncProgress(name)
+            fetched_ids = set()
+            if source.incremental:
+                source.sync_token = sync_tokens[name]
+                source.next_sync_token = None
+                source.deleted_contact_ids = ()
+            
+            def fetch_progress(pages: int, fetched: int):
+                state.pages, state.fetched = pages, fetched
+                report_progress(state)
+            
+            async def fetch_and_save(batches):
+                while True:
+                    fetch_started = monotonic()
+                    try:
+                        batch = await batches.__anext__()
+                    except StopAsyncIteration:
+                        break
+                    finally:
+                        result.fetch_seconds += monotonic() - fetch_started
+                    
+                    result.fetched += len(batch)
+                    save_started = monotonic()
+                    try:
+                        saved = await self.save_contacts(batch, sync_source=name)
+                    finally:
+                        result.save_seconds += monotonic() - save_started
+                    result.save.add(saved.inserted, saved.updated, saved.skipped)
+                    result.save.errors.update(saved.errors)
+                    fetched_ids.update(contact.id for contact in batch)
+                    state.saved = result.save.saved
+                    report_progress(state)
+                
+                if source.incremental:
+                    # The source clears the token when it had to fetch everything
+                    result.incremental = source.sync_token is not None
+                    result.deleted = await self._finish_incremental_sync(
+                        name, source, fetched_ids, complete=not result.save.errors
+                    )
+            
+            async with semaphore:
+                batches = source.iter_contact_batches(fetch_progress)
+                try:
+                    # One deadline for the whole source, its fetching and saving
+                    # alike, however many batches it takes
+                    await asyncio.wait_for(fetch_and_save(batches), timeout)
+                except asyncio.TimeoutError:
+                    result.timed_out = True
+                    result.error = f"timed out after {timeout:g}s"
+                except Exception as e:
+                    result.error = str(e) or e.__class__.__name__
+                finally:
+                    await batches.aclose()
+            state.done = True
+            report_progress(state)
+            return result
+        
+        results = await asyncio.gather(*(
+            sync_source(name, source) for name, source in self.sources.items()
+        ))
+        return SyncReport(list(results), seconds=monotonic() - started)
     
-    async def add_source(self, source: ContactSource):
-        """Register a new contact source with a unique identifier."""
-        source_id = source.__class__.__name__
-        self.sources[source_id] = source
+    async def _finish_incremental_sync(self, name: str, source: ContactSource, fetched_ids: Set[str],
+                                       complete: bool) -> int:
+        """Delete the contacts a source removed and store its next sync token.
+        
+        Nothing but the source's own deletions is applied unless
+        ``complete``, i.e. every fetched contact was saved. A token the
+        source dropped, e.g. because it expired, is removed even then, so
+        the next sync doesn't send it again.
+        """
+        from src.models.contact_model import ContactModel
+        
+        reported_ids = list(source.deleted_contact_ids)
+        token = source.next_sync_token if complete else None
+        # A full fetch lists everyone, so stored contacts it left out were
+        # deleted while the source couldn't report it, e.g. its token expired.
+        # Other sources may tag their contacts the same, e.g. two Gmail
+        # accounts, so only contacts this source's syncs saved are candidates
+        kept_ids = fetched_ids if complete and source.sync_token is None else None
+        
+        async def finish(session):
+            deleted_ids = reported_ids
+            if kept_ids is not None:
+                stored = await session.execute(
+                    select(ContactModel.id).where(ContactModel.sync_source == name)
+                )
+                deleted_ids = deleted_ids + [contact_id for contact_id, in stored if contact_id not in kept_ids]
+            deleted = await self._delete_contacts(session, deleted_ids)
+            if token is not None:
+                await self._set_state(session, SYNC_TOKEN_KEY.format(name), token)
+            elif source.sync_token is None:
+                await self._clear_state(session, SYNC_TOKEN_KEY.format(name))
+            return deleted
+        
+        return await self.write(finish, WritePriority.BULK)
     
-    async def sync_all_sources(self):
-        """Fetch and merge contacts from all sources."""
-        all_contacts = []
-        print(f"Starting sync with {len(self.sources)} sources")
-        for source in self.sources.values():
+    async def save_contacts(self, contacts: List[Contact], batch_size: int = 1000,
+                            priority: WritePriority = WritePriority.BULK,
+                            sync_source: Optional[str] = None) -> SaveResult:
+        """Insert new contacts and update changed ones, ``batch_size`` per transaction.
+        
+        Each batch is one SELECT of the stored content hashes plus one
+        INSERT ... ON CONFLICT(id) DO UPDATE for the new and changed
+        contacts; contacts whose hash matches are skipped, so their
+        updated_at stays put and nothing is written for them. When a batch
+        fails, its contacts are retried one by one and the ones that still
+        fail are returned in ``errors`` with their error message, and
+        logged. Batches are written with ``priority``
+        when the manager has a DatabaseWriter. A sync passes the name of its
+        source as ``sync_source``, which marks the contacts as owned by it;
+        a contact that changed owner is written even if its hash matches.
+        
+        (source, source_id) is unique: a contact whose pair is already
+        stored under another id updates that row, and its ``id`` is set to
+        the stored one.
+        """
+        # The last version of a contact listed twice, by id or by source id, wins
+        contacts = list({contact.id: contact for contact in contacts}.values())
+        contacts = list({
+            (contact.source, contact.source_id) if contact.source_id is not None else contact.id: contact
+            for contact in contacts
+        }.values())
+        result = SaveResult()
+        for start in range(0, len(contacts), batch_size):
+            batch = contacts[start:start + batch_size]
             try:
-                print(f"Fetching contacts from {source.__class__.__name__}")
-                contacts = await source.fetch_contacts()
-                print(f"Fetched {len(contacts)} contacts")
-                # Save to database
-                for contact in contacts:
+                counts = await self.write(lambda session: self._save_batch(session, batch, sync_source), priority)
+            except Exception as e:
+                logger.warning("Error saving batch of %d contacts, retrying one by one: %s", len(batch), e)
+                for contact in batch:
                     try:
-                        await self._save_contact(contact)
-                        all_contacts.append(contact)
+                        counts = await self.write(
+                            lambda session: self._save_batch(session, [contact], sync_source), priority
+                        )
                     except Exception as e:
-                        print(f"Error saving contact {contact.id}: {str(e)}")
-            except Exception as e:
-                print(f"Error syncing source {source.__class__.__name__}: {str(e)}")
-        print(f"Successfully synced {len(all_contacts)} contacts")
-        return all_contacts
+                        logger.error("Error saving contact %s: %s", contact.id, e)
+                        result.errors[contact.id] = str(e) or e.__class__.__name__
+                    else:
+                        result.add(*counts)
+            else:
+                result.add(*counts)
+        return result
     
-    async def _save_contact(self, contact: Contact):
-        """Save contact to database or update if it already exists."""
+    async def _save_batch(self, session, contacts: List[Contact],
+                          sync_source: Optional[str] = None) -> Tuple[int, int, int]:
+        """Upsert the new and changed contacts; returns (inserted, updated, skipped)."""
         from src.models.contact_model import ContactModel
         
-        # Check if contact already exists
-        async with self.db.begin():
-            # Look for existing contact
-            stmt = select(ContactModel).where(ContactModel.id == contact.id)
-            result = await self.db.execute(stmt)
-            existing_contact = result.scalar_one_or_none()
-            
-            if existing_contact:
-                # Update existing contact
-                existing_contact.first_name = contact.first_name
-                existing_contact.last_name = contact.last_name
-                existing_contact.email = contact.email
-                existing_contact.phone = contact.phone
-                existing_contact.contact_metadata = contact.metadata
-                existing_contact.updated_at = datetime.utcnow()
+        table = ContactModel.__table__
+        now = datetime.utcnow()
+        dialect = session.bind.dialect.name
+        # Only syncs set the owner; other saves leave it as stored
+        owner_columns = ('sync_source',) if sync_source is not None else ()
+        update_columns = UPSERT_COLUMNS + owner_columns
+        await self._adopt_stored_ids(session, contacts)
+        
+        if dialect == 'postgresql':
+            # COPY the whole batch and let the merge compare content hashes
+            # and owners
+            rows = [self._contact_row(contact, now, sync_source) for contact in contacts]
+            inserted, updated = await copy_upsert(
+                session, table, rows, update_columns, ('content_hash',) + owner_columns
+            )
+            return inserted, updated, len(rows) - inserted - updated
+        
+        rows = []
+        inserted = updated = skipped = 0
+        
+        existing = await ContactRepository(session).get_many(
+            (contact.id for contact in contacts), columns=('id', 'content_hash', 'sync_source')
+        )
+        stored = {row.id: row for row in existing}
+        
+        for contact in contacts:
+            if contact.id not in stored:
+                inserted += 1
+            elif (stored[contact.id].content_hash != contact.get_content_hash()
+                  or sync_source not in (None, stored[contact.id].sync_source)):
+                updated += 1
             else:
-                # Create new contact
-                contact_model = ContactModel(
-                    id=contact.id,
-                    first_name=contact.first_name,
-                    last_name=contact.last_name,
-                    email=contact.email,
-                    phone=contact.phone,
-                    source=contact.source,
-                    source_id=contact.source_id,
-                    contact_metadata=contact.metadata,
-                    created_at=datetime.utcnow(),
-                    updated_at=datetime.utcnow()
-                )
-                self.db.add(contact_model)
+                skipped += 1
+                continue
+            rows.append(self._contact_row(contact, now, sync_source))
+        
+        if rows:
+            await session.execute(upsert_statement(dialect, table, update_columns), rows)
+        return inserted, updated, skipped
+    
+    @staticmethod
+    async def _adopt_stored_ids(session, contacts: List[Contact]):
+        """Give contacts the id their (source, source_id) is already stored under.
         
-        await self.db.commit()
+        The upsert conflicts on the id, so without this a source reporting a
+        stored contact under a new id would break the unique index.
+        """
+        keyed = [contact for contact in contacts if contact.source_id is not None]
+        if not keyed:
+            return
+        rows = await ContactRepository(session).get_by_source_ids(
+            {(contact.source, contact.source_id) for contact in keyed}, columns=('id', 'source', 'source_id')
+        )
+        stored_ids = {(row.source, row.source_id): row.id for row in rows}
+        for contact in keyed:
+            contact.id = stored_ids.get((contact.source, contact.source_id), contact.id)
+    
+    @staticmethod
+    def _contact_row(contact: Contact, now: datetime, sync_source: Optional[str] = None) -> Dict:
+        """The contacts table row a save writes for a contact."""
+        row = {
+            'id': contact.id,
+            'first_name': contact.first_name,
+            'last_name': contact.last_name,
+            'email': contact.email,
+            'phone': contact.phone,
+            'source': contact.source,
+            'source_id': contact.source_id,
+            'contact_metadata': contact.metadata,
+            'created_at': now,
+            'updated_at': now,
+            'content_hash': contact.get_content_hash(),
+            **match_fields(contact.first_name, contact.last_name, contact.email, contact.phone)._asdict(),
+            **metadata_search_fields(contact.metadata)
+        }
+        if sync_source is not None:
+            row['sync_source'] = sync_source
+        return row
+    
+    async def _save_contact(self, contact: Contact):
+        """Save contact to database or update if it already exists."""
+        result = await self.save_contacts([contact], priority=WritePriority.INTERACTIVE)
+        if result.errors:
+            raise RuntimeError(f"Failed to save contact {contact.id}: {result.errors[contact.id]}")
     
-    async def find_duplicates(self) -> List[Tuple[Contact, Contact, float, List[str]]]:
-        """Find potential duplicate contacts using fuzzy matching."""
+    async def find_duplicates(self, exhaustive: bool = False, rescan: bool = False,
+                              progress: Optional[Callable[[int, int], None]] = None,
+                              fuzzy_names: bool = False
+                              ) -> List[Tuple[Contact, Contact, float, List[str]]]:
+        """Find potential duplicate contacts using fuzzy matching.
+        
+        Collects everything iter_duplicates yields, sorted by confidence.
+        """
         duplicates = []
+        async for matches in self.iter_duplicates(exhaustive=exhaustive, rescan=rescan, progress=progress,
+                                                  fuzzy_names=fuzzy_names):
+            duplicates.extend(matches)
+        return sorted(duplicates, key=lambda x: x[2], reverse=True)
+    
+    async def iter_duplicates(self, exhaustive: bool = False, rescan: bool = False,
+                              progress: Optional[Callable[[int, int], None]] = None,
+                              fuzzy_names: bool = False
+                              ) -> AsyncIterator[List[Tuple[Contact, Contact, float, List[str]]]]:
+        """Yield batches of potential duplicates as soon as they are scored.
+        
+        Only contacts sharing a blocking key (email, last 7 phone digits or
+        name) are compared. Pass ``exhaustive=True`` to compare every pair,
+        e.g. to check the recall of the blocking stage. ``fuzzy_names=True``
+        also compares contacts whose names are close according to a MinHash
+        index over name n-grams, catching typos the blocking keys miss; its
+        size is kept in ``name_index_stats``. Use ``rescan=True`` after
+        switching it on, so unchanged contacts are compared too.
+        
+        Scored pairs are kept in the duplicate_candidates table. Later scans
+        only re-score contacts created or updated since the previous scan,
+        against their block neighbours, and yield the still valid stored
+        pairs first; ``rescan=True`` scores everything.
+        
+        Large scans are split into shards of blocks scored in a process pool,
+        and each shard's matches are yielded when it finishes.
+        ``progress(done, total)`` is called with candidate pair counts as
+        shards finish. Cancelling the
+        consuming task or closing the iterator drops the shards not yet
+        started; results are only stored once the scan has run to completion. Per-rule statistics add up in
+        ``scorer.stats`` and are logged at debug level after each scan.
+        """
+        from src.models.duplicate_model import DuplicateCandidateModel
+        
+        scan_started = datetime.utcnow()
         contacts = []
+        changed_ids = []
+        
+        watermark = await self._get_state(LAST_DUPLICATE_SCAN_KEY)
+        if watermark is not None:
+            watermark = datetime.fromisoformat(watermark)
+        
+        # Stream the scalar columns, metadata isn't needed to find duplicates
+        async for db_contact in self.contacts.iter_contacts(columns=DUPLICATE_SCAN_COLUMNS):
+            contact = Contact(
+                id=db_contact.id,
+                first_name=db_contact.first_name,
+                last_name=db_contact.last_name,
+                email=db_contact.email,
+                phone=db_contact.phone,
+                source=db_contact.source,
+                source_id=db_contact.source_id,
+                metadata=None,
+                match=MatchFields(*(getattr(db_contact, name) for name in MatchFields._fields))
+            )
+            contacts.append(contact)
+            if self._changed_since(db_contact, watermark):
+                changed_ids.append(contact.id)
         
-        # Get all contacts from database
-        async with self.db.begin():
-            from src.models.contact_model import ContactModel
-            stmt = select(ContactModel)
-            result = await self.db.execute(stmt)
-            db_contacts = result.scalars().all()
+        if exhaustive:
+            # Compare all contacts with each other
+            for i, contact1 in enumerate(contacts):
+                duplicates = []
+                for contact2 in contacts[i+1:]:
+                    result = self.scorer.score(contact1, contact2)
+                    if result.confidence > MERGE_THRESHOLD:
+                        duplicates.append((contact1, contact2, result.confidence, result.reasons()))
+                if duplicates:
+                    yield duplicates
+            return
+        
+        full_scan = rescan or watermark is None
+        contacts_by_id = {contact.id: contact for contact in contacts}
+        changed = None if full_scan else set(changed_ids)
+        stale_ids = set(changed_ids)
+        
+        if not full_scan:
+            # Stored pairs of unchanged contacts that still exist remain valid
+            kept = []
+            async with self._reading() as session:
+                result = await session.execute(select(DuplicateCandidateModel))
+                for candidate in result.scalars().all():
+                    contact1 = contacts_by_id.get(candidate.contact_id_1)
+                    contact2 = contacts_by_id.get(candidate.contact_id_2)
+                    if contact1 is None or contact2 is None:
+                        stale_ids.add(candidate.contact_id_1)
+                        stale_ids.add(candidate.contact_id_2)
+                    elif contact1.id not in changed and contact2.id not in changed:
+                        kept.append((contact1, contact2, candidate.confidence, candidate.reasons or []))
+            if kept:
+                yield kept
+        
+        def find_candidates():
+            # Only compare contacts that share a blocking key
+            index = BlockingIndex()
+            for contact in contacts:
+                index.add(contact)
+            blocks = index.candidate_blocks(changed)
+            name_pairs = self._fuzzy_name_pairs(contacts, index, changed) if fuzzy_names else []
+            return index, blocks, name_pairs
+        
+        def describe(matches):
+            # Reason text is only built for pairs above the threshold
+            duplicates = []
+            for id1, id2, _ in matches:
+                contact1 = contacts_by_id[id1]
+                contact2 = contacts_by_id[id2]
+                # Already counted in the matcher's statistics
+                result = self.scorer.score(contact1, contact2, record=False)
+                duplicates.append((contact1, contact2, result.confidence, result.reasons()))
+            return duplicates
+        
+        # Both run on a thread, like the scoring, so a large book doesn't
+        # hold up the event loop
+        loop = asyncio.get_running_loop()
+        index, blocks, name_pairs = await loop.run_in_executor(None, find_candidates)
+        
+        new_duplicates = []
+        scored = self._iter_scored_blocks(blocks, index, contacts, changed, progress, name_pairs)
+        try:
+            async for matches in scored:
+                duplicates = await loop.run_in_executor(None, describe, matches)
+                new_duplicates.extend(duplicates)
+                if duplicates:
+                    yield duplicates
+        finally:
+            # Stops the workers now rather than whenever the generator is collected
+            await scored.aclose()
+        
+        async def store_results(session):
+            if full_scan:
+                await session.execute(delete(DuplicateCandidateModel))
+            else:
+                await self._invalidate_duplicate_candidates(session, stale_ids)
             
-            # Convert to Contact objects
-            for db_contact in db_contacts:
-                contact = Contact(
-                    id=db_contact.id,
-                    first_name=db_contact.first_name,
-                    last_name=db_contact.last_name,
-                    email=db_contact.email,
-                    phone=db_contact.phone,
-                    source=db_contact.source,
-                    source_id=db_contact.source_id,
-                    metadata=db_contact.contact_metadata
-                )
-                contacts.append(contact)
+            # One executemany rather than an ORM object per pair
+            if new_duplicates:
+                await session.execute(insert(DuplicateCandidateModel.__table__), [
+                    {
+                        'contact_id_1': contact1.id,
+                        'contact_id_2': contact2.id,
+                        'confidence': confidence,
+                        'reasons': reasons,
+                        'scored_at': scan_started
+                    }
+                    for contact1, contact2, confidence, reasons in new_duplicates
+                ])
+            await self._set_state(session, LAST_DUPLICATE_SCAN_KEY, scan_started.isoformat())
         
-        # Compare all contacts with each other
-        for i, contact1 in enumerate(contacts):
-            for contact2 in contacts[i+1:]:
-                confidence, reasons = self._calculate_similarity(contact1, contact2)
-                if confidence > 0.5:  # Threshold for suggesting merge
-                    duplicates.append((contact1, contact2, confidence, reasons))
+        await self.write(store_results, WritePriority.BULK)
         
-        return sorted(duplicates, key=lambda x: x[2], reverse=True)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Duplicate scan rule statistics:\n%s",
+                         '\n'.join(f"  {line}" for line in self.scorer.stats_summary()))
     
-    def _calculate_similarity(self, contact1: Contact, contact2: Contact) -> Tuple[float, List[str]]:
-        """Calculate similarity between two contacts with improved matching logic."""
-        scores = []
-        reasons = []
-        
-        # Strong identifiers (high confidence matches)
-        if contact1.email and contact2.email:
-            if contact1.email.lower() == contact2.email.lower():
-                return 1.0, ["Identical email addresses"]
-        
-        if contact1.phone and contact2.phone:
-            phone1 = ''.join(filter(str.isdigit, contact1.phone))
-            phone2 = ''.join(filter(str.isdigit, contact2.phone))
-            if phone1 == phone2 and len(phone1) >= 10:  # Full phone number match
-                return 1.0, ["Identical phone numbers"]
-        
-        # Name matching with context
-        has_full_name1 = bool(contact1.first_name and contact1.last_name)
-        has_full_name2 = bool(contact2.first_name and contact2.last_name)
-        
-        if has_full_name1 and has_full_name2:
-            # Both contacts have full names
-            first_name_score = fuzz.ratio(contact1.first_name.lower(), contact2.first_name.lower()) / 100
-            last_name_score = fuzz.ratio(contact1.last_name.lower(), contact2.last_name.lower()) / 100
-            
-            if first_name_score > 0.8 and last_name_score > 0.8:
-                # Both names match strongly
-                scores.append(0.9)
-                reasons.append(f"Similar full names: {contact1.first_name} {contact1.last_name} ≈ {contact2.first_name} {contact2.last_name}")
-            elif first_name_score > 0.8 and last_name_score < 0.3:
-                # Same first name but very different last names - likely different people
-                return 0.0, []
+    async def find_duplicate_groups(self, **kwargs) -> List[DuplicateGroup]:
+        """Find duplicates and merge matching pairs into groups of the same person.
+        
+        Takes the same arguments as find_duplicates.
+        """
+        return group_duplicates(await self.find_duplicates(**kwargs))
+    
+    def _fuzzy_name_pairs(self, contacts: List[Contact], index: BlockingIndex,
+                          changed: Optional[set]) -> List[Tuple[str, str]]:
+        """Pairs with similar names according to MinHashLSH that share no blocking key."""
+        name_index = MinHashLSH()
+        for contact in contacts:
+            name = fields_for(contact).name_normalized
+            if name:
+                name_index.add(contact.id, name)
+        
+        pairs = [
+            (id1, id2)
+            for id1, id2 in name_index.candidate_pairs(changed)
+            # Pairs sharing a blocking key are already scored in that block
+            if first_shared_key(index.keys[id1], index.keys[id2]) is None
+        ]
+        self.name_index_stats = name_index.stats
+        logger.debug("Name index: %s, %d pairs outside blocks", name_index.stats.summary(), len(pairs))
+        return pairs
+    
+    async def _iter_scored_blocks(self, blocks, index: BlockingIndex, contacts: List[Contact],
+                                  changed: Optional[set],
+                                  progress: Optional[Callable[[int, int], None]],
+                                  pairs: Sequence[Tuple[str, str]] = ()
+                                  ) -> AsyncIterator[List[Tuple[str, str, float]]]:
+        """Score candidate blocks and pairs shard by shard, in worker processes when there are enough pairs."""
+        total_pairs = sum(block_pair_count(members) for _, members in blocks) + len(pairs)
+        if progress:
+            progress(0, total_pairs)
+        if not blocks and not pairs:
+            return
+        
+        parallel = self.max_workers > 1 and total_pairs >= PARALLEL_MIN_PAIRS
+        if parallel:
+            shard_count = self.max_workers * SHARDS_PER_WORKER
         else:
-            # At least one contact has partial name
-            if contact1.first_name and contact2.first_name:
-                first_name_score = fuzz.ratio(contact1.first_name.lower(), contact2.first_name.lower()) / 100
-                if first_name_score > 0.8:
-                    # Matching first names with partial info needs supporting evidence
-                    supporting_evidence = []
-                    
-                    # Check for partial phone match
-                    if contact1.phone and contact2.phone:
-                        phone1 = ''.join(filter(str.isdigit, contact1.phone))
-                        phone2 = ''.join(filter(str.isdigit, contact2.phone))
-                        if len(phone1) >= 7 and len(phone2) >= 7:
-                            if phone1[-7:] == phone2[-7:]:
-                                supporting_evidence.append("Matching last 7 digits of phone numbers")
-                    
-                    # Check for similar emails
-                    if contact1.email and contact2.email:
-                        email_score = fuzz.ratio(contact1.email.lower(), contact2.email.lower()) / 100
-                        if email_score > 0.8:
-                            supporting_evidence.append(f"Similar email addresses: {contact1.email} ≈ {contact2.email}")
-                    
-                    if supporting_evidence:
-                        scores.append(0.7)
-                        reasons.append(f"Matching first name ({contact1.first_name}) with supporting evidence:")
-                        reasons.extend(f"  • {evidence}" for evidence in supporting_evidence)
-        
-        # Partial matches that can support other evidence
-        if not scores:  # Only check these if we haven't found stronger matches
-            # Email similarity without exact match
-            if contact1.email and contact2.email:
-                email_score = fuzz.ratio(contact1.email.lower(), contact2.email.lower()) / 100
-                if email_score > 0.9:  # Higher threshold for emails
-                    scores.append(0.6)
-                    reasons.append(f"Very similar email addresses: {contact1.email} ≈ {contact2.email}")
-            
-            # Partial phone number match
-            if contact1.phone and contact2.phone:
-                phone1 = ''.join(filter(str.isdigit, contact1.phone))
-                phone2 = ''.join(filter(str.isdigit, contact2.phone))
-                if len(phone1) >= 7 and len(phone2) >= 7:
-                    if phone1[-7:] == phone2[-7:]:
-                        scores.append(0.5)
-                        reasons.append("Matching last 7 digits of phone numbers")
-        
-        # Calculate overall confidence
-        if not scores:
-            return 0.0, []
-        
-        # Weight the scores based on the number of matching criteria
-        confidence = sum(scores) / len(scores)
-        if len(scores) > 1:
-            # Boost confidence if multiple criteria match
-            confidence = min(confidence + 0.1, 1.0)
-        
-        return confidence, reasons
+            shard_count = total_pairs // INLINE_SHARD_PAIRS + 1
+        
+        def make_shards():
+            rows_by_id = {contact.id: to_match_row(contact) for contact in contacts}
+            shards = build_shards(blocks, rows_by_id, index.keys, shard_count, changed)
+            if pairs:
+                shard_size = -(-len(pairs) // shard_count) if parallel else INLINE_SHARD_PAIRS
+                shards += build_pair_shards(list(pairs), rows_by_id, shard_size)
+            return shards
+        
+        # Shards are built, and scored in-process, on a thread, so the event
+        # loop (the GUI's, under qasync) keeps running meanwhile
+        loop = asyncio.get_running_loop()
+        shards = await loop.run_in_executor(None, make_shards)
+        done_pairs = 0
+        
+        if not parallel:
+            for shard in shards:
+                matches, stats = await loop.run_in_executor(None, score_shard, shard)
+                self.scorer.record_stats(stats)
+                done_pairs += shard.pair_count
+                if progress:
+                    progress(done_pairs, total_pairs)
+                yield matches
+            return
+        
+        executor = ProcessPoolExecutor(max_workers=min(self.max_workers, len(shards)))
+        
+        async def run(shard):
+            shard_matches, stats = await loop.run_in_executor(executor, score_shard, shard)
+            self.scorer.record_stats(stats)
+            return shard.pair_count, shard_matches
+        
+        tasks = []
+        try:
+            tasks = [asyncio.ensure_future(run(shard)) for shard in shards]
+            for finished in asyncio.as_completed(tasks):
+                pair_count, matches = await finished
+                done_pairs += pair_count
+                if progress:
+                    progress(done_pairs, total_pairs)
+                yield matches
+        finally:
+            # On cancellation, an error or the consumer closing the generator,
+            # shards not yet started are dropped; running ones finish in the
+            # background, which split blocks keep short
+            for task in tasks:
+                task.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    @staticmethod
+    def _changed_since(db_contact, watermark: Optional[datetime]) -> bool:
+        """Whether a contact was created or updated after the watermark."""
+        if watermark is None:
+            return True
+        timestamps = [t for t in (db_contact.created_at, db_contact.updated_at) if t is not None]
+        # Rows without timestamps can't be placed relative to the watermark
+        return not timestamps or max(timestamps) > watermark
+    
+    @staticmethod
+    async def _invalidate_duplicate_candidates(session, contact_ids):
+        """Drop stored duplicate pairs involving any of the given contacts."""
+        from src.models.duplicate_model import DuplicateCandidateModel
+        
+        contact_ids = list(contact_ids)
+        for start in range(0, len(contact_ids), SQL_IN_CHUNK_SIZE):
+            chunk = contact_ids[start:start + SQL_IN_CHUNK_SIZE]
+            await session.execute(
+                delete(DuplicateCandidateModel).where(or_(
+                    DuplicateCandidateModel.contact_id_1.in_(chunk),
+                    DuplicateCandidateModel.contact_id_2.in_(chunk)
+                ))
+            )
+    
+    @asynccontextmanager
+    async def _reading(self):
+        """A session to read from, inside its open transaction or else a short one of its own.
+        
+        Reading outside one would leave a transaction begun on self.db that
+        nothing ends, and every later self.db.begin() would fail.
+        """
+        async with self._session() as session:
+            if session.in_transaction():
+                yield session
+            else:
+                async with session.begin():
+                    yield session
+    
+    async def _get_state(self, key: str) -> Optional[str]:
+        from src.models.app_state_model import AppStateModel
+        async with self._reading() as session:
+            state = await session.get(AppStateModel, key)
+        return state.value if state else None
+    
+    @staticmethod
+    async def _set_state(session, key: str, value: str):
+        from src.models.app_state_model import AppStateModel
+        state = await session.get(AppStateModel, key)
+        if state is None:
+            state = AppStateModel(key=key)
+            session.add(state)
+        state.value = value
+        state.updated_at = datetime.utcnow()
+    
+    @staticmethod
+    async def _clear_state(session, key: str):
+        from src.models.app_state_model import AppStateModel
+        await session.execute(delete(AppStateModel).where(AppStateModel.key == key))
+    
+    def _calculate_similarity(self, contact1: Contact, contact2: Contact) -> Tuple[float, List[str]]:
+        """Calculate similarity between two contacts with the duplicate rules."""
+        result = self.scorer.score(contact1, contact2)
+        return result.confidence, result.reasons()
     
     def suggest_merges(self) -> List[Dict]:
         # Generate smart merge suggestions
@@ -232,10 +906,10 @@ class ContactManager:
         from src.models.contact_model import ContactModel
         from datetime import datetime
         
-        async with self.db.begin():
+        async def merge(session):
             # Get both contacts
-            source = await self.db.get(ContactModel, source_id)
-            target = await self.db.get(ContactModel, target_id)
+            source = await session.get(ContactModel, source_id)
+            target = await session.get(ContactModel, target_id)
             
             if not source or not target:
                 raise ValueError("One or both contacts not found")
@@ -245,10 +919,110 @@ class ContactManager:
             target.last_name = merged_data.get('last_name', target.last_name)
             target.email = merged_data.get('email', target.email)
             target.phone = merged_data.get('phone', target.phone)
+            target.update_match_fields()
             target.updated_at = datetime.utcnow()
             
             # Delete source contact
-            await self.db.delete(source)
+            await session.delete(source)
             
-            # Commit changes
-            await self.db.commit()
\ No newline at end of file
+            # Stored duplicate pairs of either contact are no longer valid
+            await self._invalidate_duplicate_candidates(session, [source_id, target_id])
+        
+        await self.write(merge)
+    
+    async def get_contact_metadata(self, contact_id: str) -> Optional[Dict]:
+        """Load the metadata of a single contact, which list queries leave out."""
+        row = await self.contacts.get(contact_id, columns=('contact_metadata',))
+        return row.contact_metadata if row else None
+    
+    async def iter_contacts(self, batch_size: int = 1000) -> AsyncIterator[Contact]:
+        """Stream every stored contact, without metadata, in id order."""
+        async for row in self.contacts.iter_contacts(batch_size):
+            yield Contact(
+                id=row.id,
+                first_name=row.first_name,
+                last_name=row.last_name,
+                email=row.email,
+                phone=row.phone,
+                source=row.source,
+                source_id=row.source_id,
+                metadata=None
+            )
+    
+    async def search_contact_ids(self, search_text: str = '',
+                                 fields: Optional[Dict[str, str]] = None,
+                                 limit: Optional[int] = SEARCH_LIMIT) -> Optional[List[str]]:
+        """Ids of the contacts matching a search, best matches first.
+
+        Words in ``search_text`` are matched as prefixes against names,
+        emails, phones, company, title and notes; ``fields`` maps column
+        names to prefixes that must match in that column. At most ``limit``
+        ids are returned; pass None for all of them, e.g. to filter a list
+        of every contact. Returns None when there is nothing to search for.
+        """
+        async with self._reading() as session:
+            if session.bind.dialect.name != 'sqlite':
+                return await self._search_contact_ids_postgres(session, search_text, fields, limit)
+            
+            query = build_search_query(search_text, fields)
+            if query is None:
+                return None
+            
+            sql = f"SELECT contact_id FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :query ORDER BY rank"
+            params = {'query': query}
+            if limit is not None:
+                sql += " LIMIT :limit"
+                params['limit'] = limit
+            result = await session.execute(text(sql), params)
+            return result.scalars().all()
+    
+    async def _search_contact_ids_postgres(self, session, search_text: str, fields: Optional[Dict[str, str]],
+                                           limit: Optional[int]) -> Optional[List[str]]:
+        """search_contact_ids() through the tsvector index, with ILIKE for single fields."""
+        from src.models.contact_model import ContactModel
+        
+        conditions = []
+        query = build_tsquery(search_text)
+        if query is not None:
+            conditions.append(
+                text(f"{SEARCH_DOCUMENT} @@ to_tsquery('simple', :query)").bindparams(query=query)
+            )
+        for field, value in (fields or {}).items():
+            if value and value.strip():
+                pattern = value.strip().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+                conditions.append(getattr(ContactModel, field).ilike(pattern, escape='\\'))
+        if not conditions:
+            return None
+        
+        result = await session.execute(
+            select(ContactModel.id).where(*conditions).limit(limit)
+        )
+        return result.scalars().all()
+    
+    async def delete_contacts(self, contact_ids: List[str]):
+        """Delete contacts along with any stored duplicate pairs they are part of."""
+        await self.write(lambda session: self._delete_contacts(session, contact_ids))
+    
+    @classmethod
+    async def _delete_contacts(cls, session, contact_ids: List[str]) -> int:
+        """Delete contacts and their duplicate pairs; returns how many contacts existed."""
+        from src.models.contact_model import ContactModel
+        
+        deleted = 0
+        for start in range(0, len(contact_ids), SQL_IN_CHUNK_SIZE):
+            chunk = contact_ids[start:start + SQL_IN_CHUNK_SIZE]
+            result = await session.execute(delete(ContactModel).where(ContactModel.id.in_(chunk)))
+            deleted += result.rowcount
+        await cls._invalidate_duplicate_candidates(session, contact_ids)
+        return deleted
+    
+    async def clear_contacts(self):
+        """Delete every contact and stored duplicate pair."""
+        from src.models.contact_model import ContactModel
+        from src.models.duplicate_model import DuplicateCandidateModel
+        
+        async def clear(session):
+            await session.execute(delete(ContactModel))
+            await session.execute(delete(DuplicateCandidateModel))
+        
+        await self.write(clear)
@@ -0,0 +1,157 @@
+from collections import namedtuple
+from dataclasses import dataclass, field
+from heapq import heapify, heapreplace
+from itertools import chain, islice
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from src.core.blocking import block_pairs
+from src.core.normalize import fields_for
+from src.core.scoring import RuleStats
+
+# Compact stand-in for a contact, cheap to pickle into worker processes
+MatchRow = namedtuple('MatchRow', ['id', 'first_name', 'last_name', 'email', 'phone', 'match'])
+
+# The pairs of a block's first ``leading`` members with the members after
+# them; a whole block when ``leading`` is len(members)
+BlockSlice = namedtuple('BlockSlice', ['key', 'members', 'leading'])
+
+# Minimum confidence for a pair to be suggested as a duplicate
+MERGE_THRESHOLD = 0.5
+
+# Number of candidate pairs handed to ContactMatcher.score_pairs at once
+SCORE_BATCH_SIZE = 50000
+
+
+@dataclass
+class ScoringShard:
+    """A group of candidate block slices, or of loose candidate pairs, scored together by one worker."""
+    blocks: List[BlockSlice]
+    rows: List[MatchRow]
+    keys: Dict[str, List[str]]
+    changed: Optional[Set[str]] = None
+    pairs: List[Tuple[str, str]] = field(default_factory=list)
+
+    @property
+    def pair_count(self) -> int:
+        """Candidate pairs of the shard, counting pairs scored in another block."""
+        return sum(block_pair_count(block.members, block.leading) for block in self.blocks) + len(self.pairs)
+
+
+def to_match_row(contact) -> MatchRow:
+    return MatchRow(
+        contact.id, contact.first_name, contact.last_name, contact.email, contact.phone,
+        fields_for(contact)
+    )
+
+
+def block_pair_count(members: Sequence[str], leading: Optional[int] = None) -> int:
+    """Pairs of a block, or of the slice of it given by ``leading`` as in block_pairs()."""
+    count = len(members)
+    rest = count - min(count, leading) if leading is not None else 0
+    return count * (count - 1) // 2 - rest * (rest - 1) // 2
+
+
+def split_block(key: str, members: List[str], max_pairs: int) -> List[BlockSlice]:
+    """Cut a block into slices of about ``max_pairs`` pairs at most.
+
+    Each slice keeps only the members its pairs involve, so a block of a
+    few thousand members, e.g. a common surname, is spread over several
+    shards instead of keeping one worker busy while the others idle.
+    """
+    slices = []
+    start = 0
+    while start < len(members) - 1:
+        leading = 0
+        pairs = 0
+        # Member start + leading pairs with every member after it
+        while start + leading < len(members) - 1 and (not leading or pairs < max_pairs):
+            pairs += len(members) - 1 - (start + leading)
+            leading += 1
+        slices.append(BlockSlice(key, members[start:], leading))
+        start += leading
+    return slices
+
+
+def build_shards(blocks: List[Tuple[str, List[str]]], rows_by_id: Dict[str, MatchRow],
+                 keys: Dict[str, List[str]], shard_count: int,
+                 changed: Optional[Set[str]] = None) -> List[ScoringShard]:
+    """Spread blocks over ``shard_count`` shards with roughly equal pair counts.
+
+    Blocks with more pairs than a shard's share are split with split_block().
+    """
+    total_pairs = sum(block_pair_count(members) for _, members in blocks)
+    max_pairs = max(1, -(-total_pairs // max(1, shard_count)))
+    slices = [block_slice for key, members in blocks for block_slice in split_block(key, members, max_pairs)]
+    shard_count = max(1, min(shard_count, len(slices)))
+    assigned: List[List[BlockSlice]] = [[] for _ in range(shard_count)]
+
+    # Largest slices first, each going to the least loaded shard
+    loads = [(0, i) for i in range(shard_count)]
+    heapify(loads)
+    for block_slice in sorted(slices, key=lambda block: block_pair_count(block.members, block.leading),
+                              reverse=True):
+        load, i = loads[0]
+        assigned[i].append(block_slice)
+        heapreplace(loads, (load + block_pair_count(block_slice.members, block_slice.leading), i))
+
+    shards = []
+    for shard_blocks in assigned:
+        if not shard_blocks:
+            continue
+        member_ids = {member for block in shard_blocks for member in block.members}
+        shards.append(ScoringShard(
+            blocks=shard_blocks,
+            rows=[rows_by_id[member] for member in member_ids],
+            keys={member: keys[member] for member in member_ids},
+            changed=changed & member_ids if changed is not None else None
+        ))
+    return shards
+
+
+def build_pair_shards(pairs: List[Tuple[str, str]], rows_by_id: Dict[str, MatchRow],
+                      shard_size: int) -> List[ScoringShard]:
+    """Split loose candidate pairs, e.g. from MinHashLSH, into shards of ``shard_size``."""
+    shards = []
+    for start in range(0, len(pairs), shard_size):
+        shard_pairs = pairs[start:start + shard_size]
+        member_ids = {member for pair in shard_pairs for member in pair}
+        shards.append(ScoringShard(
+            blocks=[],
+            rows=[rows_by_id[member] for member in member_ids],
+            keys={},
+            pairs=shard_pairs
+        ))
+    return shards
+
+
+def score_shard(shard: ScoringShard) -> Tuple[List[Tuple[str, str, float]], Dict[str, RuleStats]]:
+    """Score every candidate pair of a shard.
+
+    Runs in a worker process. Returns ``(id1, id2, confidence)`` for the pairs
+    above the merge threshold, and the per-rule statistics of the matcher;
+    reasons are built by the caller.
+    """
+    from src.core.matcher import ContactMatcher
+
+    matcher = ContactMatcher()
+    matcher.index_contacts(shard.rows)
+
+    pairs = chain(
+        (
+            pair
+            for block in shard.blocks
+            for pair in block_pairs(block.key, block.members, shard.keys, shard.changed, block.leading)
+        ),
+        shard.pairs
+    )
+
+    matches = []
+    while True:
+        batch = list(islice(pairs, SCORE_BATCH_SIZE))
+        if not batch:
+            break
+        left_ids, right_ids = zip(*batch)
+        confidences = matcher.score_pairs(left_ids, right_ids)
+        for position in np.flatnonzero(confidences > MERGE_THRESHOLD):
+            matches.append((left_ids[position], right_ids[position], float(confidences[position])))
+    return matches, matcher.stats
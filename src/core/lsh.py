@@ -0,0 +1,192 @@
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Hashable, Iterator, List, Optional, Set, Tuple
+import zlib
+import numpy as np
+
+# Default banding: names with n-gram Jaccard similarity s share a bucket with
+# probability 1 - (1 - s**rows)**bands, about 0.15 at s=0.3, 0.94 at s=0.6
+# and 0.996 at s=0.7. More bands or fewer rows catch more distant typos at
+# the cost of many more candidate pairs between unrelated names
+LSH_BANDS = 20
+LSH_ROWS = 4
+
+# Character n-gram size of the name shingles. Bigrams are shared by too many
+# unrelated names ("an", "er"), making nearly every pair a candidate
+NGRAM_SIZE = 3
+
+# Buckets larger than this (very common names) are skipped: they would add
+# many pairs without being any more likely to hold a duplicate
+MAX_BUCKET_SIZE = 500
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_BAND_MULTIPLIER = np.uint64(1000003)
+_LOW_32_BITS = np.uint64(0xFFFFFFFF)
+
+
+def name_shingles(name: str, size: int = NGRAM_SIZE) -> Set[str]:
+    """Character n-grams of a normalized name, padded so word edges count."""
+    padded = f" {name} "
+    return {padded[i:i + size] for i in range(len(padded) - size + 1)}
+
+
+@dataclass
+class LSHStats:
+    contacts: int = 0
+    bands: int = 0
+    rows: int = 0
+    buckets: int = 0
+    largest_bucket: int = 0
+    oversized_buckets: int = 0
+    candidate_pairs: int = 0
+    memory_bytes: int = 0
+    build_seconds: float = 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.contacts} names in {self.bands} bands of {self.rows} rows, "
+            f"{self.buckets} shared buckets (largest {self.largest_bucket}, "
+            f"{self.oversized_buckets} skipped), {self.candidate_pairs} candidate pairs, "
+            f"{self.memory_bytes / 1024 / 1024:.1f} MB, built in {self.build_seconds:.2f}s"
+        )
+
+
+class MinHashLSH:
+    """Approximate near-neighbour index over character n-grams of contact names.
+
+    Each name gets a MinHash signature of ``bands * rows`` values, and each
+    band of ``rows`` values is hashed into a bucket. Names sharing a bucket
+    in any band are candidate duplicates, which catches typos like
+    "Jonh Smtih" that exact blocking keys miss.
+
+    Bucket hashes are kept as sorted numpy columns, one per band, so memory
+    is ``contacts * bands * 12`` bytes and a lookup is a binary search.
+
+    Candidate pairs are only sub-quadratic while similar names are rare. In
+    a book drawn from few names, as the synthetic ones are, every name has
+    close neighbours and the pairs still grow with the square of the size;
+    benchmarks.dedup_benchmark reports them for the fuzzy run.
+    """
+
+    def __init__(self, bands: int = LSH_BANDS, rows: int = LSH_ROWS, ngram_size: int = NGRAM_SIZE,
+                 max_bucket_size: int = MAX_BUCKET_SIZE, seed: int = 1):
+        self.bands = bands
+        self.rows = rows
+        self.ngram_size = ngram_size
+        self.max_bucket_size = max_bucket_size
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 1 << 32, size=bands * rows, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=bands * rows, dtype=np.uint64)
+
+        self.ids: List[Hashable] = []
+        self._pending = bytearray()
+        self._hashes: Optional[np.ndarray] = None
+        self._order: Optional[np.ndarray] = None
+        self._sorted: Optional[np.ndarray] = None
+        self.stats = LSHStats(bands=bands, rows=rows)
+
+    def band_hashes(self, name: str) -> np.ndarray:
+        """The bucket of ``name`` in each band."""
+        shingles = name_shingles(name, self.ngram_size)
+        values = np.fromiter(
+            (zlib.crc32(shingle.encode('utf-8')) for shingle in shingles),
+            dtype=np.uint64, count=len(shingles)
+        )
+        signature = ((np.outer(self._a, values) + self._b[:, None]) % _MERSENNE_PRIME).min(axis=1)
+
+        rows = signature.reshape(self.bands, self.rows)
+        combined = rows[:, 0].copy()
+        for row in range(1, self.rows):
+            combined = combined * _BAND_MULTIPLIER + rows[:, row]
+        return ((combined ^ (combined >> np.uint64(32))) & _LOW_32_BITS).astype(np.uint32)
+
+    def add(self, contact_id: Hashable, name: str):
+        """Index a normalized name (``ContactModel.name_normalized``)."""
+        start = perf_counter()
+        self.ids.append(contact_id)
+        self._pending += self.band_hashes(name).tobytes()
+        self._hashes = None
+        self.stats.build_seconds += perf_counter() - start
+
+    def _build(self):
+        if self._hashes is not None:
+            return
+        start = perf_counter()
+        self._hashes = np.frombuffer(bytes(self._pending), dtype=np.uint32).reshape(-1, self.bands)
+        index_type = np.int32 if len(self.ids) < 2 ** 31 else np.int64
+        self._order = np.argsort(self._hashes, axis=0, kind='stable').T.astype(index_type)
+        self._sorted = np.take_along_axis(self._hashes.T, self._order, axis=1)
+
+        self.stats.contacts = len(self.ids)
+        self.stats.memory_bytes = self._hashes.nbytes + self._order.nbytes + self._sorted.nbytes
+        self.stats.build_seconds += perf_counter() - start
+
+    def query(self, name: str) -> Set[Hashable]:
+        """Ids of the indexed names sharing a bucket with ``name``."""
+        self._build()
+        found = set()
+        for band, value in enumerate(self.band_hashes(name)):
+            column = self._sorted[band]
+            left = np.searchsorted(column, value, side='left')
+            right = np.searchsorted(column, value, side='right')
+            if right - left <= self.max_bucket_size:
+                found.update(self.ids[position] for position in self._order[band, left:right])
+        return found
+
+    def candidate_pairs(self, changed: Optional[Set[Hashable]] = None) -> Iterator[Tuple[Hashable, Hashable]]:
+        """Yield every pair of ids sharing a bucket, exactly once.
+
+        Like ``blocking.block_pairs``, a pair is only emitted from the first
+        band it shares a bucket in that was not skipped as oversized. When ``changed`` is given, pairs where neither contact
+        changed are skipped.
+        """
+        self._build()
+        if len(self.ids) < 2:
+            return
+
+        changed_mask = None
+        if changed is not None:
+            changed_mask = np.fromiter((i in changed for i in self.ids), dtype=bool, count=len(self.ids))
+
+        self.stats.buckets = self.stats.largest_bucket = self.stats.oversized_buckets = 0
+        self.stats.candidate_pairs = 0
+        # emitted[i, band] is set when contact i sat in a bucket of ``band``
+        # that was expanded into pairs, rather than skipped as oversized
+        emitted = np.zeros((len(self.ids), self.bands), dtype=bool)
+        for band in range(self.bands):
+            for left, right in self._band_pairs(band, changed_mask, emitted):
+                self.stats.candidate_pairs += len(left)
+                for i, j in zip(left.tolist(), right.tolist()):
+                    yield self.ids[i], self.ids[j]
+
+    def _band_pairs(self, band: int, changed_mask: Optional[np.ndarray],
+                    emitted: np.ndarray) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        column = self._sorted[band]
+        order = self._order[band]
+
+        # Runs of equal hashes in the sorted column are the buckets
+        starts = np.flatnonzero(np.r_[True, column[1:] != column[:-1]])
+        sizes = np.diff(np.r_[starts, len(column)])
+        shared = sizes >= 2
+        self.stats.buckets += int(shared.sum())
+        if shared.any():
+            self.stats.largest_bucket = max(self.stats.largest_bucket, int(sizes.max()))
+        self.stats.oversized_buckets += int((sizes > self.max_bucket_size).sum())
+        emitted[order, band] = np.repeat(shared & (sizes <= self.max_bucket_size), sizes)
+
+        # Buckets of the same size are expanded into pairs together
+        for size in np.unique(sizes[shared & (sizes <= self.max_bucket_size)]).tolist():
+            bucket_starts = starts[sizes == size]
+            first, second = np.triu_indices(size, 1)
+            left = order[bucket_starts[:, None] + first].ravel()
+            right = order[bucket_starts[:, None] + second].ravel()
+
+            # Skip pairs already emitted from an earlier band. Both contacts of a
+            # shared bucket have the same ``emitted`` flag, so checking one is enough
+            shared_before = (self._hashes[left, :band] == self._hashes[right, :band]) & emitted[left, :band]
+            keep = ~shared_before.any(axis=1)
+            if changed_mask is not None:
+                keep &= changed_mask[left] | changed_mask[right]
+            if keep.any():
+                yield left[keep], right[keep]
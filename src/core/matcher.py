@@ -1,7 +1,14 @@
-from typing import List, Tuple
-from thefuzz import fuzz
+from typing import Dict, List, Sequence, Tuple
 from dataclasses import dataclass
-from core.contact_manager import Contact
+from time import perf_counter
+import numpy as np
+from rapidfuzz import fuzz as rapid_fuzz, process
+from src.core.contact_manager import Contact
+from src.core.normalize import fields_for, normalize_phone
+from src.core.scoring import (
+    DUPLICATE_RULES, EMAIL_MATCH_THRESHOLD, EMAIL_STRONG_MATCH_THRESHOLD, MATCHER_RULES,
+    NAME_MATCH_THRESHOLD, NAME_MISMATCH_THRESHOLD, RuleStats, ScoringPipeline
+)
 
 @dataclass
 class MatchScore:
@@ -12,6 +19,126 @@ class MatchScore:
 class ContactMatcher:
     def __init__(self, threshold: float = 0.85):
         self.threshold = threshold
+        self.pipeline = ScoringPipeline(MATCHER_RULES, boost=0.0)
+        self._positions = {}
+        # Per-rule counters of score_pairs, named after DUPLICATE_RULES
+        self.stats: Dict[str, RuleStats] = {rule.name: RuleStats() for rule in DUPLICATE_RULES}
+    
+    def index_contacts(self, contacts: List[Contact]):
+        """Normalize the matching fields of each contact once for score_pairs."""
+        self._positions = {contact.id: i for i, contact in enumerate(contacts)}
+        
+        fields = [fields_for(c) for c in contacts]
+        
+        self._first_names = np.array([(c.first_name or '').lower() for c in contacts], dtype=object)
+        self._last_names = np.array([(c.last_name or '').lower() for c in contacts], dtype=object)
+        self._emails = np.array([f.email_lower or '' for f in fields], dtype=object)
+        self._phones = np.array([f.phone_digits or '' for f in fields], dtype=object)
+        self._phone_lengths = np.array([len(f.phone_digits or '') for f in fields], dtype=np.int64)
+        self._phone_suffixes = np.array([f.phone_last7 or '' for f in fields], dtype=object)
+    
+    def score_pairs(self, left_ids: Sequence[str], right_ids: Sequence[str]) -> np.ndarray:
+        """Score many contact pairs at once.
+        
+        ``left_ids[k]`` is compared with ``right_ids[k]``; both must have been
+        passed to index_contacts first. Returns the same confidences as
+        ContactManager._calculate_similarity, computed with array masks over
+        bulk name and email similarity scores instead of per-pair calls.
+        
+        Fuzzy ratios are only computed for the pairs still undecided by the
+        cheaper rules before them.
+        """
+        left = np.fromiter((self._positions[i] for i in left_ids), dtype=np.intp, count=len(left_ids))
+        right = np.fromiter((self._positions[i] for i in right_ids), dtype=np.intp, count=len(right_ids))
+        pair_count = len(left)
+        
+        first1, first2 = self._first_names[left], self._first_names[right]
+        last1, last2 = self._last_names[left], self._last_names[right]
+        email1, email2 = self._emails[left], self._emails[right]
+        
+        has_email = (email1 != '') & (email2 != '')
+        has_first = (first1 != '') & (first2 != '')
+        has_full_name = has_first & (last1 != '') & (last2 != '')
+        
+        # Strong identifiers settle a pair at 1.0
+        start = perf_counter()
+        exact_email = has_email & (email1 == email2)
+        self._record('exact_email', pair_count, exact_email, start)
+        
+        start = perf_counter()
+        exact_phone = (self._phone_lengths[left] >= 10) & (self._phones[left] == self._phones[right])
+        self._record('exact_phone', int((~exact_email).sum()), exact_phone & ~exact_email, start)
+        
+        exact = exact_email | exact_phone
+        undecided = ~exact
+        
+        suffix1 = self._phone_suffixes[left]
+        phone_suffix_match = (suffix1 != '') & (suffix1 == self._phone_suffixes[right])
+        
+        # Name matching with context
+        start = perf_counter()
+        first_score = self._ratios(first1, first2, has_first & undecided)
+        first_match = first_score > NAME_MATCH_THRESHOLD
+        full_name_checked = has_full_name & first_match
+        last_score = self._ratios(last1, last2, full_name_checked & undecided)
+        full_name_match = full_name_checked & (last_score > NAME_MATCH_THRESHOLD)
+        different_people = full_name_checked & (last_score < NAME_MISMATCH_THRESHOLD)
+        self._record('full_name', int((has_full_name & undecided).sum()), full_name_match, start)
+        self._record('different_people', int((full_name_checked & undecided).sum()), different_people & undecided)
+        
+        # Emails are only compared where they can still change the outcome
+        first_name_candidate = ~has_full_name & has_first & first_match
+        start = perf_counter()
+        email_score = self._ratios(
+            email1, email2,
+            has_email & undecided & ~full_name_match & ~(first_name_candidate & phone_suffix_match)
+        )
+        first_name_with_evidence = first_name_candidate & (
+            phone_suffix_match | (has_email & (email_score > EMAIL_MATCH_THRESHOLD))
+        )
+        self._record(
+            'first_name_evidence', int((first_name_candidate & undecided).sum()),
+            first_name_with_evidence & undecided, start
+        )
+        
+        # Partial matches only count when no name match was found
+        no_name_match = ~(full_name_match | first_name_with_evidence)
+        similar_email = no_name_match & has_email & (email_score > EMAIL_STRONG_MATCH_THRESHOLD)
+        partial_phone = no_name_match & phone_suffix_match
+        self._record('similar_email', int((no_name_match & has_email & undecided).sum()), similar_email & undecided)
+        self._record('partial_phone', int((no_name_match & undecided).sum()), partial_phone & undecided)
+        
+        confidence = np.zeros(pair_count, dtype=np.float64)
+        confidence[partial_phone] = 0.5
+        confidence[similar_email] = 0.6
+        confidence[similar_email & partial_phone] = min((0.6 + 0.5) / 2 + 0.1, 1.0)
+        confidence[first_name_with_evidence] = 0.7
+        confidence[full_name_match] = 0.9
+        confidence[different_people] = 0.0
+        confidence[exact] = 1.0
+        return confidence
+    
+    def _record(self, name: str, evaluations: int, hits: np.ndarray, start: float = None):
+        stats = self.stats[name]
+        stats.evaluations += evaluations
+        stats.hits += int(hits.sum())
+        if start is not None:
+            stats.seconds += perf_counter() - start
+    
+    @staticmethod
+    def _ratios(values1: np.ndarray, values2: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        """Bulk fuzz.ratio / 100 for the pairs selected by ``mask``, 0 elsewhere."""
+        scores = np.zeros(len(values1), dtype=np.float64)
+        if mask.any():
+            ratios = process.cpdist(
+                values1[mask].tolist(),
+                values2[mask].tolist(),
+                scorer=rapid_fuzz.ratio,
+                dtype=np.float64
+            )
+            # thefuzz rounds ratios to whole percentages
+            scores[mask] = np.rint(ratios) / 100
+        return scores
     
     def find_matches(self, contacts: List[Contact]) -> List[Tuple[Contact, Contact, MatchScore]]:
         matches = []
@@ -25,38 +152,17 @@ class ContactMatcher:
         return matches
     
     def _calculate_match_score(self, contact1: Contact, contact2: Contact) -> MatchScore:
-        scores = []
-        matched_fields = []
-        
-        # Email exact match
-        if contact1.email and contact2.email and contact1.email == contact2.email:
-            scores.append(1.0)
-            matched_fields.append('email')
-        
-        # Name fuzzy match
-        if contact1.first_name and contact2.first_name:
-            name_score = fuzz.ratio(contact1.first_name.lower(), contact2.first_name.lower()) / 100
-            if name_score > 0.8:
-                scores.append(name_score)
-                matched_fields.append('first_name')
-        
-        # Phone number matching (normalized)
-        if contact1.phone and contact2.phone:
-            normalized_phone1 = self._normalize_phone(contact1.phone)
-            normalized_phone2 = self._normalize_phone(contact2.phone)
-            if normalized_phone1 == normalized_phone2:
-                scores.append(1.0)
-                matched_fields.append('phone')
-        
-        if not scores:
+        result = self.pipeline.score(contact1, contact2)
+        if not result.hits:
             return MatchScore(0.0, "No matching fields", [])
         
+        matched_fields = result.fields_matched
         return MatchScore(
-            confidence=sum(scores) / len(scores),
+            confidence=result.confidence,
             match_reason=f"Matched on {', '.join(matched_fields)}",
             fields_matched=matched_fields
-        ) 
+        )
     
     def _normalize_phone(self, phone: str) -> str:
         """Remove all non-digit characters from phone number."""
-        return ''.join(filter(str.isdigit, phone))
\ No newline at end of file
+        return normalize_phone(phone)
\ No newline at end of file
@@ -0,0 +1,69 @@
+import hashlib
+import json
+from typing import NamedTuple, Optional
+
+
+class MatchFields(NamedTuple):
+    """Normalized contact fields used by duplicate detection.
+
+    Stored on ContactModel so they are computed once per write instead of
+    once per compared pair.
+    """
+    phone_digits: Optional[str]
+    phone_last7: Optional[str]
+    email_lower: Optional[str]
+    email_local: Optional[str]
+    name_normalized: Optional[str]
+
+
+def normalize_phone(phone: Optional[str]) -> str:
+    """Remove all non-digit characters from a phone number."""
+    return ''.join(filter(str.isdigit, phone or ''))
+
+
+def normalize_name_part(value: Optional[str]) -> str:
+    """Lower-case a name part and drop everything but letters and digits."""
+    return ''.join(ch for ch in (value or '').lower() if ch.isalnum())
+
+
+def match_fields(first_name: Optional[str], last_name: Optional[str],
+                 email: Optional[str], phone: Optional[str]) -> MatchFields:
+    """Compute the normalized match fields of a contact."""
+    digits = normalize_phone(phone)
+    email_lower = email.lower() if email else None
+
+    first = normalize_name_part(first_name)
+    last = normalize_name_part(last_name)
+    # Both parts are kept, space separated, so either can be recovered
+    name_normalized = f"{first} {last}" if first or last else None
+
+    return MatchFields(
+        phone_digits=digits or None,
+        phone_last7=digits[-7:] if len(digits) >= 7 else None,
+        email_lower=email_lower,
+        email_local=(email_lower.split('@', 1)[0] or None) if email_lower else None,
+        name_normalized=name_normalized
+    )
+
+
+def fields_for(contact) -> MatchFields:
+    """The match fields of a contact, computed if they weren't loaded with it."""
+    fields = getattr(contact, 'match', None)
+    if fields is None:
+        fields = match_fields(contact.first_name, contact.last_name, contact.email, contact.phone)
+    return fields
+
+
+def content_hash(first_name: Optional[str], last_name: Optional[str], email: Optional[str],
+                 phone: Optional[str], metadata) -> str:
+    """Stable hash of everything a save writes for a contact.
+
+    The match fields are derived from the other fields, so they're covered
+    too. Metadata is serialized with sorted keys, so dicts built in a
+    different order hash the same.
+    """
+    payload = json.dumps(
+        [first_name, last_name, email, phone, metadata],
+        sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
@@ -0,0 +1,338 @@
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence
+from thefuzz import fuzz
+from src.core.normalize import fields_for
+
+# Thresholds of the duplicate rules, also used by ContactMatcher.score_pairs
+NAME_MATCH_THRESHOLD = 0.8
+NAME_MISMATCH_THRESHOLD = 0.3
+EMAIL_MATCH_THRESHOLD = 0.8
+EMAIL_STRONG_MATCH_THRESHOLD = 0.9
+
+
+@dataclass
+class RuleStats:
+    """How often a rule was evaluated, how often it fired and the time it took."""
+    evaluations: int = 0
+    hits: int = 0
+    seconds: float = 0.0
+
+    def merge(self, other: 'RuleStats'):
+        self.evaluations += other.evaluations
+        self.hits += other.hits
+        self.seconds += other.seconds
+
+
+class PairContext:
+    """The two contacts being compared, with fuzzy ratios computed at most once."""
+
+    __slots__ = ('contact1', 'contact2', 'fields1', 'fields2', '_ratios')
+
+    def __init__(self, contact1, contact2):
+        self.contact1 = contact1
+        self.contact2 = contact2
+        self.fields1 = fields_for(contact1)
+        self.fields2 = fields_for(contact2)
+        self._ratios: Dict[str, float] = {}
+
+    def ratio(self, name: str) -> float:
+        """fuzz.ratio / 100 of ``first_name``, ``last_name`` or ``email``."""
+        if name not in self._ratios:
+            if name == 'email':
+                value1, value2 = self.fields1.email_lower, self.fields2.email_lower
+            else:
+                value1 = getattr(self.contact1, name).lower()
+                value2 = getattr(self.contact2, name).lower()
+            self._ratios[name] = fuzz.ratio(value1, value2) / 100
+        return self._ratios[name]
+
+    @property
+    def has_emails(self) -> bool:
+        return bool(self.fields1.email_lower and self.fields2.email_lower)
+
+    @property
+    def has_first_names(self) -> bool:
+        return bool(self.contact1.first_name and self.contact2.first_name)
+
+    @property
+    def has_full_names(self) -> bool:
+        return bool(
+            self.contact1.first_name and self.contact1.last_name
+            and self.contact2.first_name and self.contact2.last_name
+        )
+
+    @property
+    def phone_suffix_match(self) -> bool:
+        """Whether the last 7 digits of both phone numbers match."""
+        return bool(self.fields1.phone_last7 and self.fields1.phone_last7 == self.fields2.phone_last7)
+
+
+class Rule:
+    """One step of a ScoringPipeline.
+
+    ``evaluate`` returns the rule's score when it fires and None otherwise.
+    ``reasons`` is only called for pairs a caller wants explained, so reason
+    text is never built for pairs below the threshold.
+    """
+    name = 'rule'
+    # Contact field the rule matches on, reported by ContactMatcher
+    field: Optional[str] = None
+    # Relative cost; cheaper rules are evaluated first
+    cost = 1
+    # A decisive hit ends the evaluation with this rule's score as the result
+    decisive = False
+    # Fallback rules are only evaluated when no other rule scored
+    fallback = False
+
+    def evaluate(self, pair: PairContext) -> Optional[float]:
+        raise NotImplementedError
+
+    def reasons(self, pair: PairContext) -> List[str]:
+        return []
+
+
+class ExactEmailRule(Rule):
+    name = 'exact_email'
+    field = 'email'
+
+    def __init__(self, decisive: bool = True):
+        self.decisive = decisive
+
+    def evaluate(self, pair):
+        if pair.has_emails and pair.fields1.email_lower == pair.fields2.email_lower:
+            return 1.0
+        return None
+
+    def reasons(self, pair):
+        return ["Identical email addresses"]
+
+
+class ExactPhoneRule(Rule):
+    name = 'exact_phone'
+    field = 'phone'
+
+    def __init__(self, min_digits: int = 10, decisive: bool = True):
+        self.min_digits = min_digits
+        self.decisive = decisive
+
+    def evaluate(self, pair):
+        phone1 = pair.fields1.phone_digits
+        if phone1 and len(phone1) >= self.min_digits and phone1 == pair.fields2.phone_digits:
+            return 1.0
+        return None
+
+    def reasons(self, pair):
+        return ["Identical phone numbers"]
+
+
+class FirstNameRule(Rule):
+    """Scores the first name similarity itself when it is high enough."""
+    name = 'first_name'
+    field = 'first_name'
+    cost = 10
+
+    def evaluate(self, pair):
+        if pair.has_first_names:
+            score = pair.ratio('first_name')
+            if score > NAME_MATCH_THRESHOLD:
+                return score
+        return None
+
+    def reasons(self, pair):
+        return [f"Similar first names: {pair.contact1.first_name} ≈ {pair.contact2.first_name}"]
+
+
+class FullNameRule(Rule):
+    name = 'full_name'
+    field = 'name'
+    cost = 20
+
+    def evaluate(self, pair):
+        if (pair.has_full_names
+                and pair.ratio('first_name') > NAME_MATCH_THRESHOLD
+                and pair.ratio('last_name') > NAME_MATCH_THRESHOLD):
+            return 0.9
+        return None
+
+    def reasons(self, pair):
+        c1, c2 = pair.contact1, pair.contact2
+        return [f"Similar full names: {c1.first_name} {c1.last_name} ≈ {c2.first_name} {c2.last_name}"]
+
+
+class DifferentPeopleRule(Rule):
+    """Same first name but very different last names: likely different people."""
+    name = 'different_people'
+    cost = 20
+    decisive = True
+
+    def evaluate(self, pair):
+        if (pair.has_full_names
+                and pair.ratio('first_name') > NAME_MATCH_THRESHOLD
+                and pair.ratio('last_name') < NAME_MISMATCH_THRESHOLD):
+            return 0.0
+        return None
+
+
+class FirstNameWithEvidenceRule(Rule):
+    """Matching first names with partial names need supporting evidence."""
+    name = 'first_name_evidence'
+    field = 'first_name'
+    cost = 15
+
+    def evaluate(self, pair):
+        if pair.has_full_names or not pair.has_first_names:
+            return None
+        if pair.ratio('first_name') <= NAME_MATCH_THRESHOLD:
+            return None
+        if pair.phone_suffix_match or self._similar_emails(pair):
+            return 0.7
+        return None
+
+    def reasons(self, pair):
+        reasons = [f"Matching first name ({pair.contact1.first_name}) with supporting evidence:"]
+        if pair.phone_suffix_match:
+            reasons.append("  • Matching last 7 digits of phone numbers")
+        if self._similar_emails(pair):
+            reasons.append(f"  • Similar email addresses: {pair.contact1.email} ≈ {pair.contact2.email}")
+        return reasons
+
+    @staticmethod
+    def _similar_emails(pair) -> bool:
+        return pair.has_emails and pair.ratio('email') > EMAIL_MATCH_THRESHOLD
+
+
+class SimilarEmailRule(Rule):
+    name = 'similar_email'
+    field = 'email'
+    cost = 10
+    fallback = True
+
+    def evaluate(self, pair):
+        if pair.has_emails and pair.ratio('email') > EMAIL_STRONG_MATCH_THRESHOLD:
+            return 0.6
+        return None
+
+    def reasons(self, pair):
+        return [f"Very similar email addresses: {pair.contact1.email} ≈ {pair.contact2.email}"]
+
+
+class PartialPhoneRule(Rule):
+    name = 'partial_phone'
+    field = 'phone'
+    fallback = True
+
+    def evaluate(self, pair):
+        return 0.5 if pair.phone_suffix_match else None
+
+    def reasons(self, pair):
+        return ["Matching last 7 digits of phone numbers"]
+
+
+# Rules of ContactManager's duplicate detection, in the order reasons are listed
+DUPLICATE_RULES = (
+    ExactEmailRule(),
+    ExactPhoneRule(),
+    FullNameRule(),
+    DifferentPeopleRule(),
+    FirstNameWithEvidenceRule(),
+    SimilarEmailRule(),
+    PartialPhoneRule(),
+)
+
+# Rules of ContactMatcher.find_matches, whose scores are plainly averaged
+MATCHER_RULES = (
+    ExactEmailRule(decisive=False),
+    FirstNameRule(),
+    ExactPhoneRule(min_digits=1, decisive=False),
+)
+
+
+@dataclass
+class ScoreResult:
+    confidence: float
+    pair: PairContext
+    hits: List[Rule] = field(default_factory=list)
+
+    def reasons(self) -> List[str]:
+        """Build the reason text of the rules that fired."""
+        return [reason for rule in self.hits for reason in rule.reasons(self.pair)]
+
+    @property
+    def fields_matched(self) -> List[str]:
+        return [rule.field for rule in self.hits if rule.field]
+
+
+class ScoringPipeline:
+    """Scores contact pairs with a list of rules, cheapest rules first.
+
+    Scores of the rules that fire are averaged, plus ``boost`` when more than
+    one fired. A decisive rule (an identical email, say) settles the pair
+    without evaluating the more expensive fuzzy rules.
+    """
+
+    def __init__(self, rules: Sequence[Rule], boost: float = 0.1):
+        self.rules = list(rules)
+        self.boost = boost
+        self._positions = {id(rule): i for i, rule in enumerate(self.rules)}
+        # sorted() is stable, so rules of equal cost keep their declared order
+        self._primary = sorted((r for r in self.rules if not r.fallback), key=lambda r: r.cost)
+        self._fallback = sorted((r for r in self.rules if r.fallback), key=lambda r: r.cost)
+        self.stats: Dict[str, RuleStats] = {rule.name: RuleStats() for rule in self.rules}
+
+    def score(self, contact1, contact2, record: bool = True) -> ScoreResult:
+        """Score a pair. ``record=False`` leaves the rule statistics alone."""
+        pair = PairContext(contact1, contact2)
+        hits = []
+        scores = []
+
+        for tier in (self._primary, self._fallback):
+            if scores:
+                break
+            for rule in tier:
+                value = self._evaluate(rule, pair, record)
+                if value is None:
+                    continue
+                if rule.decisive:
+                    return ScoreResult(value, pair, [rule] if value > 0 else [])
+                hits.append(rule)
+                scores.append(value)
+
+        if not scores:
+            return ScoreResult(0.0, pair)
+
+        confidence = sum(scores) / len(scores)
+        if len(scores) > 1:
+            # Boost confidence if multiple criteria match
+            confidence = min(confidence + self.boost, 1.0)
+
+        hits.sort(key=lambda rule: self._positions[id(rule)])
+        return ScoreResult(confidence, pair, hits)
+
+    def _evaluate(self, rule: Rule, pair: PairContext, record: bool) -> Optional[float]:
+        if not record:
+            return rule.evaluate(pair)
+        stats = self.stats[rule.name]
+        start = perf_counter()
+        value = rule.evaluate(pair)
+        stats.seconds += perf_counter() - start
+        stats.evaluations += 1
+        if value is not None:
+            stats.hits += 1
+        return value
+
+    def record_stats(self, stats: Mapping[str, RuleStats]):
+        """Add statistics gathered elsewhere, e.g. by ContactMatcher.score_pairs in a worker."""
+        for name, rule_stats in stats.items():
+            self.stats.setdefault(name, RuleStats()).merge(rule_stats)
+
+    def reset_stats(self):
+        self.stats = {rule.name: RuleStats() for rule in self.rules}
+
+    def stats_summary(self) -> Iterable[str]:
+        """One line per rule, slowest first."""
+        for name, stats in sorted(self.stats.items(), key=lambda item: item[1].seconds, reverse=True):
+            yield (
+                f"{name:20} {stats.hits:>10} hits / {stats.evaluations:>10} evaluated"
+                f" {stats.seconds * 1000:>10.1f} ms"
+            )
@@ -1,3 +1,3 @@
-from .database import init_db
+from .database import init_db, bulk_import, default_database_url, set_sqlite_profile
 
-__all__ = ['init_db'] 
\ No newline at end of file
+__all__ = ['init_db', 'bulk_import', 'default_database_url', 'set_sqlite_profile'] 
\ No newline at end of file
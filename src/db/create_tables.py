@@ -5,14 +5,14 @@ from pathlib import Path
 project_root = str(Path(__file__).parent.parent.parent)
 sys.path.append(project_root)
 
-from src.models.contact_model import Base
-from sqlalchemy.ext.asyncio import create_async_engine
+from src.db.database import init_db
 import asyncio
 
 async def create_tables():
-    engine = create_async_engine("sqlite+aiosqlite:///contacts.db")
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # init_db creates missing tables and applies pending migrations on the
+    # database named by $CONTACTS_DATABASE_URL, contacts.db by default
+    session_factory = await init_db()
+    await session_factory.kw['bind'].dispose()
 
 if __name__ == "__main__":
     asyncio.run(create_tables()) 
\ No newline at end of file
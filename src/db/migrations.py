@@ -0,0 +1,314 @@
+import logging
+from datetime import datetime
+from time import perf_counter
+from sqlalchemy import inspect, select, update, insert, delete, func, bindparam, text
+from src.core.normalize import MatchFields, content_hash, match_fields
+from src.models.contact_model import ContactModel
+from src.models.schema_migration_model import SchemaMigrationModel
+from src.db.search import (
+    METADATA_PATHS, POSTGRES_SEARCH_DDL, SEARCH_COLUMNS, SEARCH_DDL, SEARCH_TABLE, SEARCH_TRIGGERS,
+    metadata_search_fields, rebuild_search_index
+)
+
+logger = logging.getLogger(__name__)
+
+# Rows updated per statement while backfilling
+BACKFILL_BATCH_SIZE = 1000
+
+# The search index as migration 3 created it, when company, title and notes
+# were read from the JSON metadata. Databases that haven't applied it yet
+# get exactly this; compress_metadata replaces the triggers afterwards.
+_LEGACY_METADATA_PATHS = {
+    'company': ('$.company', '$.original_row.Company', '$.original_row."Organization 1 - Name"'),
+    'title': ('$.title', '$.original_row."Job Title"', '$.original_row."Organization 1 - Title"'),
+    'notes': ('$.notes', '$.original_row.Notes'),
+}
+
+def _legacy_row_values(row: str) -> str:
+    values = [f"{row}.rowid", f"{row}.id"]
+    for column in SEARCH_COLUMNS:
+        if column in _LEGACY_METADATA_PATHS:
+            paths = ', '.join(
+                f"json_extract({row}.contact_metadata, '{path}')" for path in _LEGACY_METADATA_PATHS[column]
+            )
+            # json_extract raises on malformed JSON, which would abort the write
+            values.append(f"CASE WHEN json_valid({row}.contact_metadata) THEN coalesce({paths}) END")
+        else:
+            values.append(f"{row}.{column}")
+    return ', '.join(values)
+
+_LEGACY_INSERT_COLUMNS = ', '.join(('rowid', 'contact_id') + SEARCH_COLUMNS)
+
+LEGACY_SEARCH_DDL = [
+    SEARCH_DDL[0],
+    f"""CREATE TRIGGER IF NOT EXISTS contacts_fts_insert AFTER INSERT ON contacts BEGIN
+        INSERT INTO {SEARCH_TABLE} ({_LEGACY_INSERT_COLUMNS}) VALUES ({_legacy_row_values('new')});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS contacts_fts_update
+        AFTER UPDATE OF first_name, last_name, email, phone, phone_digits, contact_metadata ON contacts BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.rowid;
+        INSERT INTO {SEARCH_TABLE} ({_LEGACY_INSERT_COLUMNS}) VALUES ({_legacy_row_values('new')});
+    END""",
+    SEARCH_DDL[3],
+]
+
+async def add_missing_columns(conn, names, column_type: str = 'VARCHAR'):
+    """Add the named columns that an older contacts table lacks; returns them."""
+    existing = await conn.run_sync(
+        lambda sync_conn: {column['name'] for column in inspect(sync_conn).get_columns('contacts')}
+    )
+    missing = [name for name in names if name not in existing]
+    for name in missing:
+        await conn.execute(text(f"ALTER TABLE contacts ADD COLUMN {name} {column_type}"))
+    return missing
+
+async def add_match_columns(conn):
+    """Add the normalized match columns to older contacts tables and fill them in.
+
+    Rows are read a page at a time by id, so large books aren't loaded at once.
+    """
+    if not await add_missing_columns(conn, MatchFields._fields):
+        return
+
+    table = ContactModel.__table__
+    page = (
+        select(table.c.id, table.c.first_name, table.c.last_name, table.c.email, table.c.phone)
+        .order_by(table.c.id)
+        .limit(BACKFILL_BATCH_SIZE)
+    )
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam('contact_id'))
+        .values({name: bindparam(name) for name in MatchFields._fields})
+    )
+    last_id = None
+    while True:
+        query = page if last_id is None else page.where(table.c.id > last_id)
+        rows = (await conn.execute(query)).all()
+        if not rows:
+            break
+        await conn.execute(stmt, [
+            {'contact_id': row.id, **match_fields(row.first_name, row.last_name, row.email, row.phone)._asdict()}
+            for row in rows
+        ])
+        last_id = rows[-1].id
+
+# The indexes migration 2 creates; ones declared on ContactModel later get
+# a migration of their own
+CONTACT_INDEXES = (
+    'ix_contacts_email', 'ix_contacts_phone_digits', 'ix_contacts_source',
+    'ix_contacts_source_source_id', 'ix_contacts_updated_at',
+)
+
+async def remove_source_id_clashes(conn):
+    """Delete extra copies of contacts stored twice under one (source, source_id).
+
+    They are the same source contact saved under different ids before the
+    pair was unique. The most recently updated copy is kept, as a save
+    would have updated it in place; the others are removed so the unique
+    index can be created.
+    """
+    table = ContactModel.__table__
+    clashes = (
+        select(table.c.source, table.c.source_id)
+        .where(table.c.source_id.is_not(None))
+        .group_by(table.c.source, table.c.source_id)
+        .having(func.count() > 1)
+    )
+    removed = 0
+    for source, source_id in (await conn.execute(clashes)).all():
+        result = await conn.execute(
+            select(table.c.id)
+            .where(table.c.source == source, table.c.source_id == source_id)
+            .order_by(table.c.updated_at.desc().nulls_last(), table.c.id)
+        )
+        stale_ids = result.scalars().all()[1:]
+        await conn.execute(delete(table).where(table.c.id.in_(stale_ids)))
+        removed += len(stale_ids)
+    if removed:
+        logger.info("Removed %d contacts stored twice under the same (source, source_id)", removed)
+
+async def add_contact_indexes(conn):
+    """Create the indexes declared on ContactModel that older databases lack."""
+    await remove_source_id_clashes(conn)
+
+    def create_indexes(sync_conn):
+        inspector = inspect(sync_conn)
+        # Databases created from schema.sql already enforce UNIQUE(source, source_id)
+        unique_columns = [
+            constraint['column_names'] for constraint in inspector.get_unique_constraints('contacts')
+        ]
+        for index in ContactModel.__table__.indexes:
+            if index.name not in CONTACT_INDEXES:
+                continue
+            if index.unique and [column.name for column in index.columns] in unique_columns:
+                continue
+            index.create(sync_conn, checkfirst=True)
+
+    await conn.run_sync(create_indexes)
+
+async def add_search_index(conn):
+    """Create the FTS5 search index and its sync triggers, then fill it."""
+    if conn.dialect.name != 'sqlite':
+        return
+    for statement in LEGACY_SEARCH_DDL:
+        await conn.execute(text(statement))
+    await conn.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+    await conn.execute(text(
+        f"INSERT INTO {SEARCH_TABLE} ({_LEGACY_INSERT_COLUMNS}) "
+        f"SELECT {_legacy_row_values('contacts')} FROM contacts"
+    ))
+
+async def add_content_hash(conn):
+    """Add the content_hash column and hash the stored contacts.
+
+    Without the backfill the first sync after upgrading would rewrite every
+    contact. Rows are read a page at a time by id, so large books aren't
+    loaded at once.
+    """
+    await add_missing_columns(conn, ['content_hash'])
+
+    table = ContactModel.__table__
+    page = (
+        select(table.c.id, table.c.first_name, table.c.last_name, table.c.email,
+               table.c.phone, table.c.contact_metadata)
+        .order_by(table.c.id)
+        .limit(BACKFILL_BATCH_SIZE)
+    )
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam('contact_id'))
+        .values(content_hash=bindparam('content_hash'))
+    )
+    last_id = None
+    while True:
+        query = page if last_id is None else page.where(table.c.id > last_id)
+        rows = (await conn.execute(query)).all()
+        if not rows:
+            break
+        await conn.execute(stmt, [
+            {
+                'contact_id': row.id,
+                'content_hash': content_hash(row.first_name, row.last_name, row.email, row.phone, row.contact_metadata)
+            }
+            for row in rows
+        ])
+        last_id = rows[-1].id
+
+async def compress_metadata(conn):
+    """Re-encode stored metadata as compressed msgpack and copy out its search fields.
+
+    Older rows hold plain JSON text. CompressedJSON reads those as they are,
+    so this only saves space and fills company, title and notes, which the
+    search index now reads instead of the metadata. Logs the metadata
+    size before and after.
+    """
+    await add_missing_columns(conn, METADATA_PATHS)
+
+    # Bytes, not characters, for both the JSON text and the blobs
+    if conn.dialect.name == 'sqlite':
+        size = text("SELECT coalesce(sum(length(CAST(contact_metadata AS BLOB))), 0) FROM contacts")
+    else:
+        size = text("SELECT coalesce(sum(octet_length(contact_metadata)), 0) FROM contacts")
+    before = (await conn.execute(size)).scalar_one()
+
+    table = ContactModel.__table__
+    page = (
+        select(table.c.id, table.c.contact_metadata)
+        .order_by(table.c.id)
+        .limit(BACKFILL_BATCH_SIZE)
+    )
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam('contact_id'))
+        .values(
+            contact_metadata=bindparam('contact_metadata', type_=table.c.contact_metadata.type),
+            **{field: bindparam(field) for field in METADATA_PATHS}
+        )
+    )
+    last_id = None
+    count = 0
+    while True:
+        query = page if last_id is None else page.where(table.c.id > last_id)
+        rows = (await conn.execute(query)).all()
+        if not rows:
+            break
+        await conn.execute(stmt, [
+            {
+                'contact_id': row.id,
+                'contact_metadata': row.contact_metadata,
+                **metadata_search_fields(row.contact_metadata)
+            }
+            for row in rows
+        ])
+        count += len(rows)
+        last_id = rows[-1].id
+
+    after = (await conn.execute(size)).scalar_one()
+    if before:
+        logger.info("Compressed metadata of %d contacts: %.1f MB -> %.1f MB (%.0f%%)",
+                    count, before / 1e6, after / 1e6, after / before * 100)
+    else:
+        logger.info("Compressed metadata of %d contacts", count)
+
+    if conn.dialect.name == 'sqlite':
+        # Recreate the triggers from before the search fields had columns
+        for trigger in SEARCH_TRIGGERS:
+            await conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+        for statement in SEARCH_DDL:
+            await conn.execute(text(statement))
+        await rebuild_search_index(conn)
+
+async def add_postgres_search_index(conn):
+    """Create the tsvector index PostgreSQL databases are searched through."""
+    if conn.dialect.name != 'postgresql':
+        return
+    for statement in POSTGRES_SEARCH_DDL:
+        await conn.execute(text(statement))
+
+async def add_sync_source(conn):
+    """Add the sync_source column and its index.
+
+    Existing contacts are left without an owner until their source next
+    syncs them, so no full sync removes them before then.
+    """
+    await add_missing_columns(conn, ['sync_source'])
+
+    def create_index(sync_conn):
+        for index in ContactModel.__table__.indexes:
+            if index.name == 'ix_contacts_sync_source':
+                index.create(sync_conn, checkfirst=True)
+
+    await conn.run_sync(create_index)
+
+# Applied in order, each once per database; append new migrations to the end
+MIGRATIONS = [
+    (1, 'add_match_columns', add_match_columns),
+    (2, 'add_contact_indexes', add_contact_indexes),
+    (3, 'add_search_index', add_search_index),
+    (4, 'add_content_hash', add_content_hash),
+    (5, 'compress_metadata', compress_metadata),
+    (6, 'add_postgres_search_index', add_postgres_search_index),
+    (7, 'add_sync_source', add_sync_source),
+]
+
+async def run_migrations(engine):
+    """Apply the migrations a database hasn't had yet, each in its own transaction."""
+    table = SchemaMigrationModel.__table__
+    async with engine.connect() as conn:
+        applied = set((await conn.execute(select(table.c.version))).scalars().all())
+
+    for version, name, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        started = perf_counter()
+        async with engine.begin() as conn:
+            await migrate(conn)
+            duration_ms = (perf_counter() - started) * 1000
+            await conn.execute(insert(table).values(
+                version=version,
+                name=name,
+                applied_at=datetime.utcnow(),
+                duration_ms=duration_ms
+            ))
+        logger.info("Applied migration %d (%s) in %.1f ms", version, name, duration_ms)
@@ -0,0 +1,116 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Iterable, List, Optional, Sequence, Tuple
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.engine import Row
+
+# Keeps IN (...) lists below SQLite's bound parameter limit
+SQL_IN_CHUNK_SIZE = 500
+
+# Columns returned when the caller doesn't ask for specific ones; metadata
+# is left out because it is by far the largest
+DEFAULT_COLUMNS = (
+    'id', 'first_name', 'last_name', 'email', 'phone', 'source', 'source_id',
+    'created_at', 'updated_at'
+)
+
+class ContactRepository:
+    """Read access to the contacts table as plain row tuples.
+
+    Rows are SQLAlchemy Row objects with only the requested columns, so
+    they support both ``row.email`` and tuple unpacking without the cost of
+    ORM instances. Outside a transaction every query runs in a short one of
+    its own, so a paused iter_contacts() doesn't hold the session.
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    @property
+    def table(self):
+        from src.models.contact_model import ContactModel
+        return ContactModel.__table__
+
+    @asynccontextmanager
+    async def _transaction(self):
+        if self.session.in_transaction():
+            yield
+        else:
+            async with self.session.begin():
+                yield
+
+    def _columns(self, columns: Sequence[str]):
+        return [self.table.c[name] for name in columns]
+
+    async def iter_batches(self, batch_size: int = 1000, columns: Sequence[str] = DEFAULT_COLUMNS,
+                           where=None) -> AsyncIterator[List[Row]]:
+        """Yield contacts in id order, ``batch_size`` rows at a time.
+
+        Pages are fetched by keyset (``id > last id``) rather than OFFSET,
+        so each page costs the same however far into the table it is, and
+        memory use is bounded by the batch size. ``where`` is an optional
+        SQLAlchemy condition on the contacts table.
+        """
+        columns = tuple(columns)
+        if 'id' not in columns:
+            raise ValueError("Keyset pagination needs the id column")
+        stmt = select(*self._columns(columns)).order_by(self.table.c.id).limit(batch_size)
+        if where is not None:
+            stmt = stmt.where(where)
+
+        last_id = None
+        while True:
+            page = stmt if last_id is None else stmt.where(self.table.c.id > last_id)
+            async with self._transaction():
+                rows = (await self.session.execute(page)).all()
+            if not rows:
+                return
+            yield rows
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1].id
+
+    async def iter_contacts(self, batch_size: int = 1000, columns: Sequence[str] = DEFAULT_COLUMNS,
+                            where=None) -> AsyncIterator[Row]:
+        """Yield contacts one row at a time, see iter_batches()."""
+        async for rows in self.iter_batches(batch_size, columns, where):
+            for row in rows:
+                yield row
+
+    async def count(self, where=None) -> int:
+        """Number of contacts, optionally only those matching ``where``."""
+        stmt = select(func.count()).select_from(self.table)
+        if where is not None:
+            stmt = stmt.where(where)
+        async with self._transaction():
+            return (await self.session.execute(stmt)).scalar_one()
+
+    async def get_many(self, ids: Iterable[str], columns: Sequence[str] = DEFAULT_COLUMNS) -> List[Row]:
+        """Rows of the given contacts, in no particular order; unknown ids are skipped."""
+        ids = list(ids)
+        stmt = select(*self._columns(columns))
+        rows = []
+        async with self._transaction():
+            for start in range(0, len(ids), SQL_IN_CHUNK_SIZE):
+                chunk = ids[start:start + SQL_IN_CHUNK_SIZE]
+                result = await self.session.execute(stmt.where(self.table.c.id.in_(chunk)))
+                rows.extend(result.all())
+        return rows
+
+    async def get_by_source_ids(self, keys: Iterable[Tuple[str, str]],
+                                columns: Sequence[str] = DEFAULT_COLUMNS) -> List[Row]:
+        """Rows of the contacts stored under the given (source, source_id) pairs."""
+        keys = list(keys)
+        stmt = select(*self._columns(columns))
+        pair = tuple_(self.table.c.source, self.table.c.source_id)
+        # Each pair takes two bound parameters
+        chunk_size = SQL_IN_CHUNK_SIZE // 2
+        rows = []
+        async with self._transaction():
+            for start in range(0, len(keys), chunk_size):
+                result = await self.session.execute(stmt.where(pair.in_(keys[start:start + chunk_size])))
+                rows.extend(result.all())
+        return rows
+
+    async def get(self, contact_id: str, columns: Sequence[str] = DEFAULT_COLUMNS) -> Optional[Row]:
+        rows = await self.get_many([contact_id], columns)
+        return rows[0] if rows else None
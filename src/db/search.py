@@ -0,0 +1,133 @@
+import re
+from typing import Dict, Optional
+from sqlalchemy import text
+
+# FTS5 index over the searchable contact fields. Its rowid is the rowid of
+# the contacts row, which the triggers use to keep it in sync.
+SEARCH_TABLE = 'contacts_fts'
+
+# Indexed columns of the contacts table
+SEARCH_COLUMNS = (
+    'first_name', 'last_name', 'email', 'phone', 'phone_digits', 'company', 'title', 'notes'
+)
+
+# Where each source keeps company, title and notes in its metadata: Gmail
+# stores them directly, CSV imports under the original column names. They
+# are copied to plain contacts columns on save, because the compressed
+# metadata can't be read from SQL.
+METADATA_PATHS = {
+    'company': (('company',), ('original_row', 'Company'), ('original_row', 'Organization 1 - Name')),
+    'title': (('title',), ('original_row', 'Job Title'), ('original_row', 'Organization 1 - Title')),
+    'notes': (('notes',), ('original_row', 'Notes')),
+}
+
+# Dropped and recreated when the indexed columns change
+SEARCH_TRIGGERS = ('contacts_fts_insert', 'contacts_fts_update', 'contacts_fts_delete')
+
+# Rows returned per search by default, which is far more than anyone
+# scrolls through; filtering the contact list asks for every match
+SEARCH_LIMIT = 5000
+
+
+def metadata_search_fields(metadata) -> Dict[str, Optional[str]]:
+    """The company, title and notes found in a contact's metadata."""
+    fields = {}
+    for field, paths in METADATA_PATHS.items():
+        fields[field] = None
+        for path in paths:
+            value = metadata
+            for key in path:
+                value = value.get(key) if isinstance(value, dict) else None
+            if value:
+                fields[field] = str(value)
+                break
+    return fields
+
+
+def _row_values(row: str) -> str:
+    return ', '.join([f"{row}.rowid", f"{row}.id"] + [f"{row}.{column}" for column in SEARCH_COLUMNS])
+
+
+_INSERT_COLUMNS = ', '.join(('rowid', 'contact_id') + SEARCH_COLUMNS)
+
+SEARCH_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        contact_id UNINDEXED, {', '.join(SEARCH_COLUMNS)},
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS contacts_fts_insert AFTER INSERT ON contacts BEGIN
+        INSERT INTO {SEARCH_TABLE} ({_INSERT_COLUMNS}) VALUES ({_row_values('new')});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS contacts_fts_update
+        AFTER UPDATE OF {', '.join(SEARCH_COLUMNS)} ON contacts BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.rowid;
+        INSERT INTO {SEARCH_TABLE} ({_INSERT_COLUMNS}) VALUES ({_row_values('new')});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS contacts_fts_delete AFTER DELETE ON contacts BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.rowid;
+    END""",
+]
+
+
+async def rebuild_search_index(conn):
+    """Refill the search index from the contacts table.
+
+    Needed after anything that renumbers contacts rowids, such as VACUUM.
+    """
+    await conn.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+    await conn.execute(text(
+        f"INSERT INTO {SEARCH_TABLE} ({_INSERT_COLUMNS}) SELECT {_row_values('contacts')} FROM contacts"
+    ))
+
+
+def _phrase(value: str) -> Optional[str]:
+    """A quoted FTS5 prefix phrase, so user input can't inject query syntax."""
+    value = value.strip()
+    if not value:
+        return None
+    return '"' + value.replace('"', '""') + '" *'
+
+
+def build_search_query(search_text: str = '', fields: Optional[Dict[str, str]] = None) -> Optional[str]:
+    """Turn search box text and/or per-field criteria into an FTS5 MATCH query.
+
+    Every whitespace separated word of ``search_text`` must prefix-match
+    some indexed column; each entry of ``fields`` must prefix-match its own
+    column. Returns None when there is nothing to search for.
+    """
+    terms = [phrase for phrase in map(_phrase, search_text.split()) if phrase]
+    for field, value in (fields or {}).items():
+        phrase = _phrase(value or '')
+        if not phrase:
+            continue
+        columns = field
+        if field == 'phone':
+            # Digits-only input matches the normalized number too
+            digits = re.sub(r'\D', '', value)
+            if digits:
+                columns = '{phone phone_digits}'
+                phrase = f"({phrase} OR {_phrase(digits)})"
+        terms.append(f"{columns} : {phrase}")
+    return ' AND '.join(terms) or None
+
+
+# PostgreSQL has no FTS5; contacts are searched through a GIN index over
+# this tsvector instead. Queries must repeat the exact expression for the
+# index to be used.
+SEARCH_DOCUMENT = "to_tsvector('simple', {})".format(
+    " || ' ' || ".join(f"coalesce({column}, '')" for column in SEARCH_COLUMNS)
+)
+
+POSTGRES_SEARCH_DDL = [
+    f"CREATE INDEX IF NOT EXISTS ix_contacts_search ON contacts USING GIN ({SEARCH_DOCUMENT})",
+]
+
+
+def build_tsquery(search_text: str) -> Optional[str]:
+    """Turn search box text into a PostgreSQL prefix tsquery, like build_search_query()."""
+    terms = []
+    for word in search_text.split():
+        lexeme = word.replace('\\', '\\\\').replace("'", "''")
+        terms.append(f"'{lexeme}':*")
+    return ' & '.join(terms) or None
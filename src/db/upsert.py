@@ -0,0 +1,75 @@
+from typing import Dict, List, Sequence, Tuple
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from src.models.compressed_json import CompressedJSON
+
+_INSERTS = {
+    'sqlite': sqlite_insert,
+    'postgresql': postgresql_insert,
+}
+
+
+def upsert_statement(dialect_name: str, table, update_columns: Sequence[str]):
+    """INSERT ... ON CONFLICT(primary key) DO UPDATE of ``update_columns``."""
+    if dialect_name not in _INSERTS:
+        raise NotImplementedError(f"Upserts aren't supported on {dialect_name}")
+    stmt = _INSERTS[dialect_name](table)
+    return stmt.on_conflict_do_update(
+        index_elements=list(table.primary_key.columns),
+        set_={name: stmt.excluded[name] for name in update_columns}
+    )
+
+
+async def copy_upsert(session, table, rows: List[Dict], update_columns: Sequence[str],
+                      changed_columns: Sequence[str]) -> Tuple[int, int]:
+    """Bulk upsert into a PostgreSQL table through COPY; returns (inserted, updated).
+
+    The rows are COPYed into a temporary staging table shaped like
+    ``table``, then merged with one INSERT ... SELECT ... ON CONFLICT.
+    Existing rows whose ``changed_columns`` already hold the same values
+    aren't touched, so they count as neither inserted nor updated.
+    """
+    if not rows:
+        return 0, 0
+    columns = list(rows[0])
+    staging = f"{table.name}_staging"
+    key = ', '.join(column.name for column in table.primary_key.columns)
+
+    await session.execute(text(
+        f"CREATE TEMPORARY TABLE IF NOT EXISTS {staging} "
+        f"(LIKE {table.name} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+    ))
+
+    # COPY bypasses SQLAlchemy's type processing, so encode those columns here
+    encoders = {
+        name: table.c[name].type for name in columns
+        if isinstance(table.c[name].type, CompressedJSON)
+    }
+    records = [
+        tuple(
+            encoders[name].process_bind_param(row[name], None) if name in encoders else row[name]
+            for name in columns
+        )
+        for row in rows
+    ]
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(staging, records=records, columns=columns)
+
+    column_list = ', '.join(columns)
+    assignments = ', '.join(f"{name} = EXCLUDED.{name}" for name in update_columns)
+    stored = ', '.join(f"target.{name}" for name in changed_columns)
+    incoming = ', '.join(f"EXCLUDED.{name}" for name in changed_columns)
+    result = await session.execute(text(
+        f"INSERT INTO {table.name} AS target ({column_list}) "
+        f"SELECT {column_list} FROM {staging} "
+        f"ON CONFLICT ({key}) DO UPDATE SET {assignments} "
+        f"WHERE ({stored}) IS DISTINCT FROM ({incoming}) "
+        # xmax is 0 for freshly inserted rows
+        f"RETURNING (xmax = 0) AS inserted"
+    ))
+    flags = result.scalars().all()
+    await session.execute(text(f"TRUNCATE {staging}"))
+    inserted = sum(1 for flag in flags if flag)
+    return inserted, len(flags) - inserted
@@ -0,0 +1,129 @@
+import asyncio
+import itertools
+from enum import IntEnum
+from time import monotonic
+from typing import Any, Awaitable, Callable, List, Optional
+
+# How long the writer waits for more operations before committing a group
+DEFAULT_MAX_DELAY = 0.005
+
+# Operations committed together at most
+DEFAULT_MAX_OPERATIONS = 64
+
+
+class WritePriority(IntEnum):
+    """Lower values are written first."""
+    INTERACTIVE = 0     # edits, merges and deletes the user is waiting on
+    BULK = 1            # syncs, imports and duplicate scan results
+
+# Queued by close(), so it sorts after every pending write
+_CLOSE_PRIORITY = len(WritePriority)
+
+
+class DatabaseWriter:
+    """Serializes every database write through one asyncio task.
+
+    An operation is an ``async def operation(session)`` that makes its
+    changes on the session it is given and may return a result. The writer
+    drains the queue in priority order and runs the operations that arrive
+    within ``max_delay`` seconds of each other, up to ``max_operations``,
+    in a single transaction, so SQLite takes the write lock and syncs once
+    per group instead of once per caller.
+
+    If a group fails, it is rolled back and its operations are retried one
+    transaction each, so one bad operation only fails its own caller.
+    """
+
+    def __init__(self, session_factory, max_delay: float = DEFAULT_MAX_DELAY,
+                 max_operations: int = DEFAULT_MAX_OPERATIONS):
+        self.session_factory = session_factory
+        self.max_delay = max_delay
+        self.max_operations = max_operations
+        self.queue: Optional[asyncio.PriorityQueue] = None
+        self.task: Optional[asyncio.Task] = None
+        self.groups_committed = 0
+        self.operations_committed = 0
+        # Keeps operations of the same priority in submission order
+        self._sequence = itertools.count()
+
+    def start(self):
+        if self.task is None:
+            self.queue = asyncio.PriorityQueue()
+            self.task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Write everything already queued, then stop the writer task."""
+        if self.task is None:
+            return
+        self.queue.put_nowait((_CLOSE_PRIORITY, next(self._sequence), None, None))
+        await self.task
+        self.task = None
+
+    def submit(self, operation: Callable[[Any], Awaitable[Any]],
+               priority: WritePriority = WritePriority.INTERACTIVE) -> asyncio.Future:
+        """Queue a write; the returned future resolves to its result once committed."""
+        if self.task is None:
+            raise RuntimeError("DatabaseWriter hasn't been started")
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((priority, next(self._sequence), operation, future))
+        return future
+
+    async def _run(self):
+        while True:
+            group = [await self.queue.get()]
+            deadline = monotonic() + self.max_delay
+            while len(group) < self.max_operations and group[-1][2] is not None:
+                timeout = deadline - monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    group.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            closing = group[-1][2] is None
+            # Callers that gave up don't need their writes made
+            operations = [
+                (operation, future) for _, _, operation, future in group
+                if operation is not None and not future.done()
+            ]
+            if operations:
+                await self._write_group(operations)
+            if closing:
+                return
+
+    async def _write_group(self, operations: List[tuple]):
+        try:
+            results = await self._transaction([operation for operation, _ in operations])
+        except Exception as e:
+            if len(operations) == 1:
+                self._resolve(operations[0][1], error=e)
+                return
+            for operation, future in operations:
+                try:
+                    result, = await self._transaction([operation])
+                except Exception as e:
+                    self._resolve(future, error=e)
+                else:
+                    self._resolve(future, result)
+            return
+
+        for (_, future), result in zip(operations, results):
+            self._resolve(future, result)
+
+    async def _transaction(self, operations) -> List[Any]:
+        async with self.session_factory() as session:
+            async with session.begin():
+                results = [await operation(session) for operation in operations]
+        self.groups_committed += 1
+        self.operations_committed += len(operations)
+        return results
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, result=None, error: Exception = None):
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
@@ -1,16 +1,24 @@
 from PySide6.QtWidgets import (
-    QDialog, QVBoxLayout, QLabel, QListWidget, QPushButton,
-    QHBoxLayout, QMessageBox, QApplication
+    QDialog, QVBoxLayout, QLabel, QListWidget, QListWidgetItem,
+    QPushButton, QHBoxLayout, QMessageBox, QApplication
 )
+from PySide6.QtCore import Qt
 import asyncio
+from src.core.clustering import DuplicateClusterer
 
 class DuplicateFinderDialog(QDialog):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, search=None):
+        """``search(progress)`` returns an async iterator of duplicate match batches."""
         super().__init__(parent)
         self.setWindowTitle("Find Duplicate Contacts")
         self.setMinimumWidth(800)
-        self.duplicate_groups = []
+        self.search = search
+        self.clusterer = DuplicateClusterer()
+        self.group_items = {}
+        self._scan_task = None
         self._setup_ui()
+        # Closing the dialog stops a search that is still running
+        self.finished.connect(lambda _: self.stop_search())
 
     def _setup_ui(self):
         layout = QVBoxLayout(self)
@@ -28,8 +36,9 @@ class DuplicateFinderDialog(QDialog):
         """)
         layout.addWidget(self.status_label)
         
-        # Duplicates list
+        # Duplicates list, one item per group of matching contacts
         self.duplicates_list = QListWidget()
+        self.duplicates_list.itemSelectionChanged.connect(self._update_merge_button)
         layout.addWidget(self.duplicates_list)
         
         # Buttons
@@ -39,6 +48,11 @@ class DuplicateFinderDialog(QDialog):
         self.find_button.clicked.connect(self._handle_find)
         button_layout.addWidget(self.find_button)
         
+        self.stop_button = QPushButton("Stop")
+        self.stop_button.clicked.connect(self.stop_search)
+        self.stop_button.setEnabled(False)
+        button_layout.addWidget(self.stop_button)
+        
         self.merge_button = QPushButton("Merge Selected")
         self.merge_button.clicked.connect(self._handle_merge)
         self.merge_button.setEnabled(False)
@@ -50,76 +64,145 @@ class DuplicateFinderDialog(QDialog):
         
         layout.addLayout(button_layout)
 
+    def show_progress(self, done: int, total: int):
+        """Show duplicate scan progress while candidate pairs are being scored."""
+        self.status_label.setText(f"Scored {done} of {total} candidate pairs")
+
     def _handle_find(self):
         """Handle Find Duplicates button click"""
+        self.start_search()
+
+    def start_search(self):
+        """Start a new duplicate search, replacing any previous results."""
+        self.stop_search()
+        self.clusterer = DuplicateClusterer()
+        self.group_items = {}
+        self.duplicates_list.clear()
         self.find_button.setEnabled(False)
+        self.stop_button.setEnabled(True)
         self.merge_button.setEnabled(False)
-        self.duplicates_list.clear()
-        asyncio.create_task(self.find_duplicates())
+        self._scan_task = asyncio.ensure_future(self.find_duplicates())
+
+    def stop_search(self):
+        """Cancel the running search, keeping the results found so far."""
+        if self._scan_task is not None and not self._scan_task.done():
+            self._scan_task.cancel()
 
     async def find_duplicates(self):
-        """Find and display duplicate contacts."""
+        """Find duplicate contacts, adding them to the list as they are found."""
         try:
             self.status_label.setText("Searching for duplicates...")
             QApplication.processEvents()
             
-            # Get duplicates from parent window
-            duplicate_pairs = self.parent().duplicate_groups
-            
-            # Debug print the pairs
-            print(f"Number of duplicate pairs: {len(duplicate_pairs)}")
-            for i, (contact1, contact2, confidence, reasons) in enumerate(duplicate_pairs, 1):
-                print(f"Pair {i}: {confidence*100:.1f}% confidence")
-                print(f"  Reasons: {reasons}")
-            
-            # Update status with count
-            total_pairs = len(duplicate_pairs)
+            async for matches in self.search(progress=self.show_progress):
+                self.add_matches(matches)
             
-            status_text = f"Found {total_pairs} potential duplicate pairs"
-            print(f"Setting status text to: {status_text}")
-            self.status_label.setText(status_text)
-            
-            # Clear and repopulate the list
-            self.duplicates_list.clear()
-            
-            for i, (contact1, contact2, confidence, reasons) in enumerate(duplicate_pairs, 1):
-                self.duplicates_list.addItem(
-                    f"Duplicate Pair {i} (Confidence: {confidence*100:.1f}%):"
-                )
-                
-                # First contact
-                name1 = f"{contact1.first_name} {contact1.last_name}".strip() or "No Name"
-                email1 = contact1.email or "No Email"
-                phone1 = contact1.phone or "No Phone"
-                source1 = contact1.source or "Unknown Source"
-                self.duplicates_list.addItem(
-                    f"    • [{source1}] {name1} | {email1} | {phone1}"
-                )
-                
-                # Second contact
-                name2 = f"{contact2.first_name} {contact2.last_name}".strip() or "No Name"
-                email2 = contact2.email or "No Email"
-                phone2 = contact2.phone or "No Phone"
-                source2 = contact2.source or "Unknown Source"
-                self.duplicates_list.addItem(
-                    f"    • [{source2}] {name2} | {email2} | {phone2}"
+            self._sort_groups()
+            if self.group_items:
+                total_pairs = sum(len(group.matches) for group in self.clusterer.groups)
+                self.status_label.setText(
+                    f"Found {len(self.group_items)} duplicate groups ({total_pairs} matching pairs)"
                 )
-                
-                # Add reasons for the match
-                if reasons:
-                    self.duplicates_list.addItem(f"    Matched because: {', '.join(reasons)}")
-                
-                self.duplicates_list.addItem("")  # Add spacing between groups
-            
-            self.find_button.setEnabled(True)
-            if duplicate_pairs:
-                self.merge_button.setEnabled(True)
-
+            else:
+                self.status_label.setText("No potential duplicate contacts were found.")
+        
+        except asyncio.CancelledError:
+            self._sort_groups()
+            self.status_label.setText(
+                f"Search stopped, showing {len(self.group_items)} duplicate groups found so far"
+            )
         except Exception as e:
             self.status_label.setText("Error finding duplicates")
             QMessageBox.critical(self, "Error", f"Failed to find duplicates: {str(e)}")
+        finally:
             self.find_button.setEnabled(True)
+            self.stop_button.setEnabled(False)
+            self._update_merge_button()
+
+    def add_matches(self, matches):
+        """Fold a batch of matches into the groups shown in the list."""
+        changed, absorbed = self.clusterer.add(matches)
+        
+        for group in absorbed:
+            item = self.group_items.pop(id(group))
+            self.duplicates_list.takeItem(self.duplicates_list.row(item))
+        
+        for group in changed:
+            item = self.group_items.get(id(group))
+            if item is None:
+                item = QListWidgetItem()
+                item.setData(Qt.UserRole, group)
+                self.duplicates_list.addItem(item)
+                self.group_items[id(group)] = item
+            item.setText(self._format_group(self.duplicates_list.row(item) + 1, group))
+
+    def _sort_groups(self):
+        """Order the list by strongest match once all results are in."""
+        groups = sorted(
+            self.clusterer.groups,
+            key=lambda g: (g.max_confidence, len(g.contacts)),
+            reverse=True
+        )
+        self.duplicates_list.clear()
+        self.group_items = {}
+        for i, group in enumerate(groups, 1):
+            item = QListWidgetItem(self._format_group(i, group))
+            item.setData(Qt.UserRole, group)
+            self.duplicates_list.addItem(item)
+            self.group_items[id(group)] = item
+
+    def _format_group(self, number, group):
+        """Render a duplicate group as the text of a single list item"""
+        if group.min_confidence == group.max_confidence:
+            confidence = f"{group.max_confidence*100:.1f}%"
+        else:
+            confidence = f"{group.min_confidence*100:.1f}%-{group.max_confidence*100:.1f}%"
+        lines = [
+            f"Duplicate Group {number}: {len(group.contacts)} contacts "
+            f"(Confidence: {confidence}, average {group.mean_confidence*100:.1f}%)"
+        ]
+        
+        for contact in group.contacts:
+            name = f"{contact.first_name or ''} {contact.last_name or ''}".strip() or "No Name"
+            email = contact.email or "No Email"
+            phone = contact.phone or "No Phone"
+            source = contact.source or "Unknown Source"
+            lines.append(f"    • [{source}] {name} | {email} | {phone}")
+        
+        # Add reasons for the match
+        if group.reasons:
+            lines.append(f"    Matched because: {', '.join(group.reasons)}")
+        
+        return "\n".join(lines)
+
+    def _update_merge_button(self):
+        self.merge_button.setEnabled(bool(self.duplicates_list.selectedItems()))
 
     def _handle_merge(self):
         """Handle Merge Selected button click"""
-        # ... existing merge handling code ...
\ No newline at end of file
+        selected = self.duplicates_list.selectedItems()
+        if not selected:
+            return
+        group = selected[0].data(Qt.UserRole)
+        asyncio.ensure_future(self.merge_group(group))
+
+    async def merge_group(self, group):
+        """Merge a group through the main window, then drop it from the list."""
+        self.merge_button.setEnabled(False)
+        try:
+            merged = await self.parent()._merge_duplicate_group(group)
+        finally:
+            self._update_merge_button()
+        if not merged:
+            return
+        
+        scanning = self._scan_task is not None and not self._scan_task.done()
+        if merged < len(group.contacts) - 1 or scanning:
+            # Part of the group is left, or the running search read the
+            # contacts before the merge; the rescan only re-scores the
+            # contacts the merge changed
+            self.start_search()
+            return
+        self.clusterer.remove(group)
+        self._sort_groups()
+        self.status_label.setText(f"Group merged, {len(self.group_items)} duplicate groups left")
@@ -10,24 +10,33 @@ from PySide6.QtWidgets import (
 from PySide6.QtCore import Qt, QSize, QTimer, QSettings
 from PySide6.QtGui import QKeySequence, QAction
 import asyncio
-from src.core.contact_manager import ContactManager, Contact
+import uuid
+from src.core.contact_manager import Contact, ContactManager
 from src.sources.gmail_source import GmailContactSource
-from src.db.database import init_db
-from sqlalchemy import select, delete
+from src.db.database import init_db, bulk_import, close_db
+from src.db.repository import ContactRepository
+from src.db.writer import DatabaseWriter
 import re
 from src.gui.contact_dialog import ContactDialog
 from src.gui.merge_dialog import MergeContactsDialog
 from src.gui.duplicate_finder_dialog import DuplicateFinderDialog
-from src.core.commands import MergeCommand
+from src.core.commands import EditCommand, MergeCommand
 from src.core.command_manager import CommandManager
 from src.sources.carddav_source import CardDAVSource
 from src.sources.imap_source import IMAPContactSource
 from src.sources.yahoo_source import YahooContactSource
 from src.sources.csv_source import CSVContactSource
 from src.gui.source_dialog import SourceSelectionDialog
-from datetime import datetime
 from src.gui.contact_details_dialog import ContactDetailsDialog
 
+# Imports at least this large are written with the bulk-import SQLite profile
+BULK_IMPORT_MIN_CONTACTS = 1000
+
+# Contacts read from the database per page while filling the table
+LOAD_BATCH_SIZE = 500
+
+TABLE_COLUMNS = ('id', 'first_name', 'last_name', 'email', 'phone', 'source')
+
 class AdvancedSearchDialog(QDialog):
     def __init__(self, parent=None, search_history=None):
         super().__init__(parent)
@@ -106,8 +115,12 @@ class ContactManagerWindow(QMainWindow):
         
         # Initialize components
         self.db_session = None
+        self.db_writer = None
         self.contact_manager = None
         self.command_manager = CommandManager()
+        # The running search; a new search cancels it, so only the latest
+        # one filters the table
+        self._search_task = None
         
         # Setup UI
         self._setup_ui()
@@ -270,6 +283,10 @@ class ContactManagerWindow(QMainWindow):
         clear_action.triggered.connect(self._show_clear_dialog)
         toolbar.addAction(clear_action)
         
+        export_action = QAction("Export CSV", self)
+        export_action.triggered.connect(lambda: asyncio.create_task(self._export_contacts()))
+        toolbar.addAction(export_action)
+        
         # Enable context menu for the table
         self.table.setContextMenuPolicy(Qt.CustomContextMenu)
         self.table.customContextMenuRequested.connect(self._show_context_menu)
@@ -285,30 +302,34 @@ class ContactManagerWindow(QMainWindow):
         """Initialize database and contact manager"""
         try:
             print("Initializing database...")
-            self.db_session = await init_db("sqlite+aiosqlite:///contacts.db")
+            self.db_session = await init_db()
+            # Sync, edits, merges and clears all write through this one task
+            self.db_writer = DatabaseWriter(self.db_session)
+            self.db_writer.start()
             print("Database initialized")
             
-            async with self.db_session() as session:
-                print("Creating contact manager...")
-                self.contact_manager = ContactManager(session)
-                
-                # Add Gmail source
-                print("Creating Gmail source...")
-                gmail_source = GmailContactSource()
-                await self.contact_manager.add_source(gmail_source)
-                print("Gmail source added")
-                
-                # Add Yahoo source
-                print("Creating Yahoo source...")
-                yahoo_source = YahooContactSource()
-                await self.contact_manager.add_source(yahoo_source)
-                print("Yahoo source added")
-                
-                # Add Yahoo CSV source
-                print("Creating Yahoo CSV source...")
-                yahoo_source = CSVContactSource(provider='yahoo')
-                await self.contact_manager.add_source(yahoo_source)
-                print("Yahoo source added")
+            print("Creating contact manager...")
+            # Syncs, searches and scans run as concurrent tasks, so the
+            # manager opens a session per operation rather than sharing one
+            self.contact_manager = ContactManager(session_factory=self.db_session, writer=self.db_writer)
+            
+            # Add Gmail source
+            print("Creating Gmail source...")
+            gmail_source = GmailContactSource()
+            await self.contact_manager.add_source(gmail_source)
+            print("Gmail source added")
+            
+            # Add Yahoo source
+            print("Creating Yahoo source...")
+            yahoo_source = YahooContactSource()
+            await self.contact_manager.add_source(yahoo_source)
+            print("Yahoo source added")
+            
+            # Add Yahoo CSV source
+            print("Creating Yahoo CSV source...")
+            yahoo_source = CSVContactSource(provider='yahoo')
+            await self.contact_manager.add_source(yahoo_source)
+            print("Yahoo source added")
             
             # Load existing contacts
             print("Loading existing contacts...")
@@ -323,47 +344,58 @@ class ContactManagerWindow(QMainWindow):
     
     async def _load_contacts(self):
         """Load contacts from database into table"""
-        from src.models.contact_model import ContactModel
-        from sqlalchemy import select
         from PySide6.QtCore import Qt
         
         self.table.setRowCount(0)  # Clear existing rows
         self.table.setSortingEnabled(False)  # Disable sorting while updating
         
         async with self.db_session() as session:
-            stmt = select(ContactModel)
-            result = await session.execute(stmt)
-            contacts = result.scalars().all()
+            contacts = ContactRepository(session)
             
             # Pre-allocate rows
-            self.table.setRowCount(len(contacts))
+            self.table.setRowCount(await contacts.count())
             
-            for row, contact in enumerate(contacts):
-                # Create items with proper flags
-                items = [
-                    QTableWidgetItem(str(contact.first_name or "")),
-                    QTableWidgetItem(str(contact.last_name or "")),
-                    QTableWidgetItem(str(contact.email or "")),
-                    QTableWidgetItem(str(contact.phone or "")),
-                    QTableWidgetItem(str(contact.source or ""))
-                ]
-                
-                # Set flags and items
-                for col, item in enumerate(items):
-                    item.setFlags(Qt.ItemIsEnabled | Qt.ItemIsSelectable)
-                    # Store contact ID in the first column's item
-                    if col == 0:
-                        item.setData(Qt.UserRole, contact.id)
-                    self.table.setItem(row, col, item)
+            # Only the displayed columns, a page at a time; metadata is
+            # loaded when details are opened
+            row = 0
+            async for batch in contacts.iter_batches(batch_size=LOAD_BATCH_SIZE, columns=TABLE_COLUMNS):
+                for contact in batch:
+                    # The table may have grown since it was counted
+                    if row >= self.table.rowCount():
+                        self.table.setRowCount(row + 1)
+                    
+                    # Create items with proper flags
+                    items = [
+                        QTableWidgetItem(str(contact.first_name or "")),
+                        QTableWidgetItem(str(contact.last_name or "")),
+                        QTableWidgetItem(str(contact.email or "")),
+                        QTableWidgetItem(str(contact.phone or "")),
+                        QTableWidgetItem(str(contact.source or ""))
+                    ]
+                    
+                    # Set flags and items
+                    for col, item in enumerate(items):
+                        item.setFlags(Qt.ItemIsEnabled | Qt.ItemIsSelectable)
+                        # Store contact ID in the first column's item
+                        if col == 0:
+                            item.setData(Qt.UserRole, contact.id)
+                        self.table.setItem(row, col, item)
+                    row += 1
                 
-                # Force update every 100 rows
-                if row % 100 == 0:
-                    QApplication.processEvents()
+                # Keep the UI responsive between pages
+                QApplication.processEvents()
+            
+            # Drop rows left over if contacts were deleted since the count
+            self.table.setRowCount(row)
         
         self.table.setSortingEnabled(True)  # Re-enable sorting
         
         # Update source filter
         self._update_source_filter()
+        
+        # Re-apply the current search to the reloaded rows
+        if self.search_input.text():
+            self._handle_search(self.search_input.text())
     
     def _handle_sync(self):
         """Handle sync button click"""
@@ -378,18 +410,23 @@ class ContactManagerWindow(QMainWindow):
         try:
             self.status_label.setText("Starting sync...")
             print("Starting sync...")
-            async with self.db_session() as session:
-                self.contact_manager.db = session
-                self.status_label.setText("Fetching contacts from Gmail...")
-                print("Fetching contacts from Gmail...")
-                contacts = await self.contact_manager.sync_all_sources()
-                print(f"Fetched {len(contacts)} contacts")
-                self.status_label.setText("Loading contacts into table...")
-                print("Loading contacts into table...")
-                await self._load_contacts()
-                msg = f"Synced {len(contacts)} contacts"
-                print(msg)
-                self.status_label.setText(msg)
+            self.status_label.setText(f"Fetching contacts from {len(self.contact_manager.sources)} sources...")
+            report = await self.contact_manager.sync_all_sources(
+                progress=lambda state: self.status_label.setText(state.describe())
+            )
+            print(report.summary())
+            self.status_label.setText("Loading contacts into table...")
+            print("Loading contacts into table...")
+            await self._load_contacts()
+            msg = f"Synced {report.saved} contacts"
+            if report.failed_contacts:
+                msg += f", {report.failed_contacts} could not be saved"
+            if report.failed_sources:
+                msg += f", {len(report.failed_sources)} sources failed"
+            if report.failed_contacts or report.failed_sources:
+                QMessageBox.warning(self, "Sync", report.summary())
+            print(msg)
+            self.status_label.setText(msg)
         except Exception as e:
             import traceback
             error_msg = f"Sync failed: {str(e)}\n\n{traceback.format_exc()}"
@@ -401,16 +438,37 @@ class ContactManagerWindow(QMainWindow):
     
     def _handle_search(self, search_text: str):
         """Filter contacts based on search text"""
-        search_text = search_text.lower()
+        self._start_search(self._apply_search(search_text))
+    
+    def _start_search(self, search):
+        """Run a search task in place of the one still running, if any"""
+        if self._search_task is not None:
+            self._search_task.cancel()
+        self._search_task = asyncio.create_task(search)
+    
+    async def _apply_search(self, search_text: str):
+        """Show only the contacts the search index matches"""
+        if not self.contact_manager:
+            return
+        try:
+            # Every match, or the filter would hide matches past the limit
+            contact_ids = await self.contact_manager.search_contact_ids(search_text, limit=None)
+        except Exception as e:
+            print(f"Search failed: {str(e)}")
+            # Don't leave the previous search's filter looking like the result
+            self._show_only_contacts(None)
+            self.status_label.setText(f"Search failed: {str(e)}")
+            return
+        self._show_only_contacts(contact_ids)
+    
+    def _show_only_contacts(self, contact_ids, accept=None):
+        """Hide rows whose contact isn't in contact_ids; None shows every row"""
+        visible = set(contact_ids) if contact_ids is not None else None
         for row in range(self.table.rowCount()):
-            matches = False
-            # Search across all columns
-            for col in range(self.table.columnCount()):
-                item = self.table.item(row, col)
-                if item and search_text in item.text().lower():
-                    matches = True
-                    break
-            # Show/hide row based on match
+            item = self.table.item(row, 0)
+            matches = visible is None or (item is not None and item.data(Qt.UserRole) in visible)
+            if matches and accept is not None:
+                matches = accept(row)
             self.table.setRowHidden(row, not matches)
     
     def _handle_filter(self, source: str):
@@ -440,23 +498,41 @@ class ContactManagerWindow(QMainWindow):
     
     def _handle_advanced_search(self, criteria):
         """Handle advanced search with multiple fields and regex support"""
-        for row in range(self.table.rowCount()):
-            matches = True
-            fields = ['first_name', 'last_name', 'email', 'phone']
-            
-            for field, col in zip(fields, range(4)):
-                if criteria[field]:
-                    item = self.table.item(row, col)
-                    if not self._text_matches(
-                        item,
-                        criteria[field],
-                        criteria['case_sensitive'],
-                        criteria.get('is_regex', False)
-                    ):
-                        matches = False
-                        break
-            
-            self.table.setRowHidden(row, not matches)
+        self._start_search(self._apply_advanced_search(criteria))
+    
+    async def _apply_advanced_search(self, criteria):
+        """Filter rows by field criteria, narrowed down by the search index"""
+        fields = ['first_name', 'last_name', 'email', 'phone']
+        
+        def accept(row):
+            for col, field in enumerate(fields):
+                if criteria[field] and not self._text_matches(
+                    self.table.item(row, col),
+                    criteria[field],
+                    criteria['case_sensitive'],
+                    criteria.get('is_regex', False)
+                ):
+                    return False
+            return True
+        
+        contact_ids = None
+        # Regexes can't be answered by the index, so those check every row
+        if not criteria.get('is_regex', False) and self.contact_manager:
+            try:
+                contact_ids = await self.contact_manager.search_contact_ids(
+                    fields={field: criteria[field] for field in fields}, limit=None
+                )
+            except Exception as e:
+                # Fall back to checking every row
+                print(f"Search failed: {str(e)}")
+                self.status_label.setText(f"Search index failed, checked every contact: {str(e)}")
+            if contact_ids is not None and not criteria['case_sensitive']:
+                # The index already matched every field
+                self._show_only_contacts(contact_ids)
+                return
+        
+        # Case-sensitive searches re-check the index matches against the table
+        self._show_only_contacts(contact_ids, accept)
     
     def _text_matches(self, item, search_text: str, case_sensitive: bool, is_regex: bool = False) -> bool:
         """Check if item text matches search text using normal or regex search"""
@@ -505,8 +581,14 @@ class ContactManagerWindow(QMainWindow):
     def closeEvent(self, event):
         """Save settings when window is closed"""
         self._save_filter_settings()
+        # Queued writes are committed by shutdown() once the event loop stops
         super().closeEvent(event)
     
+    async def shutdown(self):
+        """Commit the writes still queued and close the database."""
+        if self.db_session:
+            await close_db(self.db_session, self.db_writer)
+    
     def _create_shortcut(self, key, slot):
         """Create a keyboard shortcut"""
         action = QAction(self)
@@ -604,6 +686,47 @@ class ContactManagerWindow(QMainWindow):
         contact_ids = [self.table.item(row, 0).data(Qt.UserRole) for row in rows]
         asyncio.create_task(self._delete_contacts(contact_ids))
     
+    async def _add_contact(self, contact_data):
+        """Save a contact entered in the add dialog"""
+        try:
+            contact_id = f"local_{uuid.uuid4()}"
+            contact = Contact(
+                id=contact_id,
+                first_name=contact_data['first_name'],
+                last_name=contact_data['last_name'],
+                email=contact_data['email'],
+                phone=contact_data['phone'],
+                source='local',
+                source_id=contact_id,
+                metadata={}
+            )
+            await self.contact_manager._save_contact(contact)
+            await self._load_contacts()  # Refresh the table
+            self.status_label.setText("Contact added")
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to add contact: {str(e)}")
+    
+    async def _update_contact(self, contact_id, updated_data):
+        """Apply an edit as an undoable command"""
+        try:
+            command = EditCommand(self.contact_manager, contact_id, updated_data)
+            await self.command_manager.execute(command)
+            await self._load_contacts()  # Refresh the table
+            self.status_label.setText("Contact updated")
+            self._update_undo_redo_actions()
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to update contact: {str(e)}")
+    
+    async def _delete_contacts(self, contact_ids):
+        """Delete contacts from the database"""
+        try:
+            await self.contact_manager.delete_contacts(contact_ids)
+            
+            await self._load_contacts()  # Refresh the table
+            self.status_label.setText(f"Deleted {len(contact_ids)} contact(s)")
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to delete contacts: {str(e)}")
+    
     def _show_merge_dialog(self):
         """Show dialog to merge contacts"""
         selected = self.table.selectedItems()
@@ -648,41 +771,53 @@ class ContactManagerWindow(QMainWindow):
                 merged_data
             ))
     
-    async def _merge_contacts(self, source_id: str, target_id: str, merged_data: dict):
-        """Merge two contacts using the command pattern"""
+    async def _merge_contacts(self, source_id: str, target_id: str, merged_data: dict) -> bool:
+        """Merge two contacts using the command pattern; returns whether it worked"""
         try:
             command = MergeCommand(self.contact_manager, source_id, target_id, merged_data)
             await self.command_manager.execute(command)
             await self._load_contacts()  # Refresh the table
             self.status_label.setText("Contacts merged successfully")
             self._update_undo_redo_actions()
+            return True
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to merge contacts: {str(e)}")
+            return False
     
-    async def _find_duplicates(self):
-        """Find potential duplicate contacts"""
-        try:
-            async with self.db_session() as session:
-                self.contact_manager.db = session
-                duplicates = await self.contact_manager.find_duplicates()
-                if duplicates:
-                    dialog = DuplicateFinderDialog(self)
-                    self.duplicate_groups = duplicates
-                    await dialog.find_duplicates()
-                    dialog.exec_()
-                else:
-                    QMessageBox.information(
-                        self,
-                        "No Duplicates",
-                        "No potential duplicate contacts were found."
-                    )
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to find duplicates: {str(e)}")
+    async def _iter_duplicates(self, progress=None):
+        """Stream duplicate matches from the contact manager"""
+        async for matches in self.contact_manager.iter_duplicates(progress=progress):
+            yield matches
+    
+    async def _merge_duplicate_group(self, group) -> int:
+        """Merge each contact of a duplicate group into the group's first contact
+        
+        Returns how many contacts were merged, which is less than the rest
+        of the group when the user cancels or a merge fails.
+        """
+        fields = ('first_name', 'last_name', 'email', 'phone', 'source')
+        target = group.contacts[0]
+        target_data = {'id': target.id, **{field: getattr(target, field) for field in fields}}
+        merged = 0
+        
+        for contact in group.contacts[1:]:
+            contact_data = {'id': contact.id, **{field: getattr(contact, field) for field in fields}}
+            dialog = MergeContactsDialog(self, contact_data, target_data)
+            if not dialog.exec_():
+                break
+            merged_data = dialog.get_merged_data()
+            if not await self._merge_contacts(contact.id, target.id, merged_data):
+                break
+            merged += 1
+            # Later merges in the group build on this one
+            target_data.update(merged_data)
+        return merged
     
     def _show_duplicates(self):
         """Show duplicate finder dialog"""
-        self.status_label.setText("Finding duplicates...")
-        asyncio.create_task(self._find_duplicates())
+        dialog = DuplicateFinderDialog(self, search=self._iter_duplicates)
+        dialog.show()
+        dialog.start_search()
     
     def _update_undo_redo_actions(self):
         """Update the enabled state of undo/redo actions"""
@@ -718,6 +853,13 @@ class ContactManagerWindow(QMainWindow):
             source_info = dialog.get_source_info()
             asyncio.create_task(self._import_source(source_info))
     
+    async def _export_contacts(self):
+        """Export every stored contact to a CSV file"""
+        if not self.contact_manager:
+            return
+        # Streams from the database, so the export never holds the whole book
+        await CSVContactSource().push_contacts(self.contact_manager.iter_contacts())
+    
     def _show_clear_dialog(self):
         """Show confirmation dialog for clearing database"""
         result = QMessageBox.warning(
@@ -736,10 +878,7 @@ class ContactManagerWindow(QMainWindow):
         """Clear all contacts from the database"""
         try:
             self.status_label.setText("Clearing database...")
-            async with self.db_session() as session:
-                from src.models.contact_model import ContactModel
-                await session.execute(delete(ContactModel))
-                await session.commit()
+            await self.contact_manager.clear_contacts()
             
             await self._load_contacts()  # Refresh the table
             self.status_label.setText("Database cleared successfully")
@@ -753,26 +892,34 @@ class ContactManagerWindow(QMainWindow):
         try:
             self.status_label.setText(f"Importing from {source_info['type']}...")
             
-            async with self.db_session() as session:
-                self.contact_manager.db = session
-                
-                if source_info['type'] == 'Gmail':
-                    source = GmailContactSource()
-                    source.source_name = source_info['name']
-                elif source_info['type'] == 'CSV Import':
-                    source = CSVContactSource(provider=source_info['name'])
-                else:
-                    raise ValueError(f"Unknown source type: {source_info['type']}")
-                
-                contacts = await source.fetch_contacts()
-                
-                # Save contacts to database
-                for contact in contacts:
-                    contact.source = source_info['name']  # Override source name
-                    await self._save_contact(contact)
-                
-                await self._load_contacts()  # Refresh the table
-                self.status_label.setText(f"Imported {len(contacts)} contacts from {source_info['name']}")
+            if source_info['type'] == 'Gmail':
+                source = GmailContactSource(projection=source_info['gmail_profile'])
+                source.source_name = source_info['name']
+            elif source_info['type'] == 'CSV Import':
+                source = CSVContactSource(provider=source_info['name'])
+            else:
+                raise ValueError(f"Unknown source type: {source_info['type']}")
+            
+            contacts = await source.fetch_contacts()
+            
+            # Save contacts to database
+            for contact in contacts:
+                contact.source = source_info['name']  # Override source name
+            if len(contacts) >= BULK_IMPORT_MIN_CONTACTS:
+                async with bulk_import(self.db_session):
+                    result = await self.contact_manager.save_contacts(contacts)
+            else:
+                result = await self.contact_manager.save_contacts(contacts)
+            
+            await self._load_contacts()  # Refresh the table
+            counts = f"{result.inserted} new, {result.updated} updated, {result.skipped} skipped"
+            if result.errors:
+                counts += f", {len(result.errors)} failed"
+            self.status_label.setText(f"Imported {result.saved} contacts from {source_info['name']} ({counts})")
+            if result.errors:
+                QMessageBox.warning(self, "Import", "\n".join(
+                    f"{contact_id}: {error}" for contact_id, error in list(result.errors.items())[:20]
+                ))
                 
         except Exception as e:
             self.status_label.setText("Import failed")
@@ -800,34 +947,6 @@ class ContactManagerWindow(QMainWindow):
         else:
             self.source_filter.setCurrentIndex(0)  # Set to "All Sources"
     
-    async def _save_contact(self, contact: Contact):
-        """Save a contact to the database"""
-        try:
-            async with self.db_session() as session:
-                from src.models.contact_model import ContactModel
-                
-                # Create new contact model
-                contact_model = ContactModel(
-                    id=contact.id,
-                    first_name=contact.first_name,
-                    last_name=contact.last_name,
-                    email=contact.email,
-                    phone=contact.phone,
-                    source=contact.source,
-                    source_id=contact.source_id,
-                    contact_metadata=contact.metadata,
-                    created_at=datetime.utcnow(),
-                    updated_at=datetime.utcnow()
-                )
-                
-                # Add to database
-                session.add(contact_model)
-                await session.commit()
-                
-        except Exception as e:
-            print(f"Error saving contact: {str(e)}")
-            raise
-    
     def _show_contact_details(self, item):
         """Show contact details when a contact is double-clicked"""
         row = item.row()
@@ -846,14 +965,10 @@ class ContactManagerWindow(QMainWindow):
     async def _show_contact_details_async(self, contact_data):
         """Load contact metadata and show details dialog"""
         try:
-            async with self.db_session() as session:
-                from src.models.contact_model import ContactModel
-                contact = await session.get(ContactModel, contact_data['id'])
-                if contact:
-                    contact_data['metadata'] = contact.contact_metadata
-                    
-                    dialog = ContactDetailsDialog(contact_data, self)
-                    dialog.exec_()
+            contact_data['metadata'] = await self.contact_manager.get_contact_metadata(contact_data['id'])
+            
+            dialog = ContactDetailsDialog(contact_data, self)
+            dialog.exec_()
                     
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to load contact details: {str(e)}")
\ No newline at end of file
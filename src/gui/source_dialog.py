@@ -3,6 +3,13 @@ from PySide6.QtWidgets import (
     QPushButton, QDialogButtonBox, QLabel, QComboBox
 )
 
+# Gmail projection profiles, see src.sources.gmail_source.PROJECTION_PROFILES
+GMAIL_PROFILES = [
+    ('standard', "Standard - everything the app shows"),
+    ('minimal', "Minimal - names, emails and phones only"),
+    ('full', "Full - also keep the raw Google data"),
+]
+
 class SourceSelectionDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -24,6 +31,15 @@ class SourceSelectionDialog(QDialog):
         self.source_name.setPlaceholderText("e.g., Work Gmail, Personal Contacts")
         form.addRow("Source Name:", self.source_name)
         
+        # How much of each Gmail contact to download and keep
+        self.gmail_profile = QComboBox()
+        for profile, label in GMAIL_PROFILES:
+            self.gmail_profile.addItem(label, profile)
+        form.addRow("Gmail Fields:", self.gmail_profile)
+        self.source_type.currentTextChanged.connect(
+            lambda source_type: self.gmail_profile.setEnabled(source_type == 'Gmail')
+        )
+        
         layout.addLayout(form)
         
         # Add buttons
@@ -44,5 +60,6 @@ class SourceSelectionDialog(QDialog):
     def get_source_info(self):
         return {
             'type': self.source_type.currentText(),
-            'name': self.source_name.text().strip()
+            'name': self.source_name.text().strip(),
+            'gmail_profile': self.gmail_profile.currentData()
         } 
\ No newline at end of file
@@ -14,6 +14,8 @@ def main():
     
     with loop:
         loop.run_forever()
+        # The window is gone, but its queued writes must still reach the database
+        loop.run_until_complete(window.shutdown())
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
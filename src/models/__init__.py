@@ -1,3 +1,6 @@
 from .contact_model import ContactModel, Base
+from .duplicate_model import DuplicateCandidateModel
+from .app_state_model import AppStateModel
+from .schema_migration_model import SchemaMigrationModel
 
-__all__ = ['ContactModel', 'Base'] 
\ No newline at end of file
+__all__ = ['ContactModel', 'DuplicateCandidateModel', 'AppStateModel', 'SchemaMigrationModel', 'Base'] 
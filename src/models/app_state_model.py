@@ -0,0 +1,10 @@
+from sqlalchemy import Column, String, DateTime
+from .contact_model import Base
+
+class AppStateModel(Base):
+    """Key/value store for bookkeeping such as scan watermarks."""
+    __tablename__ = 'app_state'
+    
+    key = Column(String, primary_key=True)
+    value = Column(String)
+    updated_at = Column(DateTime)
@@ -0,0 +1,58 @@
+import json
+import msgpack
+import zstandard
+from sqlalchemy import LargeBinary
+from sqlalchemy.types import TypeDecorator
+
+# First byte of every encoded value, so the format can differ per row
+FORMAT_MSGPACK_ZSTD = 1
+# Small values that compression would only make bigger, like {}
+FORMAT_MSGPACK = 2
+
+ZSTD_LEVEL = 3
+
+_compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+_decompressor = zstandard.ZstdDecompressor()
+
+
+def encode_json(value) -> bytes:
+    """Pack a JSON-like value as a format tag followed by (compressed) msgpack."""
+    packed = msgpack.packb(value, use_bin_type=True, default=str)
+    compressed = _compressor.compress(packed)
+    if len(compressed) < len(packed):
+        return bytes([FORMAT_MSGPACK_ZSTD]) + compressed
+    return bytes([FORMAT_MSGPACK]) + packed
+
+
+def decode_json(data):
+    """Decode a value written by encode_json() or stored as plain JSON text."""
+    if isinstance(data, str):
+        # Written before metadata was compressed
+        return json.loads(data)
+    data = bytes(data)
+    tag = data[0] if data else None
+    if tag == FORMAT_MSGPACK_ZSTD:
+        return msgpack.unpackb(_decompressor.decompress(data[1:]), raw=False, strict_map_key=False)
+    if tag == FORMAT_MSGPACK:
+        return msgpack.unpackb(data[1:], raw=False, strict_map_key=False)
+    return json.loads(data.decode('utf-8'))
+
+
+class CompressedJSON(TypeDecorator):
+    """JSON-like values stored as tagged, zstd-compressed msgpack blobs.
+
+    Reads also accept the plain JSON text of the JSON type, so older rows
+    decode as they are and get compressed the next time they're written.
+    """
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return encode_json(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return decode_json(value)
@@ -1,10 +1,21 @@
-from sqlalchemy import Column, String, JSON, DateTime, Table, MetaData
+from sqlalchemy import Column, String, JSON, DateTime, Table, MetaData, Index
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import deferred
+from src.core.normalize import MatchFields, match_fields
+from src.models.compressed_json import CompressedJSON
 
 Base = declarative_base()
 
 class ContactModel(Base):
     __tablename__ = 'contacts'
+    __table_args__ = (
+        Index('ix_contacts_email', 'email'),
+        Index('ix_contacts_phone_digits', 'phone_digits'),
+        Index('ix_contacts_source', 'source'),
+        Index('ix_contacts_source_source_id', 'source', 'source_id', unique=True),
+        Index('ix_contacts_sync_source', 'sync_source'),
+        Index('ix_contacts_updated_at', 'updated_at'),
+    )
     
     id = Column(String, primary_key=True)
     first_name = Column(String)
@@ -13,6 +24,47 @@ class ContactModel(Base):
     phone = Column(String)
     source = Column(String)
     source_id = Column(String)
-    contact_metadata = Column(JSON)
+    # Name the source whose sync last saved the contact is registered under;
+    # a full sync only removes contacts it owns. NULL until a sync saves it
+    sync_source = Column(String)
+    # Raw source payloads can be large, so they are stored compressed and
+    # only loaded when asked for with undefer() or a column select; touching
+    # the attribute without that raises instead of silently loading it
+    contact_metadata = deferred(Column(CompressedJSON), raiseload=True)
     created_at = Column(DateTime)
-    updated_at = Column(DateTime) 
\ No newline at end of file
+    updated_at = Column(DateTime)
+    
+    # Normalized copies of the fields above used for duplicate detection,
+    # kept current by update_match_fields()
+    phone_digits = Column(String)
+    phone_last7 = Column(String)
+    email_lower = Column(String)
+    email_local = Column(String)
+    name_normalized = Column(String)
+    
+    # Searchable metadata fields, copied out of contact_metadata on save by
+    # metadata_search_fields() so the search index triggers can read them
+    company = Column(String)
+    title = Column(String)
+    notes = Column(String)
+    
+    # content_hash() of the fields and metadata as last saved from a source;
+    # NULL after local edits, so the next sync writes the contact again
+    content_hash = Column(String)
+    
+    def update_match_fields(self):
+        """Recompute the normalized match columns from the contact fields."""
+        fields = match_fields(self.first_name, self.last_name, self.email, self.phone)
+        for name, value in fields._asdict().items():
+            setattr(self, name, value)
+        # Only save_contacts knows the metadata the hash covers
+        self.content_hash = None
+    
+    def get_match_fields(self) -> MatchFields:
+        return MatchFields(
+            phone_digits=self.phone_digits,
+            phone_last7=self.phone_last7,
+            email_lower=self.email_lower,
+            email_local=self.email_local,
+            name_normalized=self.name_normalized
+        )
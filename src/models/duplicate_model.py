@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, Float, JSON, DateTime
+from .contact_model import Base
+
+class DuplicateCandidateModel(Base):
+    """A scored duplicate pair kept between scans."""
+    __tablename__ = 'duplicate_candidates'
+    
+    contact_id_1 = Column(String, primary_key=True)
+    contact_id_2 = Column(String, primary_key=True, index=True)
+    confidence = Column(Float)
+    reasons = Column(JSON)
+    scored_at = Column(DateTime)
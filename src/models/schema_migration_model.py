@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, String, DateTime, Float
+from .contact_model import Base
+
+class SchemaMigrationModel(Base):
+    """Schema migrations applied to this database, see src/db/migrations.py."""
+    __tablename__ = 'schema_migrations'
+    
+    version = Column(Integer, primary_key=True)
+    name = Column(String)
+    applied_at = Column(DateTime)
+    duration_ms = Column(Float)
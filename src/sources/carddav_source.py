@@ -271,6 +271,12 @@ class CardDAVSource(ContactSource):
     
     async def fetch_contacts(self) -> List[Contact]:
         """Fetch contacts from CardDAV server."""
+        # caldav makes a blocking request for nearly every call, so the
+        # whole fetch runs on a source thread
+        return await self.run_blocking(self._read_contacts)
+    
+    def _read_contacts(self) -> List[Contact]:
+        """Read every vCard of every address book."""
         try:
             print(f"Starting {self.provider} CardDAV contact fetch...")
             contacts = []
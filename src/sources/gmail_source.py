@@ -1,10 +1,12 @@
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
 from core.contact_manager import ContactSource, Contact
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 import os
+import json
 import pickle
 import asyncio
 import logging
@@ -15,9 +17,65 @@ SCOPES = ['https://www.googleapis.com/auth/contacts.readonly']
 TOKEN_PICKLE_PATH = 'token.pickle'
 CREDENTIALS_FILE = 'credentials.json'
 
+# People per connections.list page, the most the API allows
+PAGE_SIZE = 1000
+
+# Pages waiting between the fetch, convert and save stages
+PIPELINE_DEPTH = 2
+
+# Ends the page and batch queues
+_END = object()
+
+# ErrorInfo reason of the People API's answer to a syncToken older than 7 days
+EXPIRED_SYNC_TOKEN = 'EXPIRED_SYNC_TOKEN'
+
+# Parts of each person field that _person_to_contact() reads
+PERSON_SUBFIELDS = {
+    'names': 'givenName,familyName',
+    'emailAddresses': 'value,type',
+    'phoneNumbers': 'value,type',
+    'addresses': 'type,formattedValue,streetAddress,city,region,postalCode,country',
+    'organizations': 'name,title',
+    'biographies': 'value',
+    'birthdays': 'date',
+    'urls': 'value,type',
+}
+
+# How much of each person a sync requests and keeps. Leaner profiles
+# download, hold and store less: 'raw_data' keeps the whole API response
+# in the contact's metadata, without it the response is also trimmed to
+# PERSON_SUBFIELDS.
+PROJECTION_PROFILES = {
+    # What the contacts table shows
+    'minimal': {
+        'person_fields': ('names', 'emailAddresses', 'phoneNumbers'),
+        'raw_data': False,
+    },
+    # Also what the details dialog shows
+    'standard': {
+        'person_fields': tuple(PERSON_SUBFIELDS),
+        'raw_data': False,
+    },
+    'full': {
+        'person_fields': tuple(PERSON_SUBFIELDS),
+        'raw_data': True,
+    },
+}
+
+DEFAULT_PROJECTION = 'standard'
+
 class GmailContactSource(ContactSource):
-    def __init__(self):
-        """Initialize Gmail contact source."""
+    # Syncs after the first one only fetch people changed since the last
+    incremental = True
+    
+    def __init__(self, projection: str = DEFAULT_PROJECTION):
+        """Initialize Gmail contact source.
+        
+        ``projection`` names one of PROJECTION_PROFILES.
+        """
+        if projection not in PROJECTION_PROFILES:
+            raise ValueError(f"Unknown Gmail projection profile: {projection}")
+        self.projection = projection
         self.credentials = None
         self.service = None
         
@@ -41,8 +99,12 @@ class GmailContactSource(ContactSource):
     async def _get_service(self):
         """Get or create the Google People API service."""
         if not self.service:
-            self.credentials = self._get_credentials()
-            self.service = build('people', 'v1', credentials=self.credentials, cache_discovery=False)
+            # Loading, refreshing or authorizing credentials and fetching the
+            # discovery document all block on the network
+            self.credentials = await self.run_blocking(self._get_credentials)
+            self.service = await self.run_blocking(
+                build, 'people', 'v1', credentials=self.credentials, cache_discovery=False
+            )
         return self.service
 
     def _get_credentials(self) -> Credentials:
@@ -95,126 +157,246 @@ class GmailContactSource(ContactSource):
             raise
     
     async def fetch_contacts(self) -> List[Contact]:
-        """Fetch contacts using Google's People API."""
+        """Fetch contacts using Google's People API, see iter_contact_batches()."""
+        contacts = []
+        async for batch in self.iter_contact_batches():
+            contacts.extend(batch)
+        return contacts
+    
+    async def iter_contact_batches(self, progress=None) -> AsyncIterator[List[Contact]]:
+        """Fetch contacts using Google's People API, one batch per page.
+        
+        Fetches everyone, or with ``sync_token`` set only the people changed
+        since it was issued, listing deleted ones in ``deleted_contact_ids``.
+        An expired token clears ``sync_token`` and fetches everyone.
+        
+        Fetching, converting and the caller's handling of each batch overlap:
+        the next pages download while a batch is being saved. At most
+        PIPELINE_DEPTH pages wait between stages, which bounds memory
+        however big the account is.
+        """
+        self.logger.info("Starting Gmail contact fetch...")
+        service = await self._get_service()
+        self.logger.info("Successfully connected to Google People API")
+        
+        if self.sync_token and not self.sync_token.startswith(f"{self.projection}:"):
+            # Tokens only work with the fields they were issued for, and the
+            # stored contacts need refetching with the new ones anyway
+            self.logger.info("Projection profile changed, fetching all contacts")
+            self.sync_token = None
+        
+        self.deleted_contact_ids = []
+        pages = asyncio.Queue(maxsize=PIPELINE_DEPTH)
+        batches = asyncio.Queue(maxsize=PIPELINE_DEPTH)
+        stages = [
+            asyncio.create_task(self._fetch_pages(service, pages, progress)),
+            asyncio.create_task(self._convert_pages(pages, batches)),
+        ]
+        processed = 0
         try:
-            self.logger.info("Starting Gmail contact fetch...")
-            service = await self._get_service()
-            self.logger.info("Successfully connected to Google People API")
-            
-            # Call the People API
-            self.logger.info("Fetching contacts from Google...")
-            results = service.people().connections().list(
-                resourceName='people/me',
-                pageSize=2000,
-                personFields='names,emailAddresses,phoneNumbers,addresses,organizations,biographies,birthdays,urls'
-            ).execute()
-            connections = results.get('connections', [])
-            self.logger.info(f"Found {len(connections)} contacts")
-            
+            while True:
+                batch = await batches.get()
+                if batch is _END:
+                    break
+                if isinstance(batch, BaseException):
+                    raise batch
+                processed += len(batch)
+                yield batch
+        except BaseException as e:
+            if not isinstance(e, (asyncio.CancelledError, GeneratorExit)):
+                self.logger.error("Failed to fetch contacts:")
+                self.logger.error(str(e))
+                self.logger.error(traceback.format_exc())
+            raise
+        finally:
+            for stage in stages:
+                stage.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
+        
+        self.logger.info("\nImport Summary:")
+        self.logger.info(f"{'Changed' if self.sync_token else 'Total'} contacts processed: {processed}")
+        self.logger.info(f"Deleted: {len(self.deleted_contact_ids)}")
+        self.logger.info("="*40)
+    
+    async def _fetch_pages(self, service, pages: asyncio.Queue, progress=None):
+        """Producer: put each page's people on ``pages``, then _END.
+        
+        Leaves the token for the next sync in ``next_sync_token``, tagged
+        with the projection profile it was requested with.
+        """
+        profile = PROJECTION_PROFILES[self.projection]
+        person_fields = profile['person_fields']
+        fields = None
+        if not profile['raw_data']:
+            fields = 'nextPageToken,nextSyncToken,connections(resourceName,metadata/deleted,{})'.format(
+                ','.join(f"{field}({PERSON_SUBFIELDS[field]})" for field in person_fields)
+            )
+        try:
+            page_token = None
+            fetched = page_count = 0
+            while True:
+                request = service.people().connections().list(
+                    resourceName='people/me',
+                    pageSize=PAGE_SIZE,
+                    personFields=','.join(person_fields),
+                    fields=fields,
+                    requestSyncToken=True,
+                    syncToken=self.sync_token.split(':', 1)[1] if self.sync_token else None,
+                    pageToken=page_token
+                )
+                try:
+                    results = await self.run_blocking(request.execute)
+                except HttpError as e:
+                    # Sync tokens expire after 7 days, which the API reports on
+                    # the first page
+                    if self.sync_token is None or page_token is not None or not self._is_expired_token_error(e):
+                        raise
+                    self.logger.warning("Sync token expired, fetching all contacts")
+                    self.sync_token = None
+                    continue
+                connections = results.get('connections', [])
+                fetched += len(connections)
+                page_count += 1
+                self.logger.info(f"Fetched page {page_count}, {fetched} contacts so far")
+                if progress:
+                    progress(page_count, fetched)
+                await pages.put(connections)
+                page_token = results.get('nextPageToken')
+                if not page_token:
+                    if results.get('nextSyncToken'):
+                        self.next_sync_token = f"{self.projection}:{results['nextSyncToken']}"
+                    await pages.put(_END)
+                    return
+        except Exception as e:
+            await pages.put(e)
+    
+    async def _convert_pages(self, pages: asyncio.Queue, batches: asyncio.Queue):
+        """Turn each page of people into Contacts, collecting deleted ids."""
+        processed = 0
+        while True:
+            page = await pages.get()
+            if page is _END or isinstance(page, BaseException):
+                await batches.put(page)
+                return
             contacts = []
-            for i, person in enumerate(connections, 1):
+            for person in page:
+                processed += 1
+                if person.get('metadata', {}).get('deleted'):
+                    # Incremental syncs list removed people with only their resourceName
+                    self.deleted_contact_ids.append(self._contact_id(person))
+                    continue
                 try:
-                    self.logger.info(f"\nProcessing contact {i}/{len(connections)}:")
-                    
-                    # Extract basic info
-                    names = person.get('names', [])
-                    name = names[0] if names else {}
-                    first_name = name.get('givenName', '')
-                    last_name = name.get('familyName', '')
-                    self.logger.info(f"Name: {first_name} {last_name}")
-                    
-                    # Extract all phone numbers
-                    phones = person.get('phoneNumbers', [])
-                    primary_phone = phones[0].get('value') if phones else None
-                    additional_phones = [
-                        {'type': phone.get('type', 'Other'), 'number': phone.get('value')}
-                        for phone in phones[1:]  # Skip the first (primary) phone
-                    ]
-                    if primary_phone:
-                        self.logger.info(f"Primary phone: {primary_phone}")
-                    if additional_phones:
-                        self.logger.info(f"Additional phones: {additional_phones}")
-                    
-                    # Extract all email addresses
-                    emails = person.get('emailAddresses', [])
-                    primary_email = emails[0].get('value') if emails else None
-                    additional_emails = [
-                        {'type': email.get('type', 'Other'), 'value': email.get('value')}
-                        for email in emails[1:]  # Skip the first (primary) email
-                    ]
-                    if primary_email:
-                        self.logger.info(f"Primary email: {primary_email}")
-                    if additional_emails:
-                        self.logger.info(f"Additional emails: {additional_emails}")
-                    
-                    # Extract addresses
-                    addresses = person.get('addresses', [])
-                    if addresses:
-                        self.logger.info(f"Found {len(addresses)} addresses")
-                    
-                    # Extract organization info
-                    organizations = person.get('organizations', [])
-                    org = organizations[0] if organizations else {}
-                    if org:
-                        self.logger.info(f"Organization: {org.get('name')} - {org.get('title')}")
-                    
-                    # Extract biography/notes
-                    biographies = person.get('biographies', [])
-                    notes = biographies[0].get('value') if biographies else None
-                    if notes:
-                        self.logger.info("Has notes/biography")
-                    
-                    # Extract birthday
-                    birthdays = person.get('birthdays', [])
-                    birthday = birthdays[0].get('date') if birthdays else None
-                    if birthday:
-                        self.logger.info(f"Has birthday: {birthday}")
-                    
-                    # Extract websites
-                    urls = person.get('urls', [])
-                    if urls:
-                        self.logger.info(f"Found {len(urls)} websites")
-                    
-                    contact = Contact(
-                        id=f"google_{person['resourceName'].split('/')[-1]}",
-                        first_name=first_name,
-                        last_name=last_name,
-                        email=primary_email,
-                        phone=primary_phone,
-                        source='google',
-                        source_id=person['resourceName'],
-                        metadata={
-                            'additional_phones': additional_phones,
-                            'additional_emails': additional_emails,
-                            'addresses': addresses,
-                            'company': org.get('name'),
-                            'title': org.get('title'),
-                            'notes': notes,
-                            'birthday': birthday,
-                            'websites': urls,
-                            'raw_data': person  # Store complete response
-                        }
-                    )
-                    contacts.append(contact)
-                    
+                    self.logger.info(f"\nProcessing contact {processed}:")
+                    contacts.append(self._person_to_contact(person))
                 except Exception as e:
-                    self.logger.error(f"Error processing contact {i}:")
+                    self.logger.error(f"Error processing contact {processed}:")
                     self.logger.error(f"Error: {str(e)}")
                     self.logger.error(f"Contact data: {person}")
-                    continue
-            
-            self.logger.info("\nImport Summary:")
-            self.logger.info(f"Total contacts found: {len(connections)}")
-            self.logger.info(f"Successfully processed: {len(contacts)}")
-            self.logger.info("="*40)
-            
-            return contacts
-            
-        except Exception as e:
-            self.logger.error("Failed to fetch contacts:")
-            self.logger.error(str(e))
-            self.logger.error(traceback.format_exc())
-            raise
+            await batches.put(contacts)
+    
+    def _person_to_contact(self, person: dict) -> Contact:
+        """Convert a People API person to a Contact."""
+        # Extract basic info
+        names = person.get('names', [])
+        name = names[0] if names else {}
+        first_name = name.get('givenName', '')
+        last_name = name.get('familyName', '')
+        self.logger.info(f"Name: {first_name} {last_name}")
+        
+        # Extract all phone numbers
+        phones = person.get('phoneNumbers', [])
+        primary_phone = phones[0].get('value') if phones else None
+        additional_phones = [
+            {'type': phone.get('type', 'Other'), 'number': phone.get('value')}
+            for phone in phones[1:]  # Skip the first (primary) phone
+        ]
+        if primary_phone:
+            self.logger.info(f"Primary phone: {primary_phone}")
+        if additional_phones:
+            self.logger.info(f"Additional phones: {additional_phones}")
+        
+        # Extract all email addresses
+        emails = person.get('emailAddresses', [])
+        primary_email = emails[0].get('value') if emails else None
+        additional_emails = [
+            {'type': email.get('type', 'Other'), 'value': email.get('value')}
+            for email in emails[1:]  # Skip the first (primary) email
+        ]
+        if primary_email:
+            self.logger.info(f"Primary email: {primary_email}")
+        if additional_emails:
+            self.logger.info(f"Additional emails: {additional_emails}")
+        
+        # Extract addresses
+        addresses = person.get('addresses', [])
+        if addresses:
+            self.logger.info(f"Found {len(addresses)} addresses")
+        
+        # Extract organization info
+        organizations = person.get('organizations', [])
+        org = organizations[0] if organizations else {}
+        if org:
+            self.logger.info(f"Organization: {org.get('name')} - {org.get('title')}")
+        
+        # Extract biography/notes
+        biographies = person.get('biographies', [])
+        notes = biographies[0].get('value') if biographies else None
+        if notes:
+            self.logger.info("Has notes/biography")
+        
+        # Extract birthday
+        birthdays = person.get('birthdays', [])
+        birthday = birthdays[0].get('date') if birthdays else None
+        if birthday:
+            self.logger.info(f"Has birthday: {birthday}")
+        
+        # Extract websites
+        urls = person.get('urls', [])
+        if urls:
+            self.logger.info(f"Found {len(urls)} websites")
+        
+        contact = Contact(
+            id=self._contact_id(person),
+            first_name=first_name,
+            last_name=last_name,
+            email=primary_email,
+            phone=primary_phone,
+            source='google',
+            source_id=person['resourceName'],
+            metadata={
+                'additional_phones': additional_phones,
+                'additional_emails': additional_emails,
+                'addresses': addresses,
+                'company': org.get('name'),
+                'title': org.get('title'),
+                'notes': notes,
+                'birthday': birthday,
+                'websites': urls,
+            }
+        )
+        if PROJECTION_PROFILES[self.projection]['raw_data']:
+            contact.metadata['raw_data'] = person  # Store complete response
+        return contact
+    
+    @staticmethod
+    def _is_expired_token_error(error: HttpError) -> bool:
+        """Whether a list request failed because its syncToken expired.
+        
+        The API answers 400 FAILED_PRECONDITION and tells expiry apart from
+        other failed preconditions by the EXPIRED_SYNC_TOKEN reason in the
+        error details; 410 Gone is accepted too.
+        """
+        if error.resp.status == 410:
+            return True
+        try:
+            details = json.loads(error.content)['error'].get('details', [])
+        except (ValueError, TypeError, KeyError, AttributeError):
+            return False
+        return any(isinstance(detail, dict) and detail.get('reason') == EXPIRED_SYNC_TOKEN for detail in details)
+    
+    @staticmethod
+    def _contact_id(person: dict) -> str:
+        return f"google_{person['resourceName'].split('/')[-1]}"
     
     def _get_first_name(self, person: dict) -> Optional[str]:
         names = person.get('names', [])
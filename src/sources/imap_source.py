@@ -111,6 +111,11 @@ class IMAPContactSource(ContactSource):
     
     async def fetch_contacts(self) -> List[Contact]:
         """Fetch contacts from IMAP server."""
+        # Every imaplib call blocks, so the whole fetch runs on a source thread
+        return await self.run_blocking(self._read_contacts)
+    
+    def _read_contacts(self) -> List[Contact]:
+        """Find the contacts folder and parse the vCards in its messages."""
         try:
             print(f"Starting {self.provider} IMAP contact fetch...")
             contacts = []
@@ -60,7 +60,8 @@ class YahooContactSource(ContactSource):
                     return contacts
             
             # Get OAuth token
-            auth_response = self.session.post(
+            auth_response = await self.run_blocking(
+                self.session.post,
                 "https://login.yahoo.com/oauth2/get_token",
                 data={
                     "grant_type": "password",
@@ -82,7 +83,8 @@ class YahooContactSource(ContactSource):
             }
             
             # Get user GUID
-            user_response = self.session.get(
+            user_response = await self.run_blocking(
+                self.session.get,
                 "https://social.yahooapis.com/v1/me/guid",
                 headers=headers
             )
@@ -94,7 +96,8 @@ class YahooContactSource(ContactSource):
             guid = user_response.json()['guid']['value']
             
             # Get contacts
-            contacts_response = self.session.get(
+            contacts_response = await self.run_blocking(
+                self.session.get,
                 f"https://social.yahooapis.com/v1/user/{guid}/contacts",
                 headers=headers,
                 params={
@@ -0,0 +1,16 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add the project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+# The sources import the manager as core.contact_manager
+sys.path.append(str(project_root / 'src'))
+
+
+@pytest.fixture
+def database_url(tmp_path):
+    """A fresh SQLite database file for one test."""
+    return f"sqlite+aiosqlite:///{tmp_path / 'contacts.db'}"
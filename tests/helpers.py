@@ -0,0 +1,38 @@
+"""Shared setup for the tests."""
+from typing import List
+
+from src.core.contact_manager import Contact, ContactManager
+from src.db.database import init_db
+from src.db.writer import DatabaseWriter
+
+
+def make_contact(contact_id: str, source: str = 'google', first_name: str = 'Ann') -> Contact:
+    return Contact(
+        id=contact_id, first_name=first_name, last_name='Lee', email=f'{contact_id}@example.com',
+        phone=None, source=source, source_id=contact_id, metadata={}
+    )
+
+
+async def open_manager(database_url: str, writer: bool = True, shared_session: bool = True):
+    """A manager on a new database, on one session or else opening its own per operation."""
+    session_factory = await init_db(database_url)
+    db_writer = DatabaseWriter(session_factory) if writer else None
+    if db_writer:
+        db_writer.start()
+    if shared_session:
+        manager = ContactManager(session_factory(), writer=db_writer)
+    else:
+        manager = ContactManager(session_factory=session_factory, writer=db_writer)
+    return manager, session_factory
+
+
+async def close_manager(manager: ContactManager, session_factory):
+    if manager.writer:
+        await manager.writer.close()
+    if manager.db is not None:
+        await manager.db.close()
+    await session_factory.kw['bind'].dispose()
+
+
+async def stored_ids(manager: ContactManager) -> List[str]:
+    return sorted([row.id async for row in manager.contacts.iter_contacts(columns=('id',))])
@@ -0,0 +1,57 @@
+from itertools import combinations
+
+from benchmarks.synthetic import generate_contacts
+from src.core.blocking import BlockingIndex, blocking_keys
+from src.core.contact_manager import Contact
+from src.core.dedup_worker import MERGE_THRESHOLD
+from src.core.scoring import DUPLICATE_RULES, ScoringPipeline
+
+
+def contact(contact_id, first_name=None, last_name=None, email=None, phone=None) -> Contact:
+    return Contact(
+        id=contact_id, first_name=first_name, last_name=last_name, email=email, phone=phone,
+        source='test', source_id=contact_id, metadata={}
+    )
+
+
+def test_keys_cover_email_phone_and_name():
+    keys = blocking_keys(contact('a', 'Jonathan', 'Smith', 'J.Smith@Example.com', '+1 (555) 123-4567'))
+    assert keys == ['email:j.smith@example.com', 'local:j.smith', 'phone:1234567', 'name:smith:j']
+
+
+def test_partial_contacts_get_no_name_key():
+    assert blocking_keys(contact('a', 'Ann')) == []
+    assert blocking_keys(contact('a', None, 'Lee', phone='123')) == []
+
+
+def test_pairs_sharing_several_keys_are_listed_once():
+    index = BlockingIndex()
+    for contact_id in 'abc':
+        index.add(contact('id_' + contact_id, 'Ann', 'Lee', 'ann@example.com', '555-123-4567'))
+    index.add(contact('id_d', 'Bob', 'Stone', 'bob@example.com'))
+
+    pairs = list(index.candidate_pairs())
+    assert sorted(pairs) == [('id_a', 'id_b'), ('id_a', 'id_c'), ('id_b', 'id_c')]
+
+
+def test_candidate_pairs_of_changed_contacts_only():
+    index = BlockingIndex()
+    for contact_id in 'abc':
+        index.add(contact('id_' + contact_id, 'Ann', 'Lee'))
+    assert sorted(index.candidate_pairs(changed={'id_c'})) == [('id_a', 'id_c'), ('id_b', 'id_c')]
+    assert list(index.candidate_pairs(changed=set())) == []
+
+
+def test_blocking_finds_every_match_an_exhaustive_scan_finds():
+    book = generate_contacts(300, seed=3)
+    pipeline = ScoringPipeline(DUPLICATE_RULES)
+    exhaustive = {
+        frozenset((contact1.id, contact2.id))
+        for contact1, contact2 in combinations(book.contacts, 2)
+        if pipeline.score(contact1, contact2, record=False).confidence > MERGE_THRESHOLD
+    }
+    index = BlockingIndex()
+    for book_contact in book.contacts:
+        index.add(book_contact)
+    assert exhaustive
+    assert exhaustive <= {frozenset(pair) for pair in index.candidate_pairs()}
@@ -0,0 +1,73 @@
+from src.core.clustering import DuplicateClusterer, UnionFind, group_duplicates
+from tests.helpers import make_contact
+
+A, B, C, D, E = (make_contact(contact_id) for contact_id in 'abcde')
+
+
+def match(contact1, contact2, confidence=0.9, reason='Similar full names'):
+    return (contact1, contact2, confidence, [reason])
+
+
+def ids(group):
+    return sorted(contact.id for contact in group.contacts)
+
+
+def test_union_find_joins_sets():
+    sets = UnionFind()
+    sets.union('a', 'b')
+    sets.union('c', 'd')
+    assert sets.find('a') == sets.find('b')
+    assert sets.find('a') != sets.find('c')
+    sets.union('b', 'd')
+    assert len({sets.find(item) for item in 'abcd'}) == 1
+    assert sets.find('e') == 'e'
+
+
+def test_chained_matches_form_one_group():
+    groups = group_duplicates([
+        match(A, B, 0.7),
+        match(B, C, 0.95, 'Identical email addresses'),
+        match(D, E, 0.6),
+    ])
+    assert [ids(group) for group in groups] == [['a', 'b', 'c'], ['d', 'e']]
+    first = groups[0]
+    assert (first.min_confidence, first.max_confidence) == (0.7, 0.95)
+    assert first.reasons == ['Identical email addresses', 'Similar full names']
+
+
+def test_clusterer_reports_grown_and_absorbed_groups():
+    clusterer = DuplicateClusterer()
+    changed, absorbed = clusterer.add([match(A, B)])
+    ab, = changed
+    assert absorbed == []
+    changed, absorbed = clusterer.add([match(C, D)])
+    cd, = changed
+
+    # Linking the two groups leaves one of them
+    changed, absorbed = clusterer.add([match(B, C)])
+    merged, = changed
+    gone, = absorbed
+    assert {id(merged), id(gone)} == {id(ab), id(cd)}
+    assert ids(merged) == ['a', 'b', 'c', 'd']
+    assert len(merged.matches) == 3
+    assert clusterer.groups == [merged]
+
+
+def test_group_created_and_absorbed_in_one_call_is_not_reported():
+    clusterer = DuplicateClusterer()
+    changed, absorbed = clusterer.add([match(A, B), match(C, D), match(B, C)])
+    assert [ids(group) for group in changed] == [['a', 'b', 'c', 'd']]
+    assert absorbed == []
+
+
+def test_removed_group_is_forgotten():
+    clusterer = DuplicateClusterer()
+    clusterer.add([match(A, B), match(C, D)])
+    ab = next(group for group in clusterer.groups if ids(group) == ['a', 'b'])
+    clusterer.remove(ab)
+    assert [ids(group) for group in clusterer.groups] == [['c', 'd']]
+
+    # Later matches of its contacts start a new group
+    changed, absorbed = clusterer.add([match(B, E)])
+    assert [ids(group) for group in changed] == [['b', 'e']]
+    assert absorbed == []
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+
+import pytest
+
+from tests.helpers import close_manager, make_contact, open_manager, stored_ids
+
+
+def test_session_factory_lets_tasks_share_the_manager(database_url):
+    async def scenario():
+        manager, session_factory = await open_manager(database_url, shared_session=False)
+        try:
+            await manager.save_contacts([make_contact(f'local_{n}', source='local') for n in range(50)])
+
+            # Like the GUI: a search per keystroke while a scan and a
+            # details lookup run
+            results = await asyncio.gather(
+                *(manager.search_contact_ids('Ann') for _ in range(10)),
+                manager.find_duplicates(),
+                manager.get_contact_metadata('local_1'),
+                manager.delete_contacts(['local_49']),
+            )
+            assert all(len(ids) >= 49 for ids in results[:10])
+            assert results[11] == {}
+            assert len(await stored_ids(manager)) == 49
+        finally:
+            await close_manager(manager, session_factory)
+
+    asyncio.run(scenario())
+
+
+def test_session_factory_without_writer(database_url):
+    async def scenario():
+        manager, session_factory = await open_manager(database_url, writer=False, shared_session=False)
+        try:
+            await asyncio.gather(
+                manager.save_contacts([make_contact('local_1', source='local')]),
+                manager.save_contacts([make_contact('local_2', source='local')]),
+            )
+            assert await stored_ids(manager) == ['local_1', 'local_2']
+        finally:
+            await close_manager(manager, session_factory)
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_search_leaves_the_manager_usable(database_url):
+    async def scenario():
+        manager, session_factory = await open_manager(database_url, shared_session=False)
+        try:
+            await manager.save_contacts([make_contact('local_1', source='local')])
+            # Typing on cancels the search of the previous keystroke
+            for _ in range(5):
+                search = asyncio.create_task(manager.search_contact_ids('An'))
+                await asyncio.sleep(0)
+                search.cancel()
+            assert await manager.search_contact_ids('Ann') == ['local_1']
+        finally:
+            await close_manager(manager, session_factory)
+
+    asyncio.run(scenario())
+
+
+def test_duplicate_scan_logs_rule_statistics(database_url, capsys, caplog):
+    async def scenario():
+        manager, session_factory = await open_manager(database_url)
+        try:
+            await manager.save_contacts([
+                make_contact('local_1', source='local'),
+                make_contact('local_2', source='local', first_name='Anne'),
+            ])
+            return await manager.find_duplicates()
+        finally:
+            await close_manager(manager, session_factory)
+
+    with caplog.at_level(logging.DEBUG, logger='src.core.contact_manager'):
+        duplicates = asyncio.run(scenario())
+    assert [(c1.id, c2.id) for c1, c2, _, _ in duplicates] == [('local_1', 'local_2')]
+    assert 'rule statistics' not in capsys.readouterr().out
+    assert any('rule statistics' in record.getMessage() for record in caplog.records)
+
+
+def test_search_limit_can_be_lifted(database_url):
+    async def scenario():
+        manager, session_factory = await open_manager(database_url)
+        try:
+            await manager.save_contacts([make_contact(f'local_{n}', source='local') for n in range(10)])
+            assert len(await manager.search_contact_ids('Ann', limit=3)) == 3
+            assert len(await manager.search_contact_ids('Ann', limit=None)) == 10
+            assert len(await manager.search_contact_ids(fields={'last_name': 'Le'}, limit=None)) == 10
+        finally:
+            await close_manager(manager, session_factory)
+
+    asyncio.run(scenario())
+
+
+def test_metadata_is_only_loaded_when_asked_for(database_url):
+    from sqlalchemy import select
+    from sqlalchemy.exc import InvalidRequestError
+    from sqlalchemy.orm import undefer
+    from src.models.contact_model import ContactModel
+
+    async def scenario():
+        manager, session_factory = await open_manager(database_url)
+        try:
+            contact = make_contact('google_1')
+            contact.metadata = {'organizations': [{'name': 'Acme'}], 'raw': 'x' * 1000}
+            await manager.save_contacts([contact])
+            assert await manager.get_contact_metadata('google_1') == contact.metadata
+            assert await manager.get_contact_metadata('missing') is None
+
+            async with session_factory() as session:
+                stored = await session.get(ContactModel, 'google_1')
+                # The column is deferred and raises rather than loading lazily
+                with pytest.raises(InvalidRequestError):
+                    stored.contact_metadata
+                stored = (await session.execute(
+                    select(ContactModel).options(undefer(ContactModel.contact_metadata))
+                    .execution_options(populate_existing=True)
+                )).scalar_one()
+                assert stored.contact_metadata == contact.metadata
+        finally:
+            await close_manager(manager, session_factory)
+
+    asyncio.run(scenario())
@@ -0,0 +1,112 @@
+import asyncio
+import random
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from src.core import contact_manager
+from src.core.blocking import BlockingIndex, block_pairs
+from src.core.dedup_worker import block_pair_count, build_shards, score_shard, split_block, to_match_row
+from tests.helpers import close_manager, make_contact, open_manager
+
+
+def common_surname_book(count: int):
+    """Contacts that all share the name block of Ann Lee."""
+    contacts = [make_contact(f'local_{n:03}', source='local') for n in range(count)]
+    index = BlockingIndex()
+    for contact in contacts:
+        index.add(contact)
+    return contacts, index
+
+
+def test_split_block_covers_every_pair_once():
+    members = [f'c{n}' for n in range(40)]
+    keys = {member: ['name:lee:a'] for member in members}
+    changed = set(random.Random(0).sample(members, 7))
+    for max_pairs in (1, 25, 100, 10000):
+        slices = split_block('name:lee:a', members, max_pairs)
+        assert sum(block_pair_count(s.members, s.leading) for s in slices) == block_pair_count(members)
+        for wanted in (None, changed):
+            pairs = [
+                pair for s in slices for pair in block_pairs(s.key, s.members, keys, wanted, s.leading)
+            ]
+            assert sorted(pairs) == sorted(block_pairs('name:lee:a', members, keys, wanted))
+        # A slice only goes over by the pairs of its last member
+        assert all(block_pair_count(s.members, s.leading) < max_pairs + len(members) for s in slices)
+
+
+def test_one_large_block_is_spread_over_all_shards():
+    contacts, index = common_surname_book(200)
+    rows_by_id = {contact.id: to_match_row(contact) for contact in contacts}
+    blocks = index.candidate_blocks()
+    assert len(blocks) == 1
+
+    shards = build_shards(blocks, rows_by_id, index.keys, 8)
+    assert len(shards) == 8
+    loads = [shard.pair_count for shard in shards]
+    assert sum(loads) == block_pair_count(blocks[0][1])
+    assert max(loads) < 2 * sum(loads) / len(loads)
+
+
+class RecordingExecutor(ProcessPoolExecutor):
+    instances = []
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.shutdowns = []
+        RecordingExecutor.instances.append(self)
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        self.shutdowns.append(cancel_futures)
+        super().shutdown(wait=wait, cancel_futures=cancel_futures)
+
+
+def test_closing_a_scan_drops_pending_shards(database_url, monkeypatch):
+    monkeypatch.setattr(contact_manager, 'PARALLEL_MIN_PAIRS', 0)
+    monkeypatch.setattr(contact_manager, 'ProcessPoolExecutor', RecordingExecutor)
+    RecordingExecutor.instances.clear()
+
+    async def scenario():
+        manager, session_factory = await open_manager(database_url)
+        manager.max_workers = 2
+        try:
+            contacts, _ = common_surname_book(60)
+            await manager.save_contacts(contacts)
+
+            scan = manager.iter_duplicates()
+            assert await scan.__anext__()
+            await scan.aclose()
+            executor, = RecordingExecutor.instances
+            assert executor.shutdowns == [True]
+            # Results of an unfinished scan aren't stored
+            assert await manager._get_state(contact_manager.LAST_DUPLICATE_SCAN_KEY) is None
+
+            duplicates = await manager.find_duplicates()
+            assert len(duplicates) == block_pair_count(contacts)
+        finally:
+            await close_manager(manager, session_factory)
+
+    asyncio.run(scenario())
+
+
+def test_inline_scoring_runs_off_the_event_loop_thread(database_url, monkeypatch):
+    threads = []
+
+    def recording_score_shard(shard):
+        threads.append(threading.get_ident())
+        return score_shard(shard)
+
+    monkeypatch.setattr(contact_manager, 'score_shard', recording_score_shard)
+
+    async def scenario():
+        manager, session_factory = await open_manager(database_url)
+        manager.max_workers = 1
+        try:
+            contacts, _ = common_surname_book(20)
+            await manager.save_contacts(contacts)
+            duplicates = await manager.find_duplicates()
+            assert len(duplicates) == block_pair_count(contacts)
+            assert threads and threading.get_ident() not in threads
+        finally:
+            await close_manager(manager, session_factory)
+
+    asyncio.run(scenario())
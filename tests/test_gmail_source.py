@@ -0,0 +1,202 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip('googleapiclient')
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from benchmarks.fake_people_api import FakePeopleAPI, generate_people
+from src.sources import gmail_source
+from src.sources.gmail_source import GmailContactSource
+from tests.helpers import close_manager, open_manager
+
+
+def http_error(status: int, reason: str = None) -> HttpError:
+    error = {'code': status, 'message': 'Precondition check failed.', 'status': 'FAILED_PRECONDITION'}
+    if reason:
+        error['details'] = [{'@type': 'type.googleapis.com/google.rpc.ErrorInfo', 'reason': reason}]
+    return HttpError(httplib2.Response({'status': status}), json.dumps({'error': error}).encode())
+
+
+def test_expired_token_is_told_apart_by_its_reason():
+    assert GmailContactSource._is_expired_token_error(http_error(400, 'EXPIRED_SYNC_TOKEN'))
+    assert GmailContactSource._is_expired_token_error(http_error(410))
+    assert not GmailContactSource._is_expired_token_error(http_error(400))
+    assert not GmailContactSource._is_expired_token_error(http_error(400, 'OTHER_REASON'))
+    assert not GmailContactSource._is_expired_token_error(
+        HttpError(httplib2.Response({'status': 400}), b'not json')
+    )
+
+
+def test_expired_token_falls_back_to_a_full_sync(database_url, tmp_path, monkeypatch):
+    # The source writes its log file under ./logs
+    monkeypatch.chdir(tmp_path)
+
+    async def scenario():
+        with FakePeopleAPI(generate_people(20)) as api:
+            manager, session_factory = await open_manager(database_url)
+            try:
+                source = GmailContactSource()
+                source.service = api.build_service()
+                await manager.add_source(source)
+                report = await manager.sync_all_sources()
+                assert not report.failed_sources, report.summary()
+
+                api.expire_sync_tokens()
+                api.delete(sorted(api.people)[0])
+                report = await manager.sync_all_sources()
+                result = report.sources[0]
+                assert result.ok, result.error
+                assert not result.incremental
+                assert result.deleted == 1
+                assert await manager.contacts.count() == len(api.people)
+
+                # The new token works again
+                report = await manager.sync_all_sources()
+                assert report.sources[0].incremental
+                assert report.sources[0].fetched == 0
+            finally:
+                await close_manager(manager, session_factory)
+
+    asyncio.run(scenario())
+
+
+def fetch_batches(source, api, progress=None):
+    """Every batch iter_contact_batches() yields, fetched from ``api``."""
+    async def fetch():
+        source.service = api.build_service()
+        return [batch async for batch in source.iter_contact_batches(progress)]
+
+    return asyncio.run(fetch())
+
+
+def test_each_page_is_converted_into_one_batch(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(gmail_source, 'PAGE_SIZE', 10)
+    people = generate_people(25)
+    pages = []
+
+    with FakePeopleAPI(people) as api:
+        source = GmailContactSource()
+        batches = fetch_batches(source, api, lambda page_count, fetched: pages.append((page_count, fetched)))
+
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    assert pages == [(1, 10), (2, 20), (3, 25)]
+    assert source.next_sync_token.startswith('standard:')
+
+    contacts = {contact.id: contact for batch in batches for contact in batch}
+    person = people[0]
+    contact = contacts[f"google_{person['resourceName'].split('/')[-1]}"]
+    assert (contact.first_name, contact.last_name) == (person['names'][0]['givenName'],
+                                                        person['names'][0]['familyName'])
+    assert contact.email == person.get('emailAddresses', [{}])[0].get('value')
+    assert contact.source_id == person['resourceName']
+
+
+def test_incremental_pages_list_deleted_people(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(gmail_source, 'PAGE_SIZE', 2)
+
+    with FakePeopleAPI(generate_people(5)) as api:
+        source = GmailContactSource()
+        fetch_batches(source, api)
+
+        api.update('people/c1', names=[{'givenName': 'Renamed', 'familyName': 'Person'}])
+        api.delete('people/c2')
+        api.delete('people/c3')
+        source.sync_token = source.next_sync_token
+        batches = fetch_batches(source, api)
+
+    assert [[contact.first_name for contact in batch] for batch in batches] == [['Renamed'], []]
+    assert source.deleted_contact_ids == ['google_c2', 'google_c3']
+
+
+def test_pages_are_fetched_only_a_few_ahead_of_the_consumer(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(gmail_source, 'PAGE_SIZE', 5)
+
+    async def scenario(api):
+        source = GmailContactSource()
+        source.service = api.build_service()
+        batches = source.iter_contact_batches()
+        try:
+            await batches.__anext__()
+            # A slow save of the first batch: fetching stops once the
+            # queues between the stages are full
+            await asyncio.sleep(0.5)
+            ahead = api.requests
+            count = 1 + sum([1 async for _ in batches])
+        finally:
+            await batches.aclose()
+        return ahead, count
+
+    with FakePeopleAPI(generate_people(100)) as api:
+        ahead, count = asyncio.run(scenario(api))
+
+    assert count == 20
+    assert ahead <= 2 * gmail_source.PIPELINE_DEPTH + 3
+
+
+def test_fetch_errors_reach_the_consumer(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    async def scenario(service):
+        source = GmailContactSource()
+        source.service = service
+        with pytest.raises(ConnectionError):
+            async for _ in source.iter_contact_batches():
+                pass
+
+    with FakePeopleAPI(generate_people(5)) as api:
+        service = api.build_service()
+    # The server is gone, so the first page fails
+    asyncio.run(scenario(service))
+
+
+def test_projection_profiles_fetch_and_keep_less(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    people = generate_people(50)
+    person = next(person for person in people if 'organizations' in person)
+    contact_id = f"google_{person['resourceName'].split('/')[-1]}"
+
+    contacts, bytes_sent = {}, {}
+    for profile in ('minimal', 'standard', 'full'):
+        with FakePeopleAPI(people) as api:
+            batches = fetch_batches(GmailContactSource(profile), api)
+            bytes_sent[profile] = api.bytes_sent
+        contacts[profile] = {contact.id: contact for batch in batches for contact in batch}[contact_id]
+
+    assert bytes_sent['minimal'] < bytes_sent['standard'] < bytes_sent['full']
+    assert contacts['minimal'].metadata['company'] is None
+    assert contacts['standard'].metadata['company'] == person['organizations'][0]['name']
+    assert 'raw_data' not in contacts['standard'].metadata
+    assert contacts['full'].metadata['raw_data']['names'] == person['names']
+    # The fields the contact is made of are the same with every profile
+    for profile in ('minimal', 'full'):
+        assert (contacts[profile].first_name, contacts[profile].email) == (
+            contacts['standard'].first_name, contacts['standard'].email
+        )
+
+    with pytest.raises(ValueError):
+        GmailContactSource('everything')
+
+
+def test_changing_the_projection_fetches_everyone_again(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    with FakePeopleAPI(generate_people(5)) as api:
+        minimal = GmailContactSource('minimal')
+        fetch_batches(minimal, api)
+        assert minimal.next_sync_token.startswith('minimal:')
+
+        # A token issued for other fields can't be used with these
+        standard = GmailContactSource('standard')
+        standard.sync_token = minimal.next_sync_token
+        batches = fetch_batches(standard, api)
+
+    assert standard.sync_token is None
+    assert sum(len(batch) for batch in batches) == 5
+    assert standard.next_sync_token.startswith('standard:')
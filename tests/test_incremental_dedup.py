@@ -0,0 +1,113 @@
+import asyncio
+
+from src.core import contact_manager
+from src.core.contact_manager import LAST_DUPLICATE_SCAN_KEY, Contact
+from src.core.dedup_worker import score_shard
+from tests.helpers import close_manager, open_manager
+
+
+def person(contact_id: str, first_name: str, last_name: str, email: str) -> Contact:
+    return Contact(
+        id=contact_id, first_name=first_name, last_name=last_name, email=email,
+        phone=None, source='local', source_id=contact_id, metadata={}
+    )
+
+
+BOOK = [
+    person('a1', 'Ann', 'Lee', 'ann@example.com'),
+    person('a2', 'Ann', 'Lee', 'ann@example.com'),
+    person('b1', 'Bob', 'Stone', 'bob@example.com'),
+    person('b2', 'Bob', 'Stone', 'bob@example.com'),
+    person('c1', 'Cara', 'Diaz', 'cara@example.com'),
+    person('c2', 'Cara', 'Diaz', 'cara@example.com'),
+    person('d1', 'Dan', 'Fox', 'dan@example.com'),
+]
+
+
+def pairs(duplicates):
+    return {frozenset((contact1.id, contact2.id)): round(confidence, 6)
+            for contact1, contact2, confidence, _ in duplicates}
+
+
+def run_with_manager(database_url, monkeypatch, scenario):
+    """Run ``scenario(manager, scored)`` on a manager holding BOOK, already scanned once.
+
+    ``scored`` lists the shards scored since the first scan.
+    """
+    scored = []
+
+    def recording_score_shard(shard):
+        scored.append(shard)
+        return score_shard(shard)
+
+    monkeypatch.setattr(contact_manager, 'score_shard', recording_score_shard)
+
+    async def run():
+        manager, session_factory = await open_manager(database_url)
+        try:
+            await manager.save_contacts(list(BOOK))
+            assert set(pairs(await manager.find_duplicates())) == {
+                frozenset(('a1', 'a2')), frozenset(('b1', 'b2')), frozenset(('c1', 'c2'))
+            }
+            scored.clear()
+            await scenario(manager, scored)
+        finally:
+            await close_manager(manager, session_factory)
+
+    asyncio.run(run())
+
+
+async def assert_matches_rescan(manager, incremental):
+    assert pairs(incremental) == pairs(await manager.find_duplicates(rescan=True))
+
+
+def test_scan_stores_a_watermark_and_reuses_stored_pairs(database_url, monkeypatch):
+    async def scenario(manager, scored):
+        first_watermark = await manager._get_state(LAST_DUPLICATE_SCAN_KEY)
+        assert first_watermark is not None
+
+        incremental = await manager.find_duplicates()
+        # Nothing changed, so every pair comes from the stored ones
+        assert scored == []
+        assert await manager._get_state(LAST_DUPLICATE_SCAN_KEY) > first_watermark
+        await assert_matches_rescan(manager, incremental)
+
+    run_with_manager(database_url, monkeypatch, scenario)
+
+
+def test_edited_contacts_are_rescored(database_url, monkeypatch):
+    async def scenario(manager, scored):
+        # b2 no longer matches b1, d1 now matches the Ann Lee pair
+        await manager.save_contacts([
+            person('b2', 'Zed', 'Quinn', 'zed@example.com'),
+            person('d1', 'Ann', 'Lee', 'ann@example.com'),
+        ])
+        incremental = await manager.find_duplicates()
+        assert set(pairs(incremental)) == {
+            frozenset(('a1', 'a2')), frozenset(('a1', 'd1')), frozenset(('a2', 'd1')), frozenset(('c1', 'c2'))
+        }
+        # Only pairs with an edited contact were scored again
+        assert scored and all(shard.changed and shard.changed <= {'b2', 'd1'} for shard in scored)
+        await assert_matches_rescan(manager, incremental)
+
+    run_with_manager(database_url, monkeypatch, scenario)
+
+
+def test_deleted_contacts_drop_their_pairs(database_url, monkeypatch):
+    async def scenario(manager, scored):
+        await manager.delete_contacts(['c2'])
+        incremental = await manager.find_duplicates()
+        assert set(pairs(incremental)) == {frozenset(('a1', 'a2')), frozenset(('b1', 'b2'))}
+        await assert_matches_rescan(manager, incremental)
+
+    run_with_manager(database_url, monkeypatch, scenario)
+
+
+def test_merged_contacts_drop_their_pairs(database_url, monkeypatch):
+    async def scenario(manager, scored):
+        await manager.merge_contacts('b1', 'b2', {'first_name': 'Robert'})
+        incremental = await manager.find_duplicates()
+        assert set(pairs(incremental)) == {frozenset(('a1', 'a2')), frozenset(('c1', 'c2'))}
+        await assert_matches_rescan(manager, incremental)
+
+    run_with_manager(database_url, monkeypatch, scenario)
@@ -0,0 +1,47 @@
+import numpy as np
+
+from src.core.lsh import MinHashLSH
+
+
+def build_index(names):
+    index = MinHashLSH()
+    for contact_id, name in names.items():
+        index.add(contact_id, name)
+    return index
+
+
+def test_typos_share_a_bucket_and_unrelated_names_do_not():
+    index = build_index({
+        'a': 'jonathan smith', 'b': 'jonathan smtih', 'c': 'jonahtan smith',
+        'd': 'mary okafor', 'e': 'wei zhang',
+    })
+    assert index.query('jonathan smith') >= {'a', 'b', 'c'}
+    assert not index.query('jonathan smith') & {'d', 'e'}
+
+
+def test_candidate_pairs_are_listed_once():
+    index = build_index({'a': 'jonathan smith', 'b': 'jonathan smith', 'c': 'jonathan smyth', 'd': 'wei zhang'})
+    pairs = list(index.candidate_pairs())
+    assert len(pairs) == len({frozenset(pair) for pair in pairs})
+    assert {frozenset(pair) for pair in pairs} >= {frozenset('ab'), frozenset('ac'), frozenset('bc')}
+    assert index.stats.candidate_pairs == len(pairs)
+
+
+def test_candidate_pairs_of_changed_contacts_only():
+    index = build_index({'a': 'jonathan smith', 'b': 'jonathan smith', 'c': 'jonathan smith'})
+    pairs = {frozenset(pair) for pair in index.candidate_pairs(changed={'c'})}
+    assert pairs == {frozenset('ac'), frozenset('bc')}
+
+
+def test_pair_in_an_oversized_first_band_bucket_comes_from_a_later_band():
+    # Band 0 puts all three names in one bucket, too big to expand, and only
+    # band 1 separates out the a-b pair
+    buckets = {'a': [1, 5], 'b': [1, 5], 'c': [1, 6]}
+    index = MinHashLSH(bands=2, rows=1, max_bucket_size=2)
+    index.band_hashes = lambda name: np.array(buckets[name], dtype=np.uint32)
+    for name in buckets:
+        index.add(name, name)
+
+    pairs = {frozenset(pair) for pair in index.candidate_pairs()}
+    assert pairs == {frozenset('ab')}
+    assert index.stats.oversized_buckets == 1
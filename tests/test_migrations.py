@@ -0,0 +1,193 @@
+import asyncio
+import json
+import sqlite3
+
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.core.contact_manager import ContactManager
+from src.db.database import init_db
+from src.db import migrations
+from src.db.migrations import MIGRATIONS, run_migrations
+from src.models import Base
+from src.models.schema_migration_model import SchemaMigrationModel
+from tests.helpers import close_manager, make_contact, open_manager, stored_ids
+
+# The contacts table as the first release created it
+BASELINE_CONTACTS = """CREATE TABLE contacts (
+    id VARCHAR PRIMARY KEY, first_name VARCHAR, last_name VARCHAR, email VARCHAR, phone VARCHAR,
+    source VARCHAR, source_id VARCHAR, contact_metadata JSON, created_at DATETIME, updated_at DATETIME
+)"""
+
+
+def create_baseline_database(path):
+    with sqlite3.connect(path) as conn:
+        conn.execute(BASELINE_CONTACTS)
+        conn.execute(
+            "INSERT INTO contacts (id, first_name, last_name, email, source, source_id, contact_metadata)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ('csv_1', 'Ann', 'Lee', 'ann@example.com', 'csv', '1',
+             json.dumps({'original_row': {'Company': 'Acme', 'Notes': 'met at the fair'}}))
+        )
+
+
+async def search(session_factory, search_text):
+    async with session_factory() as session:
+        return await ContactManager(session).search_contact_ids(search_text)
+
+
+async def contact_columns(engine):
+    async with engine.connect() as conn:
+        return await conn.run_sync(
+            lambda sync_conn: {column['name'] for column in inspect(sync_conn).get_columns('contacts')}
+        )
+
+
+async def contact_indexes(engine):
+    async with engine.connect() as conn:
+        return await conn.run_sync(
+            lambda sync_conn: {index['name']: index for index in inspect(sync_conn).get_indexes('contacts')}
+        )
+
+
+def test_source_id_stored_under_another_id_updates_that_contact(database_url):
+    async def scenario():
+        manager, session_factory = await open_manager(database_url)
+        engine = session_factory.kw['bind']
+        try:
+            assert (await contact_indexes(engine))['ix_contacts_source_source_id']['unique']
+            first = make_contact('csv_1', source='csv')
+            await manager.save_contacts([first])
+
+            # The same source contact under a new id, twice in one save
+            renamed = make_contact('csv_2', source='csv', first_name='Anne')
+            renamed.source_id = first.source_id
+            again = make_contact('csv_3', source='csv', first_name='Annie')
+            again.source_id = first.source_id
+            result = await manager.save_contacts([renamed, again])
+            assert not result.failed
+            assert (result.inserted, result.updated) == (0, 1)
+            assert again.id == 'csv_1'
+            contact, = await manager.contacts.get_many(['csv_1'], columns=('id', 'first_name'))
+            assert contact.first_name == 'Annie'
+            assert await stored_ids(manager) == ['csv_1']
+        finally:
+            await close_manager(manager, session_factory)
+
+    asyncio.run(scenario())
+
+
+def test_contacts_stored_twice_are_removed_before_the_unique_index(tmp_path):
+    path = tmp_path / 'contacts.db'
+    create_baseline_database(path)
+    with sqlite3.connect(path) as conn:
+        conn.executemany(
+            "INSERT INTO contacts (id, first_name, source, source_id, updated_at) VALUES (?, ?, ?, ?, ?)",
+            [('csv_old', 'Old', 'csv', '1', '2020-01-01 00:00:00'),
+             ('csv_new', 'New', 'csv', '1', '2024-01-01 00:00:00'),
+             ('csv_2', 'Bo', 'csv', None, None),
+             ('csv_3', 'Cy', 'csv', None, None)]
+        )
+    # csv_1 of the baseline shares source_id 1 and has no updated_at, so
+    # only csv_new is kept of the three
+
+    async def scenario():
+        session_factory = await init_db(f"sqlite+aiosqlite:///{path}")
+        engine = session_factory.kw['bind']
+        try:
+            assert (await contact_indexes(engine))['ix_contacts_source_source_id']['unique']
+            async with session_factory() as session:
+                manager = ContactManager(session)
+                assert await stored_ids(manager) == ['csv_2', 'csv_3', 'csv_new']
+        finally:
+            await engine.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_baseline_database_is_upgraded_and_searchable(tmp_path):
+    path = tmp_path / 'contacts.db'
+    create_baseline_database(path)
+
+    async def scenario():
+        session_factory = await init_db(f"sqlite+aiosqlite:///{path}")
+        engine = session_factory.kw['bind']
+        try:
+            assert {'company', 'title', 'notes', 'content_hash', 'sync_source'} <= await contact_columns(engine)
+            assert await search(session_factory, 'Acme') == ['csv_1']
+            assert await search(session_factory, 'fair') == ['csv_1']
+        finally:
+            await engine.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_search_fields_are_added_after_the_search_index_was_applied(tmp_path):
+    # A database that ran migrations 1-3 before the search fields had columns
+    path = tmp_path / 'contacts.db'
+    create_baseline_database(path)
+    url = f"sqlite+aiosqlite:///{path}"
+
+    async def scenario():
+        engine = create_async_engine(url)
+        async with engine.begin() as conn:
+            await conn.run_sync(SchemaMigrationModel.__table__.create)
+            for version, name, migrate in MIGRATIONS[:3]:
+                await migrate(conn)
+                await conn.execute(SchemaMigrationModel.__table__.insert().values(version=version, name=name))
+        assert 'company' not in await contact_columns(engine)
+        await engine.dispose()
+
+        session_factory = await init_db(url)
+        engine = session_factory.kw['bind']
+        try:
+            assert {'company', 'title', 'notes'} <= await contact_columns(engine)
+            assert await search(session_factory, 'Acme') == ['csv_1']
+        finally:
+            await engine.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_migrations_are_applied_once(database_url):
+    async def scenario():
+        engine = create_async_engine(database_url)
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            await run_migrations(engine)
+            await run_migrations(engine)
+            async with engine.connect() as conn:
+                result = await conn.execute(SchemaMigrationModel.__table__.select())
+                versions = [row.version for row in result]
+            assert sorted(versions) == [version for version, _, _ in MIGRATIONS]
+        finally:
+            await engine.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_match_columns_are_backfilled_page_by_page(tmp_path, monkeypatch):
+    monkeypatch.setattr(migrations, 'BACKFILL_BATCH_SIZE', 2)
+    path = tmp_path / 'contacts.db'
+    create_baseline_database(path)
+    with sqlite3.connect(path) as conn:
+        conn.executemany(
+            "INSERT INTO contacts (id, first_name, last_name, email, source, source_id) VALUES (?, ?, ?, ?, ?, ?)",
+            [(f'csv_{n}', 'Bo', 'Ray', f'Bo{n}@Example.com', 'csv', str(n)) for n in range(2, 7)]
+        )
+
+    async def scenario():
+        session_factory = await init_db(f"sqlite+aiosqlite:///{path}")
+        try:
+            async with session_factory() as session:
+                rows = await ContactManager(session).contacts.get_many(
+                    [f'csv_{n}' for n in range(1, 7)], columns=('id', 'email_lower', 'name_normalized')
+                )
+            assert len(rows) == 6
+            assert all(row.email_lower == row.email_lower.lower() for row in rows)
+            assert {row.name_normalized for row in rows} == {'ann lee', 'bo ray'}
+        finally:
+            await session_factory.kw['bind'].dispose()
+
+    asyncio.run(scenario())
@@ -0,0 +1,81 @@
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip('asyncpg')
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from tests.helpers import close_manager, make_contact, open_manager, stored_ids
+
+# A scratch PostgreSQL database the tests may wipe, e.g.
+# postgresql+asyncpg://postgres@localhost/contacts_test
+TEST_DATABASE_URL_ENV = 'CONTACTS_TEST_POSTGRES_URL'
+
+
+@pytest.fixture
+def postgres_url():
+    """An empty PostgreSQL database, or a skip when none is configured."""
+    url = os.environ.get(TEST_DATABASE_URL_ENV)
+    if not url:
+        pytest.skip(f"set {TEST_DATABASE_URL_ENV} to run the PostgreSQL tests")
+
+    async def reset():
+        engine = create_async_engine(url)
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(text("DROP SCHEMA public CASCADE"))
+                await conn.execute(text("CREATE SCHEMA public"))
+        finally:
+            await engine.dispose()
+
+    asyncio.run(reset())
+    return url
+
+
+def test_copy_upsert_inserts_updates_and_skips(postgres_url):
+    async def scenario():
+        manager, session_factory = await open_manager(postgres_url)
+        try:
+            contacts = [make_contact(f'google_{n}') for n in range(5)]
+            contacts[0].metadata = {'organizations': [{'name': 'Acme'}]}
+            saved = await manager.save_contacts(contacts, batch_size=2)
+            assert (saved.inserted, saved.updated, saved.skipped) == (5, 0, 0)
+            assert await stored_ids(manager) == [f'google_{n}' for n in range(5)]
+            # Metadata went through COPY encoded like any other save
+            assert await manager.get_contact_metadata('google_0') == contacts[0].metadata
+
+            contacts[1] = make_contact('google_1', first_name='Anne')
+            saved = await manager.save_contacts(contacts + [make_contact('google_5')])
+            assert (saved.inserted, saved.updated, saved.skipped) == (1, 1, 4)
+            row = await manager.contacts.get('google_1')
+            assert row.first_name == 'Anne'
+
+            # A new owner counts as a change even with the same content
+            saved = await manager.save_contacts(contacts[:2], sync_source='work')
+            assert (saved.inserted, saved.updated, saved.skipped) == (0, 2, 0)
+        finally:
+            await close_manager(manager, session_factory)
+
+    asyncio.run(scenario())
+
+
+def test_copy_upsert_saves_onto_the_stored_source_id(postgres_url):
+    async def scenario():
+        manager, session_factory = await open_manager(postgres_url)
+        try:
+            await manager.save_contacts([make_contact('google_1')])
+            # The same person reported again under a new local id
+            moved = make_contact('google_new', first_name='Anne')
+            moved.source_id = 'google_1'
+            saved = await manager.save_contacts([moved])
+            assert (saved.inserted, saved.updated) == (0, 1)
+            assert moved.id == 'google_1'
+            assert await stored_ids(manager) == ['google_1']
+            assert await manager.search_contact_ids('Anne') == ['google_1']
+        finally:
+            await close_manager(manager, session_factory)
+
+    asyncio.run(scenario())
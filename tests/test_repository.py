@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from tests.helpers import close_manager, make_contact, open_manager
+
+
+def test_iter_batches_pages_through_every_contact_in_id_order(database_url):
+    async def scenario():
+        manager, session_factory = await open_manager(database_url, writer=False)
+        try:
+            ids = [f'google_{n:02}' for n in range(7)]
+            await manager.save_contacts([make_contact(contact_id) for contact_id in reversed(ids)])
+
+            batches = [batch async for batch in manager.contacts.iter_batches(batch_size=3, columns=('id',))]
+            assert [len(batch) for batch in batches] == [3, 3, 1]
+            assert [row.id for batch in batches for row in batch] == ids
+            # Each page ran in a transaction of its own
+            assert not manager.db.in_transaction()
+
+            table = manager.contacts.table
+            odd = [row.id async for row in manager.contacts.iter_contacts(
+                batch_size=2, columns=('id',), where=table.c.id.in_(ids[1::2])
+            )]
+            assert odd == ids[1::2]
+            assert await manager.contacts.count() == 7
+            assert await manager.contacts.count(table.c.id.in_(ids[1::2])) == 3
+
+            with pytest.raises(ValueError):
+                await manager.contacts.iter_batches(columns=('email',)).__anext__()
+        finally:
+            await close_manager(manager, session_factory)
+
+    asyncio.run(scenario())
+
+
+def test_lookups_by_id_and_by_source_id(database_url, monkeypatch):
+    # Small chunks, so the lookups below take several queries
+    monkeypatch.setattr('src.db.repository.SQL_IN_CHUNK_SIZE', 4)
+
+    async def scenario():
+        manager, session_factory = await open_manager(database_url, writer=False)
+        try:
+            await manager.save_contacts([make_contact(f'google_{n}') for n in range(10)])
+
+            rows = await manager.contacts.get_many([f'google_{n}' for n in range(10)] + ['missing'])
+            assert sorted(row.id for row in rows) == [f'google_{n}' for n in range(10)]
+            assert rows[0].email == f'{rows[0].id}@example.com'
+
+            row = await manager.contacts.get('google_3', columns=('id', 'first_name'))
+            assert tuple(row) == ('google_3', 'Ann')
+            assert await manager.contacts.get('missing') is None
+
+            keys = [('google', f'google_{n}') for n in range(5)] + [('local', 'google_5')]
+            rows = await manager.contacts.get_by_source_ids(keys, columns=('id',))
+            assert sorted(row.id for row in rows) == [f'google_{n}' for n in range(5)]
+        finally:
+            await close_manager(manager, session_factory)
+
+    asyncio.run(scenario())
@@ -0,0 +1,74 @@
+import asyncio
+
+from tests.helpers import close_manager, make_contact, open_manager
+
+
+async def updated_at(manager, contact_id):
+    rows = await manager.contacts.get_many([contact_id], columns=('id', 'updated_at'))
+    return rows[0].updated_at
+
+
+def test_unchanged_contacts_are_skipped(database_url):
+    async def scenario():
+        manager, session_factory = await open_manager(database_url)
+        try:
+            contacts = [make_contact(f'google_{n}') for n in range(5)]
+            result = await manager.save_contacts(contacts)
+            assert (result.inserted, result.updated, result.skipped) == (5, 0, 0)
+            written = await updated_at(manager, 'google_0')
+
+            # Equal content from a fresh fetch
+            contacts = [make_contact(f'google_{n}') for n in range(5)]
+            contacts[1].first_name = 'Anne'
+            result = await manager.save_contacts(contacts)
+            assert (result.inserted, result.updated, result.skipped) == (0, 1, 4)
+            assert await updated_at(manager, 'google_0') == written
+        finally:
+            await close_manager(manager, session_factory)
+
+    asyncio.run(scenario())
+
+
+def test_metadata_changes_and_key_order(database_url):
+    async def scenario():
+        manager, session_factory = await open_manager(database_url)
+        try:
+            contact = make_contact('google_1')
+            contact.metadata = {'company': 'Acme', 'title': 'CTO'}
+            await manager.save_contacts([contact])
+
+            reordered = make_contact('google_1')
+            reordered.metadata = {'title': 'CTO', 'company': 'Acme'}
+            assert (await manager.save_contacts([reordered])).skipped == 1
+
+            changed = make_contact('google_1')
+            changed.metadata = {'title': 'CEO', 'company': 'Acme'}
+            assert (await manager.save_contacts([changed])).updated == 1
+        finally:
+            await close_manager(manager, session_factory)
+
+    asyncio.run(scenario())
+
+
+def test_local_edit_is_overwritten_by_the_next_sync(database_url):
+    async def scenario():
+        manager, session_factory = await open_manager(database_url)
+        try:
+            await manager.save_contacts([make_contact('google_1')])
+
+            async def edit(session):
+                from src.models.contact_model import ContactModel
+                contact = await session.get(ContactModel, 'google_1')
+                contact.first_name = 'Local'
+                contact.update_match_fields()
+            await manager.write(edit)
+
+            # The source still has the old version, which must win again
+            result = await manager.save_contacts([make_contact('google_1')])
+            assert result.updated == 1
+            contact, = await manager.contacts.get_many(['google_1'], columns=('id', 'first_name'))
+            assert contact.first_name == 'Ann'
+        finally:
+            await close_manager(manager, session_factory)
+
+    asyncio.run(scenario())
@@ -0,0 +1,174 @@
+import random
+from typing import List, Tuple
+
+import pytest
+from thefuzz import fuzz
+
+from benchmarks.synthetic import generate_contacts
+from src.core.contact_manager import Contact
+from src.core.matcher import ContactMatcher
+from src.core.normalize import fields_for
+from src.core.scoring import DUPLICATE_RULES, ScoringPipeline
+
+
+def legacy_similarity(contact1: Contact, contact2: Contact) -> Tuple[float, List[str]]:
+    """ContactManager._calculate_similarity as it was before the rule pipeline."""
+    scores = []
+    reasons = []
+
+    fields1 = fields_for(contact1)
+    fields2 = fields_for(contact2)
+
+    if fields1.email_lower and fields2.email_lower:
+        if fields1.email_lower == fields2.email_lower:
+            return 1.0, ["Identical email addresses"]
+
+    phone1 = fields1.phone_digits
+    phone2 = fields2.phone_digits
+    if phone1 and phone2:
+        if phone1 == phone2 and len(phone1) >= 10:
+            return 1.0, ["Identical phone numbers"]
+
+    phone_suffix_match = bool(fields1.phone_last7 and fields1.phone_last7 == fields2.phone_last7)
+
+    has_full_name1 = bool(contact1.first_name and contact1.last_name)
+    has_full_name2 = bool(contact2.first_name and contact2.last_name)
+
+    if has_full_name1 and has_full_name2:
+        first_name_score = fuzz.ratio(contact1.first_name.lower(), contact2.first_name.lower()) / 100
+        last_name_score = fuzz.ratio(contact1.last_name.lower(), contact2.last_name.lower()) / 100
+
+        if first_name_score > 0.8 and last_name_score > 0.8:
+            scores.append(0.9)
+            reasons.append(
+                f"Similar full names: {contact1.first_name} {contact1.last_name} ≈ "
+                f"{contact2.first_name} {contact2.last_name}"
+            )
+        elif first_name_score > 0.8 and last_name_score < 0.3:
+            return 0.0, []
+    else:
+        if contact1.first_name and contact2.first_name:
+            first_name_score = fuzz.ratio(contact1.first_name.lower(), contact2.first_name.lower()) / 100
+            if first_name_score > 0.8:
+                supporting_evidence = []
+                if phone_suffix_match:
+                    supporting_evidence.append("Matching last 7 digits of phone numbers")
+                if fields1.email_lower and fields2.email_lower:
+                    email_score = fuzz.ratio(fields1.email_lower, fields2.email_lower) / 100
+                    if email_score > 0.8:
+                        supporting_evidence.append(f"Similar email addresses: {contact1.email} ≈ {contact2.email}")
+                if supporting_evidence:
+                    scores.append(0.7)
+                    reasons.append(f"Matching first name ({contact1.first_name}) with supporting evidence:")
+                    reasons.extend(f"  • {evidence}" for evidence in supporting_evidence)
+
+    if not scores:
+        if fields1.email_lower and fields2.email_lower:
+            email_score = fuzz.ratio(fields1.email_lower, fields2.email_lower) / 100
+            if email_score > 0.9:
+                scores.append(0.6)
+                reasons.append(f"Very similar email addresses: {contact1.email} ≈ {contact2.email}")
+        if phone_suffix_match:
+            scores.append(0.5)
+            reasons.append("Matching last 7 digits of phone numbers")
+
+    if not scores:
+        return 0.0, []
+    confidence = sum(scores) / len(scores)
+    if len(scores) > 1:
+        confidence = min(confidence + 0.1, 1.0)
+    return confidence, reasons
+
+
+def contact(contact_id, first_name=None, last_name=None, email=None, phone=None) -> Contact:
+    return Contact(
+        id=contact_id, first_name=first_name, last_name=last_name, email=email, phone=phone,
+        source='test', source_id=contact_id, metadata={}
+    )
+
+
+# One pair per rule and the combinations between them
+EDGE_CASES = [
+    (contact('a', 'Ann', 'Lee', 'ann@x.com'), contact('b', 'Bob', 'Ray', 'ANN@x.com')),
+    (contact('a', 'Ann', phone='(555) 123-4567'), contact('b', 'Bo', phone='555.123.4567')),
+    (contact('a', 'Ann', phone='123-4567'), contact('b', 'Ann', phone='1234567')),
+    (contact('a', 'Jonathan', 'Smith'), contact('b', 'Jonathon', 'Smyth')),
+    (contact('a', 'Jonathan', 'Smith'), contact('b', 'Jonathan', 'Ng')),
+    (contact('a', 'Jonathan', email='jon.smith@x.com'), contact('b', 'Jonathon', email='jon.smith@y.com')),
+    (contact('a', 'Jonathan', phone='+1 555 765 4321'), contact('b', 'Jonathan', phone='765-4321')),
+    (contact('a', email='katherine.jones@x.com'), contact('b', email='katherine.jones@x.co')),
+    (contact('a', email='katherine.jones@x.com', phone='765-4321'),
+     contact('b', email='katherine.jones@x.co', phone='(555) 765-4321')),
+    (contact('a', 'Ann'), contact('b', None, 'Ann')),
+    (contact('a'), contact('b')),
+]
+
+
+def sample_pairs(count: int = 400, random_pairs: int = 3000, seed: int = 0):
+    book = generate_contacts(count, seed=seed)
+    by_id = {c.id: c for c in book.contacts}
+    pairs = [(by_id[id1], by_id[id2]) for id1, id2 in sorted(book.true_pairs())]
+    rng = random.Random(seed)
+    for _ in range(random_pairs):
+        contact1, contact2 = rng.sample(book.contacts, 2)
+        pairs.append((contact1, contact2))
+    return pairs
+
+
+@pytest.mark.parametrize('contact1, contact2', EDGE_CASES)
+def test_pipeline_matches_legacy_scorer_on_edge_cases(contact1, contact2):
+    result = ScoringPipeline(DUPLICATE_RULES).score(contact1, contact2)
+    confidence, reasons = legacy_similarity(contact1, contact2)
+    assert result.confidence == pytest.approx(confidence)
+    assert result.reasons() == reasons
+
+
+def test_pipeline_matches_legacy_scorer_on_synthetic_book():
+    pipeline = ScoringPipeline(DUPLICATE_RULES)
+    pairs = sample_pairs()
+    assert any(legacy_similarity(*pair)[0] > 0 for pair in pairs)
+    for contact1, contact2 in pairs:
+        result = pipeline.score(contact1, contact2)
+        confidence, reasons = legacy_similarity(contact1, contact2)
+        assert result.confidence == pytest.approx(confidence), (contact1, contact2)
+        assert result.reasons() == reasons
+
+
+def test_vectorized_scores_match_the_pipeline():
+    pipeline = ScoringPipeline(DUPLICATE_RULES)
+    matcher = ContactMatcher()
+    pairs = sample_pairs()
+    matcher.index_contacts(list({c.id: c for pair in pairs for c in pair}.values()))
+    confidences = matcher.score_pairs([c1.id for c1, _ in pairs], [c2.id for _, c2 in pairs])
+    for (contact1, contact2), confidence in zip(pairs, confidences):
+        assert confidence == pytest.approx(pipeline.score(contact1, contact2).confidence), (contact1, contact2)
+
+    # The edge cases reuse ids, so each is indexed on its own
+    for contact1, contact2 in EDGE_CASES:
+        matcher.index_contacts([contact1, contact2])
+        confidence, = matcher.score_pairs([contact1.id], [contact2.id])
+        assert confidence == pytest.approx(pipeline.score(contact1, contact2).confidence), (contact1, contact2)
+
+
+def test_rule_statistics_count_evaluations_and_hits():
+    pipeline = ScoringPipeline(DUPLICATE_RULES)
+    pipeline.score(*EDGE_CASES[0])
+    # The exact email rule is cheapest and decisive, so nothing else ran
+    assert pipeline.stats['exact_email'].evaluations == 1
+    assert pipeline.stats['exact_email'].hits == 1
+    assert sum(stats.evaluations for stats in pipeline.stats.values()) == 1
+
+    pipeline.score(*EDGE_CASES[-1], record=False)
+    assert sum(stats.evaluations for stats in pipeline.stats.values()) == 1
+
+
+def test_vectorized_statistics_count_the_pairs_each_rule_checked():
+    matcher = ContactMatcher()
+    matcher.index_contacts([
+        contact('ann_lee', 'Ann', 'Lee'), contact('ann_okafor', 'Ann', 'Okafor'),
+        contact('ann_lee_2', 'Ann', 'Lee'), contact('bob_lee', 'Bob', 'Lee'),
+    ])
+    matcher.score_pairs(['ann_lee', 'ann_lee', 'ann_lee'], ['ann_okafor', 'ann_lee_2', 'bob_lee'])
+    # Last names are only compared where the first names match
+    assert matcher.stats['different_people'].evaluations == 2
+    assert matcher.stats['different_people'].hits == 1
@@ -0,0 +1,66 @@
+import asyncio
+import threading
+import time
+from typing import List
+
+import pytest
+
+from src.core.contact_manager import Contact, ContactSource
+
+
+class BlockingSource(ContactSource):
+    """Fetches through a client call that blocks for ``delay`` seconds."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+
+    def _read_contacts(self, prefix: str, count: int = 1) -> List[str]:
+        time.sleep(self.delay)
+        return [f'{prefix}_{n}' for n in range(count)] + [threading.current_thread().name]
+
+    async def fetch_contacts(self) -> List[Contact]:
+        return []
+
+    async def push_contacts(self, contacts: List[Contact]) -> bool:
+        return False
+
+
+def test_run_blocking_calls_the_function_on_a_source_thread():
+    async def scenario():
+        source = BlockingSource()
+        result = await source.run_blocking(source._read_contacts, 'google', count=2)
+        *ids, thread_name = result
+        assert ids == ['google_0', 'google_1']
+        assert thread_name.startswith('contact-source')
+
+        def fail():
+            raise ConnectionError('offline')
+
+        with pytest.raises(ConnectionError, match='offline'):
+            await source.run_blocking(fail)
+
+    asyncio.run(scenario())
+
+
+def test_blocking_calls_leave_the_event_loop_running():
+    async def scenario():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        sources = [BlockingSource(delay=0.3), BlockingSource(delay=0.3)]
+        started = time.monotonic()
+        await asyncio.gather(*(source.run_blocking(source._read_contacts, 'slow') for source in sources))
+        elapsed = time.monotonic() - started
+        ticker.cancel()
+
+        # Both calls ran at once, and the loop went on ticking meanwhile
+        assert elapsed < 0.55
+        assert ticks >= 10
+
+    asyncio.run(scenario())
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+from src.db.database import bulk_import, close_db, init_db, set_sqlite_profile
+
+
+async def pragmas(session_factory, *names):
+    async with session_factory() as session:
+        return {name: (await session.execute(text(f"PRAGMA {name}"))).scalar() for name in names}
+
+
+def test_connections_use_the_desktop_profile(database_url):
+    async def scenario():
+        session_factory = await init_db(database_url)
+        try:
+            assert await pragmas(session_factory, 'journal_mode', 'synchronous', 'cache_size', 'busy_timeout') == {
+                'journal_mode': 'wal', 'synchronous': 1, 'cache_size': -65536, 'busy_timeout': 5000
+            }
+        finally:
+            await close_db(session_factory)
+
+    asyncio.run(scenario())
+
+
+def test_bulk_import_switches_pooled_connections_and_back(database_url):
+    async def scenario():
+        session_factory = await init_db(database_url)
+        try:
+            # Opens the connection the pool hands out again below
+            assert (await pragmas(session_factory, 'synchronous'))['synchronous'] == 1
+            async with bulk_import(session_factory):
+                assert await pragmas(session_factory, 'synchronous', 'busy_timeout') == {
+                    'synchronous': 0, 'busy_timeout': 30000
+                }
+            assert (await pragmas(session_factory, 'synchronous'))['synchronous'] == 1
+        finally:
+            await close_db(session_factory)
+
+    asyncio.run(scenario())
+
+
+def test_unknown_profiles_are_refused(database_url):
+    async def scenario():
+        with pytest.raises(ValueError):
+            await init_db(database_url, profile='fast')
+        session_factory = await init_db(database_url, profile='bulk-import')
+        try:
+            assert (await pragmas(session_factory, 'synchronous'))['synchronous'] == 0
+            with pytest.raises(ValueError):
+                set_sqlite_profile(session_factory, 'fast')
+            assert set_sqlite_profile(session_factory, 'desktop-safe') == 'bulk-import'
+        finally:
+            await close_db(session_factory)
+
+    asyncio.run(scenario())
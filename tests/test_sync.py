@@ -0,0 +1,226 @@
+import asyncio
+from typing import List
+
+from src.core.contact_manager import Contact, ContactSource
+from tests.helpers import close_manager, make_contact, open_manager, stored_ids
+
+
+class FakeIncrementalSource(ContactSource):
+    """Serves ``contacts`` on a full fetch and ``changes`` when given a token."""
+    incremental = True
+
+    def __init__(self, contacts: List[Contact], token: str = 'token-1'):
+        self.contacts = contacts
+        self.changes: List[Contact] = []
+        self.deleted: List[str] = []
+        self.token = token
+        self.token_expired = False
+        self.tokens_seen = []
+
+    async def fetch_contacts(self) -> List[Contact]:
+        self.tokens_seen.append(self.sync_token)
+        if self.token_expired:
+            self.sync_token = None
+        self.next_sync_token = self.token
+        if self.sync_token is None:
+            return list(self.contacts)
+        self.deleted_contact_ids = list(self.deleted)
+        return list(self.changes)
+
+    async def push_contacts(self, contacts: List[Contact]) -> bool:
+        return False
+
+
+class SlowBatchSource(ContactSource):
+    """Delivers one contact per batch, ``delay`` seconds apart."""
+
+    def __init__(self, count: int, delay: float):
+        self.count = count
+        self.delay = delay
+
+    async def fetch_contacts(self) -> List[Contact]:
+        return [make_contact(f'slow_{n}', source='slow') for n in range(self.count)]
+
+    async def iter_contact_batches(self, progress=None):
+        for contact in await self.fetch_contacts():
+            await asyncio.sleep(self.delay)
+            yield [contact]
+
+    async def push_contacts(self, contacts: List[Contact]) -> bool:
+        return False
+
+
+def test_full_sync_only_removes_contacts_of_its_own_source(database_url):
+    async def scenario():
+        manager, session_factory = await open_manager(database_url)
+        try:
+            work = FakeIncrementalSource([make_contact(f'google_w{n}') for n in range(3)])
+            home = FakeIncrementalSource([make_contact(f'google_h{n}') for n in range(3)])
+            await manager.add_source(work, name='work')
+            await manager.add_source(home, name='home')
+            report = await manager.sync_all_sources()
+            assert not report.failed_sources
+            assert len(await stored_ids(manager)) == 6
+
+            # The work account's token expired and one person was removed
+            # meanwhile; its full resync must not touch the home account
+            work.token_expired = True
+            work.contacts = work.contacts[1:]
+            report = await manager.sync_all_sources()
+            work_result = report.sources[0]
+            assert not work_result.incremental
+            assert work_result.deleted == 1
+            assert await stored_ids(manager) == sorted(
+                ['google_w1', 'google_w2', 'google_h0', 'google_h1', 'google_h2']
+            )
+        finally:
+            await close_manager(manager, session_factory)
+
+    asyncio.run(scenario())
+
+
+def test_empty_full_fetch_removes_every_contact_of_the_source(database_url):
+    async def scenario():
+        manager, session_factory = await open_manager(database_url)
+        try:
+            source = FakeIncrementalSource([make_contact('google_1'), make_contact('google_2')])
+            await manager.add_source(source)
+            await manager.sync_all_sources()
+
+            # Everyone was removed from the account while its token expired
+            source.token_expired = True
+            source.contacts = []
+            report = await manager.sync_all_sources()
+            assert report.sources[0].deleted == 2
+            assert await stored_ids(manager) == []
+        finally:
+            await close_manager(manager, session_factory)
+
+    asyncio.run(scenario())
+
+
+def test_incremental_sync_applies_changes_and_stores_token(database_url):
+    async def scenario():
+        manager, session_factory = await open_manager(database_url)
+        try:
+            source = FakeIncrementalSource([make_contact('google_1'), make_contact('google_2')])
+            await manager.add_source(source)
+            await manager.sync_all_sources()
+
+            source.changes = [make_contact('google_1', first_name='Anne'), make_contact('google_3')]
+            source.deleted = ['google_2']
+            source.token = 'token-2'
+            report = await manager.sync_all_sources()
+            result = report.sources[0]
+            assert source.tokens_seen == [None, 'token-1']
+            assert result.incremental
+            assert (result.save.inserted, result.save.updated, result.deleted) == (1, 1, 1)
+            assert await stored_ids(manager) == ['google_1', 'google_3']
+
+            await manager.sync_all_sources()
+            assert source.tokens_seen[-1] == 'token-2'
+        finally:
+            await close_manager(manager, session_factory)
+
+    asyncio.run(scenario())
+
+
+def test_sync_without_writer_leaves_no_transaction_open(database_url):
+    async def scenario():
+        manager, session_factory = await open_manager(database_url, writer=False)
+        try:
+            await manager.add_source(FakeIncrementalSource([make_contact('google_1')]))
+            report = await manager.sync_all_sources()
+            assert not report.failed_sources, report.summary()
+            assert not manager.db.in_transaction()
+
+            # Both begin transactions of their own on the manager's session
+            assert await manager.search_contact_ids('Ann') == ['google_1']
+            assert await manager.find_duplicates() == []
+        finally:
+            await close_manager(manager, session_factory)
+
+    asyncio.run(scenario())
+
+
+def test_timeout_covers_the_whole_source_not_each_batch(database_url):
+    async def scenario():
+        manager, session_factory = await open_manager(database_url)
+        try:
+            # Every batch arrives well within the timeout, all of them don't
+            await manager.add_source(SlowBatchSource(count=20, delay=0.05), name='slow')
+            await manager.add_source(FakeIncrementalSource([make_contact('google_1')]), name='fast')
+            report = await manager.sync_all_sources(timeout=0.3)
+            slow, fast = report.sources
+            assert slow.timed_out
+            assert 0 < slow.fetched < 20
+            assert fast.ok
+        finally:
+            await close_manager(manager, session_factory)
+
+    asyncio.run(scenario())
+
+
+def test_timeout_covers_saving_too(database_url):
+    async def scenario():
+        manager, session_factory = await open_manager(database_url)
+        save_contacts = manager.save_contacts
+
+        async def slow_save_contacts(contacts, **kwargs):
+            if kwargs.get('sync_source') == 'slow':
+                await asyncio.sleep(1)
+            return await save_contacts(contacts, **kwargs)
+
+        manager.save_contacts = slow_save_contacts
+        try:
+            # Fetching is instant, saving outlasts the timeout
+            slow_source = FakeIncrementalSource([make_contact('google_s1')])
+            await manager.add_source(slow_source, name='slow')
+            await manager.add_source(FakeIncrementalSource([make_contact('google_f1')]), name='fast')
+            report = await manager.sync_all_sources(timeout=0.2)
+            slow, fast = report.sources
+            assert slow.timed_out
+            assert slow.error == 'timed out after 0.2s'
+            assert fast.ok
+            assert await stored_ids(manager) == ['google_f1']
+
+            # No token was stored for the unfinished sync
+            manager.save_contacts = save_contacts
+            await manager.sync_all_sources()
+            assert slow_source.tokens_seen == [None, None]
+        finally:
+            await close_manager(manager, session_factory)
+
+    asyncio.run(scenario())
+
+
+def test_failed_saves_keep_the_previous_token(database_url, caplog):
+    async def scenario():
+        manager, session_factory = await open_manager(database_url)
+        try:
+            source = FakeIncrementalSource([make_contact('google_1'), make_contact('google_2')])
+            await manager.add_source(source)
+            await manager.sync_all_sources()
+
+            # A source bug hands over a list, which can't be stored
+            broken = make_contact('google_3', first_name=['Ann', 'Annie'])
+            source.changes = [make_contact('google_1', first_name='Anne'), broken]
+            source.deleted = ['google_2']
+            source.token = 'token-2'
+            with caplog.at_level('ERROR', logger='src.core.contact_manager'):
+                report = await manager.sync_all_sources()
+            result = report.sources[0]
+            assert list(result.save.errors) == ['google_3']
+            assert report.failed_contacts == 1
+            assert 'google_3' in report.summary()
+            assert any('google_3' in record.getMessage() for record in caplog.records)
+            # The reported deletion still applies, the other change is saved
+            assert await stored_ids(manager) == ['google_1']
+
+            # The failed change is fetched again with the old token
+            await manager.sync_all_sources()
+            assert source.tokens_seen[-1] == 'token-1'
+        finally:
+            await close_manager(manager, session_factory)
+
+    asyncio.run(scenario())
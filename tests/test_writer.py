@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select
+
+from src.db.database import close_db, init_db
+from src.db.writer import DEFAULT_MAX_OPERATIONS, DatabaseWriter, WritePriority
+from src.models.app_state_model import AppStateModel
+
+
+def set_state(key: str, log=None):
+    """A write operation storing ``key``, noting in ``log`` when it ran."""
+    async def operation(session):
+        if log is not None:
+            log.append(key)
+        session.add(AppStateModel(key=key, value=key))
+        return key
+    return operation
+
+
+async def stored_keys(session_factory):
+    async with session_factory() as session:
+        return sorted((await session.execute(select(AppStateModel.key))).scalars().all())
+
+
+def run_with_writer(database_url, scenario, **options):
+    async def main():
+        session_factory = await init_db(database_url)
+        writer = DatabaseWriter(session_factory, **options)
+        writer.start()
+        try:
+            await scenario(writer, session_factory)
+        finally:
+            await writer.close()
+            await session_factory.kw['bind'].dispose()
+
+    asyncio.run(main())
+
+
+def test_interactive_writes_go_before_queued_bulk_writes(database_url):
+    async def scenario(writer, session_factory):
+        log = []
+        # All queued before the writer task first runs
+        futures = [
+            writer.submit(set_state('bulk_1', log), WritePriority.BULK),
+            writer.submit(set_state('bulk_2', log), WritePriority.BULK),
+            writer.submit(set_state('edit', log), WritePriority.INTERACTIVE),
+        ]
+        assert await asyncio.gather(*futures) == ['bulk_1', 'bulk_2', 'edit']
+        assert log == ['edit', 'bulk_1', 'bulk_2']
+
+    run_with_writer(database_url, scenario)
+
+
+def test_writes_are_grouped_up_to_max_operations(database_url):
+    count = DEFAULT_MAX_OPERATIONS + 36
+
+    async def scenario(writer, session_factory):
+        await asyncio.gather(*(writer.submit(set_state(f'key_{n:03}')) for n in range(count)))
+        assert writer.groups_committed == 2
+        assert writer.operations_committed == count
+        assert len(await stored_keys(session_factory)) == count
+
+    run_with_writer(database_url, scenario)
+
+
+def test_writes_within_max_delay_share_a_transaction(database_url):
+    async def scenario(writer, session_factory):
+        first = writer.submit(set_state('first'))
+        await asyncio.sleep(0.02)
+        second = writer.submit(set_state('second'))
+        await asyncio.gather(first, second)
+        assert writer.groups_committed == 1
+
+    run_with_writer(database_url, scenario, max_delay=0.5)
+
+
+def test_writes_after_max_delay_get_their_own_transaction(database_url):
+    async def scenario(writer, session_factory):
+        first = writer.submit(set_state('first'))
+        await asyncio.sleep(0.1)
+        second = writer.submit(set_state('second'))
+        await asyncio.gather(first, second)
+        assert writer.groups_committed == 2
+
+    run_with_writer(database_url, scenario, max_delay=0.005)
+
+
+def test_failed_group_is_retried_one_operation_at_a_time(database_url):
+    async def scenario(writer, session_factory):
+        async def broken(session):
+            raise ValueError("bad operation")
+
+        futures = [writer.submit(set_state('before')), writer.submit(broken), writer.submit(set_state('after'))]
+        before, error, after = await asyncio.gather(*futures, return_exceptions=True)
+        assert (before, after) == ('before', 'after')
+        assert isinstance(error, ValueError)
+        assert await stored_keys(session_factory) == ['after', 'before']
+        # The group that failed isn't counted, the two retries are
+        assert (writer.groups_committed, writer.operations_committed) == (2, 2)
+
+    run_with_writer(database_url, scenario)
+
+
+def test_close_writes_everything_queued(database_url):
+    async def main():
+        session_factory = await init_db(database_url)
+        writer = DatabaseWriter(session_factory)
+        writer.start()
+        futures = [writer.submit(set_state(f'key_{n}'), WritePriority.BULK) for n in range(5)]
+        await writer.close()
+        assert all(future.done() for future in futures)
+        assert len(await stored_keys(session_factory)) == 5
+        with pytest.raises(RuntimeError):
+            writer.submit(set_state('late'))
+        await session_factory.kw['bind'].dispose()
+
+    asyncio.run(main())
+
+
+def test_close_db_commits_queued_writes_before_closing(database_url):
+    async def main():
+        session_factory = await init_db(database_url)
+        writer = DatabaseWriter(session_factory)
+        writer.start()
+        # Like the app closing right after edits, nobody awaits these
+        for n in range(3):
+            writer.submit(set_state(f'key_{n}'), WritePriority.BULK)
+        await close_db(session_factory, writer)
+
+        session_factory = await init_db(database_url)
+        try:
+            assert await stored_keys(session_factory) == ['key_0', 'key_1', 'key_2']
+        finally:
+            await close_db(session_factory)
+
+    asyncio.run(main())